@@ -2,10 +2,3 @@
 
 Keep this file minimal so importing `app` works cleanly in tests and startup.
 """
-"""Application package for Content_Bot.
-
-Keep this file minimal so importing `app` works cleanly in tests and startup.
-"""
-# This file is intentionally left not empty to indicate that the 'app' directory is a Python package.
-# The print statement serves as a simple confirmation that the package has been initialized when the application starts.
-print("Package is ready")
@@ -2,51 +2,62 @@
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from bson import ObjectId
-import asyncio
 import logging
 
+from ..core.config import settings
+from ..repositories import AnalyticsRepository, Repositories, SessionRepository
 from ..services import ai_client, scraper
+from ..services.admission import AdmissionRejected, admission
+from ..services.archiver import session_archiver
+from ..services.speculation import speculator
+from ..services.summarizer import prompt_context, summarizer
 
 logger = logging.getLogger(__name__)
 
-async def handle_chat(db, message: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+async def handle_chat(repos: Repositories, message: str, session_id: Optional[str] = None) -> Dict[str, Any]:
     """Enhanced chat handler with complete conversation logging"""
     
     try:
         # Find or create session
-        session, session_id = await _get_or_create_session(db, session_id)
+        session, session_id = await _get_or_create_session(repos.sessions, session_id)
         
         # Save user message with metadata
-        await _save_user_message(db, session["_id"], message)
+        await _save_user_message(repos.sessions, session_id, message)
         
-        # Get comprehensive trends
+        # Get comprehensive trends (adaptive deadline, cached/fallback trends when degraded)
         try:
-            trends = await asyncio.wait_for(
-                scraper.fetch_trending_formats(), 
-                timeout=8.0
-            )
-        except asyncio.TimeoutError:
-            logger.warning("Trend analysis timeout")
-            trends = []
+            trends = await scraper.fetch_trending_formats_bounded()
         except Exception as e:
             logger.error(f"Trend analysis error: {e}")
             trends = []
         
-        # Get conversation context
-        context = session.get("messages", [])
+        # Rolling summary plus the recent messages it does not cover yet
+        context = prompt_context(session)
         
-        # Generate AI response
-        ai_resp = await ai_client.generate_reply(
-            message=message, 
-            context=context, 
-            trends=trends
-        )
+        # Generate AI response, unless a draft was speculated for this post request
+        ai_resp = await speculator.take(session_id, message)
+        if ai_resp is None:
+            async with admission.admit():
+                ai_resp = await ai_client.generate_reply(
+                    message=message, 
+                    context=context, 
+                    trends=trends,
+                    session_id=str(session_id)
+                )
         
         # Save assistant message with full response data
-        await _save_assistant_message(db, session["_id"], ai_resp)
+        await _save_assistant_message(repos.sessions, session_id, ai_resp)
         
         # Log detailed interaction for analytics
-        await _log_detailed_interaction(db, session_id, message, ai_resp, trends)
+        await _log_detailed_interaction(repos.analytics, session_id, message, ai_resp, trends)
+        
+        # Fold older turns into the session summary off the request path
+        summarizer.schedule(repos.sessions, session_id)
+        
+        # Draft the posts a conversational turn is likely to be followed by
+        if not ai_resp.get("should_suggest"):
+            speculator.schedule(session_id, message, ai_resp.get("reply", ""), context, trends,
+                                _known_platforms(session))
         
         return {
             "session_id": str(session_id),
@@ -54,6 +65,8 @@ async def handle_chat(db, message: str, session_id: Optional[str] = None) -> Dic
             "suggestions": ai_resp.get("suggestions", []),
             "trends": trends[:5],
             "should_suggest": ai_resp.get("should_suggest", False),
+            "missing_platforms": ai_resp.get("missing_platforms", []),
+            "fallback": ai_resp.get("fallback", False),
             "analytics": {
                 "message_length": len(message),
                 "has_suggestions": len(ai_resp.get("suggestions", [])) > 0,
@@ -65,42 +78,24 @@ async def handle_chat(db, message: str, session_id: Optional[str] = None) -> Dic
             }
         }
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Chat handling error: {e}")
         return _get_error_response(session_id)
 
-async def _get_or_create_session(db, session_id: Optional[str] = None):
+async def _get_or_create_session(sessions: SessionRepository, session_id: Optional[str] = None):
     """Get existing session or create new one with enhanced schema"""
-    if session_id and ObjectId.is_valid(session_id):
-        session_obj_id = ObjectId(session_id)
-        session = await db.chats.find_one({"_id": session_obj_id})
-        if session:
-            return session, session_id
-    
-    # Create new session with enhanced schema
-    session_doc = {
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow(),
-        "messages": [],
-        "interaction_count": 0,
-        "platform_requests": {},
-        "suggestion_stats": {
-            "total_suggestions": 0,
-            "platforms_used": [],
-            "last_suggestion_date": None
-        },
-        "user_preferences": {
-            "preferred_platforms": [],
-            "content_types": []
-        }
-    }
-    res = await db.chats.insert_one(session_doc)
-    session_id = str(res.inserted_id)
-    session = await db.chats.find_one({"_id": res.inserted_id})
-    
-    return session, session_id
+    # Load only the tail of the messages the prompt can use, plus the full count
+    window = settings.CHAT_CONTEXT_MESSAGES + settings.SUMMARY_KEEP_RECENT
+    return await sessions.get_or_create(session_id, window)
 
-async def _save_user_message(db, session_id: ObjectId, message: str):
+def _known_platforms(session: Dict[str, Any]) -> List[str]:
+    """Platforms the session prefers or has asked for before"""
+    preferred = session.get("user_preferences", {}).get("preferred_platforms", [])
+    return list(dict.fromkeys([*preferred, *session.get("platform_requests", {})]))
+
+async def _save_user_message(sessions: SessionRepository, session_id: str, message: str):
     """Save user message with enhanced metadata"""
     user_msg = {
         "role": "user", 
@@ -115,16 +110,9 @@ async def _save_user_message(db, session_id: ObjectId, message: str):
         }
     }
     
-    await db.chats.update_one(
-        {"_id": session_id}, 
-        {
-            "$push": {"messages": user_msg}, 
-            "$set": {"updated_at": datetime.utcnow()},
-            "$inc": {"interaction_count": 1}
-        }
-    )
+    await sessions.add_user_message(session_id, user_msg)
 
-async def _save_assistant_message(db, session_id: ObjectId, ai_response: Dict[str, Any]):
+async def _save_assistant_message(sessions: SessionRepository, session_id: str, ai_response: Dict[str, Any]):
     """Save assistant message with full response data"""
     assistant_msg = {
         "role": "assistant", 
@@ -138,35 +126,10 @@ async def _save_assistant_message(db, session_id: ObjectId, ai_response: Dict[st
         }
     }
     
-    update_operation = {
-        "$push": {"messages": assistant_msg}, 
-        "$set": {"updated_at": datetime.utcnow()}
-    }
-    
-    # Update suggestion statistics if suggestions were provided
-    if ai_response.get("suggestions"):
-        platforms = list(set(
-            suggestion.get("platform", "unknown") 
-            for suggestion in ai_response.get("suggestions", [])
-        ))
-        
-        update_operation["$inc"] = {
-            "suggestion_stats.total_suggestions": len(ai_response.get("suggestions", [])),
-            **{f"platform_requests.{platform}": 1 for platform in platforms}
-        }
-        
-        update_operation["$addToSet"] = {
-            "suggestion_stats.platforms_used": {"$each": platforms}
-        }
-        
-        update_operation["$set"] = {
-            **update_operation.get("$set", {}),
-            "suggestion_stats.last_suggestion_date": datetime.utcnow()
-        }
-    
-    await db.chats.update_one({"_id": session_id}, update_operation)
+    # Suggestion statistics are updated along with the message
+    await sessions.add_assistant_message(session_id, assistant_msg, ai_response.get("suggestions", []))
 
-async def _log_detailed_interaction(db, session_id: str, user_message: str, ai_response: Dict[str, Any], trends: List[Dict[str, Any]]):
+async def _log_detailed_interaction(analytics: AnalyticsRepository, session_id: str, user_message: str, ai_response: Dict[str, Any], trends: List[Dict[str, Any]]):
     """Log detailed interaction for analytics and improvement"""
     analytics_doc = {
         "session_id": session_id,
@@ -204,7 +167,7 @@ async def _log_detailed_interaction(db, session_id: str, user_message: str, ai_r
     }
     
     try:
-        await db.interaction_analytics.insert_one(analytics_doc)
+        await analytics.log_interaction(analytics_doc)
     except Exception as e:
         logger.warning(f"Failed to log interaction: {e}")
 
@@ -235,19 +198,23 @@ def _get_error_response(session_id: Optional[str] = None) -> Dict[str, Any]:
         "error": True
     }
 
+async def get_session(repos: Repositories, session_id: str) -> Optional[Dict[str, Any]]:
+    """Full session document, rehydrated from the archive if it went cold"""
+    return await repos.sessions.get(session_id)
+
 # Additional function to get chat history with analytics
-async def get_chat_analytics(db, session_id: str) -> Dict[str, Any]:
+async def get_chat_analytics(repos: Repositories, session_id: str) -> Dict[str, Any]:
     """Get analytics for a chat session"""
     if not ObjectId.is_valid(session_id):
         return {"error": "Invalid session ID"}
     
-    session = await db.chats.find_one({"_id": ObjectId(session_id)})
+    session = await get_session(repos, session_id)
     if not session:
         return {"error": "Session not found"}
     
     # Get interaction analytics for this session
     try:
-        analytics_list = await db.interaction_analytics.find({"session_id": session_id}).sort("timestamp", -1).limit(50).to_list(length=50)
+        analytics_list = await repos.analytics.recent(session_id, 50)
     except Exception:
         analytics_list = []
     
@@ -260,4 +227,76 @@ async def get_chat_analytics(db, session_id: str) -> Dict[str, Any]:
         },
         "platform_usage": session.get("platform_requests", {}),
         "recent_interactions": analytics_list
-    }
\ No newline at end of file
+    }
+async def get_session_version(db, session_id: str) -> Optional[Dict[str, Any]]:
+    """Message count and last update of a session, without loading its messages"""
+    if not ObjectId.is_valid(session_id):
+        return None
+    pipeline = [
+        {"$match": {"_id": ObjectId(session_id)}},
+        {"$project": {"updated_at": 1, "total": {"$size": {"$ifNull": ["$messages", []]}}}},
+    ]
+    docs = await db.chats.aggregate(pipeline).to_list(length=1)
+    if not docs and await session_archiver.rehydrate(db, ObjectId(session_id)):
+        docs = await db.chats.aggregate(pipeline).to_list(length=1)
+    return docs[0] if docs else None
+
+async def get_message_window(db, session_id: str, limit: int = 50,
+                             before: Optional[str] = None, after: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """A window of a session's messages, sliced server side.
+
+    The last ``limit`` messages by default, the ``limit`` messages before the
+    ``before`` message_id, or the first ``limit`` messages after ``after``.
+    Returns None for an unknown session; raises ValueError for an unknown anchor.
+    """
+    if not ObjectId.is_valid(session_id):
+        return None
+    anchor = before or after
+    if after:
+        start = {"$add": ["$idx", 1]}
+        end = {"$min": ["$total", {"$add": ["$idx", 1 + limit]}]}
+    elif before:
+        start = {"$max": [0, {"$subtract": ["$idx", limit]}]}
+        end = "$idx"
+    else:
+        start = {"$max": [0, {"$subtract": ["$total", limit]}]}
+        end = "$total"
+
+    pipeline = [
+        {"$match": {"_id": ObjectId(session_id)}},
+        {"$project": {
+            "updated_at": 1,
+            "messages": {"$ifNull": ["$messages", []]},
+            "total": {"$size": {"$ifNull": ["$messages", []]}},
+            "idx": {"$indexOfArray": [{"$ifNull": ["$messages.message_id", []]}, anchor]},
+        }},
+        {"$project": {"updated_at": 1, "messages": 1, "total": 1, "idx": 1, "start": start, "end": end}},
+        # Only the sliced window leaves the server
+        {"$project": {
+            "updated_at": 1, "total": 1, "idx": 1, "start": 1, "end": 1,
+            "messages": {"$cond": [
+                {"$gt": ["$end", "$start"]},
+                {"$slice": ["$messages", "$start", {"$subtract": ["$end", "$start"]}]},
+                [],
+            ]},
+        }},
+    ]
+    docs = await db.chats.aggregate(pipeline).to_list(length=1)
+    if not docs:
+        return None
+    doc = docs[0]
+    if anchor and doc["idx"] < 0:
+        raise ValueError("Unknown message_id")
+
+    messages = doc["messages"]
+    # Older messages remain before a backwards window, newer ones after a forward one
+    has_more = doc["end"] < doc["total"] if after else doc["start"] > 0
+    return {
+        "session_id": session_id,
+        "messages": messages,
+        "total": doc["total"],
+        "has_more": has_more,
+        "next_before": messages[0].get("message_id") if has_more and not after and messages else None,
+        "next_after": messages[-1].get("message_id") if has_more and after and messages else None,
+        "updated_at": doc.get("updated_at"),
+    }
@@ -1,57 +1,34 @@
 # controllers/content_controller.py
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-from bson import ObjectId
-from pymongo import ReturnDocument
 from ..models import ContentCreate, ContentUpdate
+from ..repositories import ContentRepository
 
-def doc_to_response(doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    """Converts a MongoDB document to a dictionary, renaming '_id' to 'id'."""
-    if doc is None:
-        return None
-    result = doc.copy()
-    _id = result.pop('_id', None)
-    result['id'] = str(_id) if _id else None
-    return result
-
-async def create_content(db, data: ContentCreate) -> dict:
-    payload = data.dict()
-    now = datetime.utcnow()
-    payload["created_at"] = now
-    payload["updated_at"] = now
-    res = await db.contents.insert_one(payload)
-    doc = await db.contents.find_one({"_id": res.inserted_id})
-    return doc_to_response(doc)
-
-async def get_content(db, content_id: str) -> Optional[dict]:
-    if not ObjectId.is_valid(content_id):
-        return None
-    doc = await db.contents.find_one({"_id": ObjectId(content_id)})
-    return doc_to_response(doc)
-
-async def list_contents(db, skip: int = 0, limit: int = 50) -> List[dict]:
-    cursor = db.contents.find().skip(skip).limit(limit).sort("created_at", -1)
-    result = []
-    async for doc in cursor:
-        result.append(doc_to_response(doc))
-    return result
-
-async def update_content(db, content_id: str, data: ContentUpdate) -> Optional[dict]:
-    if not ObjectId.is_valid(content_id):
-        return None
+async def create_content(contents: ContentRepository, data: ContentCreate) -> dict:
+    return await contents.create(data.dict())
+
+async def get_content(contents: ContentRepository, content_id: str) -> Optional[dict]:
+    return await contents.get(content_id)
+
+async def get_content_version(contents: ContentRepository, content_id: str) -> Optional[datetime]:
+    """Last update of a content document, without loading its body; None if it does not exist"""
+    return await contents.version(content_id)
+
+async def get_contents_version(contents: ContentRepository) -> Dict[str, Any]:
+    """Collection size and newest update; any insert, update or delete changes one of them"""
+    return await contents.list_version()
+
+async def list_contents(contents: ContentRepository, skip: int = 0, limit: int = 50) -> List[dict]:
+    return await contents.list(skip, limit)
+
+async def update_content(contents: ContentRepository, content_id: str, data: ContentUpdate) -> Optional[dict]:
     update_data = {k: v for k, v in data.dict().items() if v is not None}
-    if not update_data:
-        return await get_content(db, content_id)
-    update_data["updated_at"] = datetime.utcnow()
-    res = await db.contents.find_one_and_update(
-        {"_id": ObjectId(content_id)},
-        {"$set": update_data},
-        return_document=ReturnDocument.AFTER,
-    )
-    return doc_to_response(res)
-
-async def delete_content(db, content_id: str) -> bool:
-    if not ObjectId.is_valid(content_id):
-        return False
-    res = await db.contents.delete_one({"_id": ObjectId(content_id)})
-    return res.deleted_count == 1
\ No newline at end of file
+    return await contents.update(content_id, update_data)
+
+async def delete_content(contents: ContentRepository, content_id: str) -> bool:
+    return await contents.delete(content_id)
+
+async def search_contents(contents: ContentRepository, query: str, limit: int = 20,
+                          cursor: Optional[str] = None) -> Dict[str, Any]:
+    """Ranked full-text search on title/body with keyset pagination on (score, id)."""
+    return await contents.search(query, limit, cursor)
@@ -0,0 +1,148 @@
+# controllers/export_controller.py
+"""Streaming NDJSON export of chats and interaction analytics.
+
+Documents are read from a Motor cursor with a fixed ``batch_size`` and
+serialized one line at a time, so memory stays constant whatever the export
+size. Every line carries an opaque ``_cursor``; passing the last one received
+back as ``cursor`` resumes the export right after it.
+
+Analytics records never change after insert and are read in (timestamp, _id)
+order. The chats export also covers archived sessions: ``chats`` and
+``chats_archive`` are both read in ``_id`` order and merged, and archived
+sessions are decompressed on the fly and marked ``"_archived": true``.
+
+Chat sessions are filtered by ``updated_at`` but read in ``_id`` order:
+``updated_at`` changes on every turn, and keyset paging on it would move a
+session that is updated mid-export past the cursor (exported twice) or
+behind it (skipped on resume).
+"""
+import base64
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from bson import ObjectId
+
+# Exportable collection -> field the export is filtered by
+EXPORT_COLLECTIONS = {
+    "chats": "updated_at",
+    "interaction_analytics": "timestamp",
+}
+# Collections whose time field is set once, so it can also order the export
+ORDERED_BY_TIME = {"interaction_analytics"}
+
+CHUNK_BYTES = 64 * 1024
+
+
+def _encode_export_cursor(timestamp: Optional[datetime], _id: ObjectId) -> str:
+    data = {"id": str(_id)}
+    if timestamp is not None:
+        data["t"] = timestamp.isoformat()
+    raw = json.dumps(data).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_export_cursor(cursor: str) -> Tuple[Optional[datetime], ObjectId]:
+    """Raises ValueError for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        timestamp = datetime.fromisoformat(data["t"]) if data.get("t") else None
+        return timestamp, ObjectId(data["id"])
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def export_sort(collection: str):
+    if collection in ORDERED_BY_TIME:
+        return [(EXPORT_COLLECTIONS[collection], 1), ("_id", 1)]
+    return [("_id", 1)]
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def export_query(collection: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 cursor: Optional[str] = None) -> Dict[str, Any]:
+    """Filter for a time range [start, end), resuming after ``cursor`` if given"""
+    field = EXPORT_COLLECTIONS[collection]
+    clauses = []
+    time_range = {}
+    if start:
+        time_range["$gte"] = start
+    if end:
+        time_range["$lt"] = end
+    if time_range:
+        clauses.append({field: time_range})
+    if cursor:
+        last_time, last_id = _decode_export_cursor(cursor)
+        if collection in ORDERED_BY_TIME:
+            if last_time is None:
+                raise ValueError("Invalid cursor")
+            clauses.append({"$or": [
+                {field: {"$gt": last_time}},
+                {field: last_time, "_id": {"$gt": last_id}},
+            ]})
+        else:
+            clauses.append({"_id": {"$gt": last_id}})
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+async def _export_docs(db, collection: str, query: Dict[str, Any], batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+    """Documents in export order; for chats, hot and archived sessions merged by _id"""
+    hot = db[collection].find(query, batch_size=batch_size).sort(export_sort(collection)).__aiter__()
+    if collection != "chats":
+        async for doc in hot:
+            yield doc
+        return
+
+    from ..services.archiver import unpack_session
+
+    # Archive documents keep the session's _id and updated_at, so the same filter applies
+    cold = db.chats_archive.find(query, batch_size=batch_size).sort("_id", 1).__aiter__()
+    hot_doc = await anext(hot, None)
+    cold_doc = await anext(cold, None)
+    while hot_doc is not None or cold_doc is not None:
+        if cold_doc is None or (hot_doc is not None and hot_doc["_id"] <= cold_doc["_id"]):
+            if cold_doc is not None and cold_doc["_id"] == hot_doc["_id"]:
+                # Caught mid-move between the collections: the hot copy is current
+                cold_doc = await anext(cold, None)
+            yield hot_doc
+            hot_doc = await anext(hot, None)
+        else:
+            doc = unpack_session(cold_doc)
+            doc["_archived"] = True
+            yield doc
+            cold_doc = await anext(cold, None)
+
+
+async def iter_ndjson(db, collection: str, query: Dict[str, Any], batch_size: int,
+                      compress: bool = False) -> AsyncIterator[bytes]:
+    """Yield the export as NDJSON chunks of about CHUNK_BYTES, gzipped if ``compress``"""
+    field = EXPORT_COLLECTIONS[collection]
+    by_time = collection in ORDERED_BY_TIME
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = bytearray()
+
+    async for doc in _export_docs(db, collection, query, batch_size):
+        timestamp = doc.get(field)
+        if not by_time:
+            doc["_cursor"] = _encode_export_cursor(None, doc["_id"])
+        elif isinstance(timestamp, datetime):
+            doc["_cursor"] = _encode_export_cursor(timestamp, doc["_id"])
+        buffer += json.dumps(doc, default=_json_default, separators=(",", ":")).encode("utf-8")
+        buffer += b"\n"
+        if len(buffer) >= CHUNK_BYTES:
+            chunk = gzip.compress(bytes(buffer)) if gzip else bytes(buffer)
+            buffer.clear()
+            if chunk:
+                yield chunk
+
+    tail = gzip.compress(bytes(buffer)) + gzip.flush() if gzip else bytes(buffer)
+    if tail:
+        yield tail
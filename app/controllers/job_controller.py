@@ -0,0 +1,165 @@
+# controllers/job_controller.py
+from typing import Optional, Dict, Any, List
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+JOB_ACTIVE_STATUSES = ["queued", "running"]
+
+
+def job_to_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": str(job["_id"]),
+        "status": job.get("status"),
+        "total": job.get("total", 0),
+        "completed": job.get("completed", 0),
+        "failed": job.get("failed", 0),
+        "session_id": job.get("session_id"),
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at"),
+        "finished_at": job.get("finished_at"),
+    }
+
+
+async def ensure_job_indexes(db):
+    # Workers claim the oldest pending item; reads page through a job by index
+    await db.job_items.create_index([("status", 1), ("created_at", 1)])
+    await db.job_items.create_index([("job_id", 1), ("index", 1)], unique=True)
+    # Per-caller backlog check on submit
+    await db.job_items.create_index([("caller", 1), ("status", 1)])
+
+
+async def count_open_items(db, caller: str) -> int:
+    """Items of ``caller``'s jobs that have not finished yet"""
+    return await db.job_items.count_documents({"caller": caller, "status": {"$in": ["pending", "running"]}})
+
+
+async def create_job(db, prompts: List[str], session_id: Optional[str] = None,
+                     caller: Optional[str] = None) -> Dict[str, Any]:
+    """Persist a batch job and its items; the worker pool picks items up from Mongo"""
+    now = datetime.utcnow()
+    job_doc = {
+        "status": "queued",
+        "total": len(prompts),
+        "completed": 0,
+        "failed": 0,
+        "session_id": session_id,
+        "created_at": now,
+        "updated_at": now,
+        "finished_at": None,
+    }
+    res = await db.jobs.insert_one(job_doc)
+    job_doc["_id"] = res.inserted_id
+
+    items = [
+        {
+            "job_id": res.inserted_id,
+            "index": i,
+            "message": prompt,
+            "status": "pending",
+            "attempts": 0,
+            "caller": caller,
+            "result": None,
+            "error": None,
+            "created_at": now,
+        }
+        for i, prompt in enumerate(prompts)
+    ]
+    await db.job_items.insert_many(items, ordered=False)
+    return job_to_response(job_doc)
+
+
+async def get_job(db, job_id: str, after: int = -1, limit: int = 50) -> Optional[Dict[str, Any]]:
+    """Job progress plus one page of items (keyset on item index), including partial results"""
+    if not ObjectId.is_valid(job_id):
+        return None
+    job = await db.jobs.find_one({"_id": ObjectId(job_id)})
+    if not job:
+        return None
+
+    cursor = db.job_items.find(
+        {"job_id": job["_id"], "index": {"$gt": after}},
+        {"index": 1, "message": 1, "status": 1, "result": 1, "error": 1, "attempts": 1},
+    ).sort("index", 1).limit(limit)
+    items = []
+    async for doc in cursor:
+        doc.pop("_id", None)
+        items.append(doc)
+
+    response = job_to_response(job)
+    response["items"] = items
+    response["next_after"] = items[-1]["index"] if len(items) == limit else None
+    return response
+
+
+async def claim_next_item(db, owner: str) -> Optional[Dict[str, Any]]:
+    """Atomically claim the oldest pending item, so several workers/processes never share one"""
+    from pymongo import ReturnDocument  # deferred: pymongo is heavy at import time
+    now = datetime.utcnow()
+    return await db.job_items.find_one_and_update(
+        # Items waiting out a retry backoff are skipped until it passes
+        {"status": "pending", "$or": [{"retry_at": None}, {"retry_at": {"$lte": now}}]},
+        {
+            "$set": {"status": "running", "owner": owner, "claimed_at": now},
+            "$inc": {"attempts": 1},
+        },
+        sort=[("created_at", 1), ("index", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def complete_item(db, item: Dict[str, Any], result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+    """Record an item's outcome and roll progress up to the job"""
+    status = "failed" if error else "done"
+    await db.job_items.update_one(
+        {"_id": item["_id"]},
+        {"$set": {"status": status, "result": result, "error": error, "finished_at": datetime.utcnow()}},
+    )
+    await _roll_up(db, item["job_id"], failed=bool(error))
+
+
+async def _roll_up(db, job_id, failed: bool):
+    """Count one finished item on its job, closing the job after the last one"""
+    now = datetime.utcnow()
+    from pymongo import ReturnDocument
+    job = await db.jobs.find_one_and_update(
+        {"_id": job_id},
+        {"$inc": {"failed" if failed else "completed": 1}, "$set": {"status": "running", "updated_at": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if job and job["completed"] + job["failed"] >= job["total"]:
+        await db.jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": "completed", "finished_at": now, "updated_at": now}},
+        )
+
+
+async def retry_item(db, item: Dict[str, Any], error: Optional[str], delay: float = 0, count_attempt: bool = True):
+    """Return a claimed item to the queue; ``count_attempt=False`` gives back the attempt its claim took"""
+    retry_at = datetime.utcnow() + timedelta(seconds=delay) if delay > 0 else None
+    update = {"$set": {"status": "pending", "error": error, "retry_at": retry_at}, "$unset": {"owner": "", "claimed_at": ""}}
+    if not count_attempt:
+        update["$inc"] = {"attempts": -1}
+    await db.job_items.update_one({"_id": item["_id"]}, update)
+
+
+async def requeue_stale_items(db, older_than: datetime, max_attempts: int) -> int:
+    """Return items whose worker died mid-run (claimed before ``older_than``) to the queue.
+
+    Items that already used ``max_attempts`` are failed instead, so a prompt
+    that keeps killing its worker cannot loop forever.
+    """
+    stale = {"status": "running", "claimed_at": {"$lt": older_than}}
+    exhausted = db.job_items.find({**stale, "attempts": {"$gte": max_attempts}}, {"job_id": 1, "claimed_at": 1})
+    async for item in exhausted:
+        # Conditional on the same claim, in case another process got there first
+        res = await db.job_items.update_one(
+            {"_id": item["_id"], "status": "running", "claimed_at": item["claimed_at"]},
+            {"$set": {"status": "failed", "error": "worker lost", "finished_at": datetime.utcnow()}},
+        )
+        if res.modified_count:
+            await _roll_up(db, item["job_id"], failed=True)
+    res = await db.job_items.update_many(
+        {**stale, "attempts": {"$lt": max_attempts}},
+        {"$set": {"status": "pending"}, "$unset": {"owner": "", "claimed_at": ""}},
+    )
+    return res.modified_count
@@ -0,0 +1,275 @@
+# controllers/live_chat_controller.py
+"""Chat over a long-lived WebSocket connection.
+
+The session is resolved once per connection and its prompt context (rolling
+summary plus recent messages) and detected platform preferences stay in
+memory, so a turn does not reload the session from Mongo. Writes go through a
+per-connection queue drained by one writer task, in order, off the reply path.
+
+Frames are JSON. Client: ``{"type": "message", "message": "..."}`` and
+``{"type": "ping"}``. Server: ``session``, ``status``, ``delta`` (reply text
+in chunks), ``reply`` (same fields as POST /api/chat), ``pong`` and ``error``.
+Binary frames get an ``error`` frame.
+"""
+import asyncio
+import json
+import logging
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+
+from ..core import metrics
+from ..core.config import settings
+from ..services import ai_client, scraper
+from ..services.admission import AdmissionRejected, admission
+from ..services.speculation import speculator
+from ..services.summarizer import prompt_context, summarizer
+from .chat_controller import (
+    _extract_platform_requests,
+    _get_or_create_session,
+    _log_detailed_interaction,
+    _save_assistant_message,
+    _save_user_message,
+)
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_WORDS = 8
+
+# Open connections in this worker
+active_connections = 0
+
+
+def reserve_connection() -> bool:
+    """Count a new connection unless the worker is full; check and increment with no await between them"""
+    global active_connections
+    if active_connections >= settings.WS_MAX_CONNECTIONS:
+        return False
+    active_connections += 1
+    metrics.WS_CONNECTIONS.inc()
+    return True
+
+
+def release_connection():
+    global active_connections
+    active_connections -= 1
+    metrics.WS_CONNECTIONS.dec()
+
+
+class LiveChatSession:
+    """Session state kept in memory for the lifetime of one connection."""
+
+    def __init__(self, repos, session_id: Optional[str] = None):
+        self.repos = repos
+        self.session_id = session_id
+        self.session: Optional[Dict[str, Any]] = None
+        self.preferences: Counter = Counter()
+        self._writes: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    async def open(self) -> str:
+        """Resolve or create the session; done on the first message so idle connections cost no I/O"""
+        if self.repos is None:
+            # Same degraded mode as POST /api/chat without a database
+            self.session, self.session_id = {"_id": None, "messages": []}, "test-session"
+        else:
+            self.session, self.session_id = await _get_or_create_session(self.repos.sessions, self.session_id)
+        self.session.setdefault("message_total", len(self.session.get("messages", [])))
+        self.preferences.update(self.session.get("user_preferences", {}).get("preferred_platforms", []))
+        return str(self.session_id)
+
+    async def turn(self, message: str) -> Dict[str, Any]:
+        # Without storage there is nothing to write (and no repositories to write to)
+        stored = self.repos is not None
+        if stored:
+            await self._persist(_save_user_message, self.repos.sessions, self.session_id, message)
+
+        try:
+            trends = await scraper.fetch_trending_formats_bounded()
+        except Exception as e:
+            logger.error(f"Trend analysis error: {e}")
+            trends = []
+
+        if self._unsummarized() > settings.CHAT_CONTEXT_MESSAGES:
+            await self._refresh_summary()
+        context = prompt_context(self.session)
+        # Without storage every connection shares the placeholder session id, so nothing is speculated
+        draft_key = self.session_id if stored else None
+        ai_resp = await speculator.take(draft_key, message)
+        if ai_resp is None:
+            async with admission.admit():
+                ai_resp = await ai_client.generate_reply(
+                    message=message, context=context, trends=trends, session_id=draft_key
+                )
+        self._append({"role": "user", "text": message})
+        self._append({"role": "assistant", "text": ai_resp.get("reply", "")})
+
+        requested = _extract_platform_requests(message)
+        new_platforms = [p for p in requested if p not in self.preferences]
+        self.preferences.update(requested)
+        if stored:
+            await self._persist(_save_assistant_message, self.repos.sessions, self.session_id, ai_resp)
+            await self._persist(_log_detailed_interaction, self.repos.analytics, self.session_id, message, ai_resp, trends)
+            if new_platforms:
+                await self._persist(self._save_preferences, new_platforms)
+            await self._persist(self._schedule_summary)
+        if not ai_resp.get("should_suggest"):
+            speculator.schedule(draft_key, message, ai_resp.get("reply", ""), context, trends, self.preferences)
+
+        return {
+            "session_id": str(self.session_id),
+            "reply": ai_resp.get("reply"),
+            "suggestions": ai_resp.get("suggestions", []),
+            "trends": trends[:5],
+            "should_suggest": ai_resp.get("should_suggest", False),
+            "missing_platforms": ai_resp.get("missing_platforms", []),
+            "fallback": ai_resp.get("fallback", False),
+            "preferred_platforms": [p for p, _ in self.preferences.most_common()],
+        }
+
+    def _append(self, message: Dict[str, Any]):
+        messages = self.session.setdefault("messages", [])
+        messages.append(message)
+        self.session["message_total"] += 1
+        # Memory stays bounded: older messages live in the summary
+        keep = settings.CHAT_CONTEXT_MESSAGES + settings.SUMMARY_KEEP_RECENT
+        if len(messages) > keep:
+            del messages[:len(messages) - keep]
+
+    def _unsummarized(self) -> int:
+        return self.session["message_total"] - self.session.get("summary_upto", 0)
+
+    async def _refresh_summary(self):
+        """Pick up the summary the background summarizer stored"""
+        if self.repos is None:
+            return
+        doc = await self.repos.sessions.summary_state(self.session_id, 0)
+        if doc:
+            self.session["summary"] = doc.get("summary")
+            self.session["summary_upto"] = doc.get("summary_upto", 0)
+
+    async def _save_preferences(self, platforms):
+        await self.repos.sessions.add_preferred_platforms(self.session_id, platforms)
+
+    async def _schedule_summary(self):
+        summarizer.schedule(self.repos.sessions, self.session_id)
+
+    async def _persist(self, func, *args):
+        """Queue a write; waits only when the queue is full (the database is falling behind)"""
+        if self.repos is None:
+            return
+        if self._writes is None:
+            self._writes = asyncio.Queue(maxsize=settings.WS_MAX_PENDING_WRITES)
+            self._writer = asyncio.create_task(self._write_loop(), name=f"chat-writer-{self.session_id}")
+        await self._writes.put((func, args))
+
+    async def _write_loop(self):
+        while True:
+            func, args = await self._writes.get()
+            try:
+                await func(*args)
+            except Exception as e:
+                logger.warning(f"Chat write for session {self.session_id} failed: {e}")
+            finally:
+                self._writes.task_done()
+
+    async def close(self):
+        """Flush queued writes, then stop the writer"""
+        if self._writer is None:
+            return
+        try:
+            await asyncio.wait_for(self._writes.join(), settings.WS_CLOSE_FLUSH_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropped {self._writes.qsize()} chat writes for session {self.session_id} on close")
+        self._writer.cancel()
+        await asyncio.gather(self._writer, return_exceptions=True)
+
+
+def _chunks(text: str, words: int = STREAM_CHUNK_WORDS):
+    parts = text.split(" ")
+    for i in range(0, len(parts), words):
+        yield " ".join(parts[i:i + words]) + (" " if i + words < len(parts) else "")
+
+
+async def serve_live_chat(websocket: WebSocket, repos, session_id: Optional[str], client_key: Optional[str]):
+    """Run one accepted connection until the client leaves or goes idle (counted by reserve_connection)"""
+    live = LiveChatSession(repos, session_id)
+    # Bounded inbox: a client cannot queue more turns than this while one is running
+    inbox: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_MAX_PENDING_MESSAGES)
+    send_lock = asyncio.Lock()
+    processor: Optional[asyncio.Task] = None
+
+    async def send(payload: Dict[str, Any]):
+        # A client that stops reading must not hold the turn forever
+        async with send_lock:
+            await asyncio.wait_for(
+                websocket.send_text(json.dumps(jsonable_encoder(payload))), settings.WS_SEND_TIMEOUT_SECONDS
+            )
+
+    async def process():
+        while True:
+            message = await inbox.get()
+            try:
+                if live.session is None:
+                    await send({"type": "session", "session_id": await live.open()})
+                admission.check_rate(str(live.session_id), client_key)
+                await send({"type": "status", "stage": "generating"})
+                reply = await live.turn(message)
+            except AdmissionRejected as e:
+                await send({"type": "error", "status": 429, "detail": f"Too many requests ({e.reason})",
+                            "retry_after": e.retry_after})
+                continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Live chat turn failed: {e}")
+                await send({"type": "error", "status": 500, "detail": "Failed to generate a reply"})
+                continue
+            for chunk in _chunks(reply.get("reply") or ""):
+                await send({"type": "delta", "text": chunk})
+            await send({"type": "reply", **reply})
+
+    try:
+        while True:
+            try:
+                received = await asyncio.wait_for(websocket.receive(), settings.WS_IDLE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1000, reason="idle timeout")
+                break
+            if received["type"] == "websocket.disconnect":
+                break
+            frame = received.get("text")
+            if frame is None:
+                await send({"type": "error", "status": 400, "detail": "Frames must be JSON text, not binary"})
+                continue
+            try:
+                frame = json.loads(frame)
+            except ValueError:
+                await send({"type": "error", "status": 400, "detail": "Frames must be JSON"})
+                continue
+            kind = frame.get("type") if isinstance(frame, dict) else None
+            if kind == "ping":
+                await send({"type": "pong", "ts": frame.get("ts")})
+                continue
+            if kind != "message" or not frame.get("message"):
+                await send({"type": "error", "status": 400, "detail": "Expected a message or ping frame"})
+                continue
+            if processor is None:
+                processor = asyncio.create_task(process(), name="live-chat-turns")
+            elif processor.done():
+                # The client stopped reading replies (send timed out); drop the connection
+                break
+            try:
+                inbox.put_nowait(frame["message"])
+            except asyncio.QueueFull:
+                metrics.WS_MESSAGES_REJECTED.inc()
+                await send({"type": "error", "status": 429, "detail": "Too many pending messages"})
+    except (WebSocketDisconnect, asyncio.TimeoutError):
+        pass
+    finally:
+        if processor is not None:
+            processor.cancel()
+            await asyncio.gather(processor, return_exceptions=True)
+        await live.close()
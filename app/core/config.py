@@ -5,13 +5,10 @@ except ImportError:
     from pydantic import BaseSettings
 
 from typing import Optional
-import os
 from pathlib import Path
 
-# Load .env explicitly
-from dotenv import load_dotenv
+# Project-root .env, with a .env in the working directory taking precedence
 env_path = Path(__file__).parent.parent.parent / ".env"
-load_dotenv(env_path)
 
 class Settings(BaseSettings):
     app: str = "Content Bot"
@@ -21,14 +18,147 @@ class Settings(BaseSettings):
     APP_PORT: int = 8000
     GEMINI_API_KEY: Optional[str] = None
 
+    # Storage for contents, chat sessions and analytics: auto (mongo if connected) | mongo | sqlite
+    STORAGE_BACKEND: str = "auto"
+    # Embedded SQLite backend (WAL, group-committed writes)
+    SQLITE_PATH: str = "content_bot.db"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BATCH_SIZE: int = 256
+    SQLITE_BATCH_WAIT_MS: float = 0
+    SQLITE_READ_THREADS: int = 4
+
+    # MongoDB connection pool, compression and driver monitoring
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None
+    MONGO_COMPRESSORS: str = ""
+    MONGO_MONITORING: bool = True
+
+    # Startup warmup budget before /ready reports ready regardless
+    WARMUP_TIMEOUT_SECONDS: float = 30.0
+
+    # Admin surface (profiling etc.); admin routes are disabled when unset
+    ADMIN_API_KEY: Optional[str] = None
+    PROFILER_MAX_SECONDS: int = 60
+    PROFILER_INTERVAL_MS: int = 10
+
+    # Trend snapshots shared between workers: auto (mongo if connected) | mongo | file | none
+    TREND_STORE: str = "auto"
+    TREND_STORE_PATH: str = ".trend_cache"
+    TREND_LEASE_SECONDS: int = 60
+    TREND_LEASE_WAIT_SECONDS: float = 5.0
+    # Local snapshot of the latest trends for warm starts ("" disables)
+    TREND_SNAPSHOT_PATH: str = ".trend_snapshot.bin"
+
+    # Circuit breakers; timeouts adapt below these ceilings from observed latency
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RECOVERY_SECONDS: float = 30.0
+    GEMINI_TIMEOUT_SECONDS: float = 30.0
+    SCRAPE_TIMEOUT_SECONDS: float = 10.0
+    TRENDS_TIMEOUT_SECONDS: float = 8.0
+
+    # Per-source refresh interval bounds for change-detecting scrapes
+    SCRAPE_MIN_INTERVAL_SECONDS: float = 900
+    SCRAPE_MAX_INTERVAL_SECONDS: float = 6 * 3600
+
+    # Trend crawl scheduler (comma-separated hashtag page URLs, one source each)
+    TREND_HASHTAG_SOURCES: str = "https://www.displaypurposes.com/,https://top-hashtags.com/instagram/"
+    CRAWL_DOMAIN_CONCURRENCY: int = 2
+    CRAWL_DOMAIN_INTERVAL_SECONDS: float = 1.0
+    # Clamped to TRENDS_TIMEOUT_SECONDS
+    CRAWL_SOURCE_BUDGET_SECONDS: float = 6.0
+    CRAWL_ROBOTS_TTL_SECONDS: int = 3600
+    CRAWL_USER_AGENT: str = "ContentBot/1.0 (trend crawler)"
+
+    # Admission control for LLM-backed endpoints (rates of 0 disable a limiter)
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_MAX_QUEUE: int = 64
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 5.0
+    SESSION_RATE_PER_MINUTE: float = 20
+    SESSION_RATE_BURST: int = 5
+    API_KEY_RATE_PER_MINUTE: float = 120
+    API_KEY_RATE_BURST: int = 20
+
+    # Reuse of stored generations for near-duplicate post requests
+    SIMILARITY_CACHE_ENABLED: bool = True
+    SIMILARITY_THRESHOLD: float = 0.92
+    SIMILARITY_CAPACITY: int = 2000
+    SIMILARITY_DIM: int = 1024
+    SIMILARITY_INDEX_PATH: str = ".similarity_index.npz"
+    SIMILARITY_SAVE_INTERVAL_SECONDS: float = 300
+    # Stored generations older than this are never reused (0 = kept until evicted)
+    SIMILARITY_TTL_SECONDS: float = 7 * 24 * 3600
+
+    # Speculative drafts of the post a conversational turn is likely to be followed by
+    SPECULATION_ENABLED: bool = True
+    SPECULATION_MIN_SCORE: float = 0.6
+    SPECULATION_MAX_PLATFORMS: int = 2
+    SPECULATION_BUDGET_PER_HOUR: float = 120
+    SPECULATION_BUDGET_BURST: int = 10
+    SPECULATION_RESERVE_SLOTS: int = 4
+    SPECULATION_TTL_SECONDS: float = 900
+    SPECULATION_MAX_SESSIONS: int = 1000
+
+    # Batch generation jobs
+    JOB_WORKERS: int = 4
+    JOB_MAX_ITEMS: int = 500
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_ITEM_LEASE_SECONDS: int = 120
+    JOB_RETRY_BACKOFF_SECONDS: float = 10
+    # LLM slots batch items leave free for interactive requests
+    JOB_RESERVE_SLOTS: int = 2
+    # Unfinished items one caller (API key or client address) may have queued
+    JOB_MAX_OPEN_ITEMS_PER_CALLER: int = 1000
+
+    # Chat prompt context: raw messages in the prompt, and rolling summaries of older turns
+    CHAT_CONTEXT_MESSAGES: int = 8
+    SUMMARY_ENABLED: bool = True
+    SUMMARY_KEEP_RECENT: int = 4
+    SUMMARY_MAX_CHARS: int = 1500
+    # LLM slots summaries leave free for interactive requests
+    SUMMARY_RESERVE_SLOTS: int = 2
+
+    # WebSocket chat (/api/chat/ws)
+    WS_MAX_CONNECTIONS: int = 10000
+    WS_IDLE_TIMEOUT_SECONDS: float = 300
+    WS_SEND_TIMEOUT_SECONDS: float = 10
+    WS_MAX_PENDING_MESSAGES: int = 4
+    WS_MAX_PENDING_WRITES: int = 100
+    WS_CLOSE_FLUSH_SECONDS: float = 5
+
+    # Cold session archival into chats_archive
+    ARCHIVE_ENABLED: bool = True
+    ARCHIVE_IDLE_DAYS: float = 7
+    ARCHIVE_INTERVAL_SECONDS: int = 3600
+    ARCHIVE_BATCH_SIZE: int = 500
+
+    # HTTP caching for read endpoints (seconds a client or CDN may reuse a response unvalidated)
+    CONTENT_CACHE_MAX_AGE_SECONDS: int = 0
+
+    # Idempotency-Key handling for POST /api/chat and POST /contents
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600
+    IDEMPOTENCY_LEASE_SECONDS: int = 120
+    IDEMPOTENCY_WAIT_SECONDS: float = 30
+    # Keys kept per process when there is no Mongo to share them
+    IDEMPOTENCY_MEMORY_KEYS: int = 10000
+
+    # Opt-in capture of sampled /api/chat and /contents traffic for scripts/replay_capture.py
+    CAPTURE_ENABLED: bool = False
+    CAPTURE_SAMPLE_RATE: float = 0.05
+    CAPTURE_PATH: str = "captures/traffic.jsonl"
+    CAPTURE_MAX_BYTES: int = 50 * 1024 * 1024
+    CAPTURE_BACKUP_COUNT: int = 5
+    CAPTURE_REDACT: str = "mask"  # mask | full | none
+    CAPTURE_REDACT_FIELDS: str = "message,title,body,q"
+    CAPTURE_SALT: Optional[str] = None
+
+    # Streaming NDJSON exports: documents fetched per Mongo cursor batch
+    EXPORT_BATCH_SIZE: int = 1000
+
     class Config:
-        env_file = ".env"
+        env_file = (str(env_path), ".env")
         case_sensitive = False
+        extra = "ignore"
 
 settings = Settings()
-
-# Debug: print if GEMINI_API_KEY is loaded
-if settings.GEMINI_API_KEY:
-    print(f"✓ GEMINI_API_KEY loaded: {settings.GEMINI_API_KEY[:20]}...")
-else:
-    print("✗ GEMINI_API_KEY not found")
\ No newline at end of file
@@ -0,0 +1,95 @@
+# core/http_cache.py
+"""Conditional GET support: ETags, Last-Modified and 304 responses.
+
+Handlers first work out a cheap version of the resource (an ``updated_at``,
+a trend refresh time) and check it against the request's ``If-None-Match`` /
+``If-Modified-Since``. A match is answered with 304 before the body is loaded
+or serialized. ``If-None-Match`` takes precedence, as RFC 9110 requires.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from . import metrics
+
+
+def make_etag(*parts, weak: bool = False) -> str:
+    """An opaque entity tag derived from the parts that identify one version of a resource"""
+    key = "|".join(str(part) for part in parts)
+    tag = f'"{hashlib.sha1(key.encode()).hexdigest()[:20]}"'
+    return f"W/{tag}" if weak else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison, which is what If-None-Match uses"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any((tag[2:] if tag.startswith("W/") else tag) == opaque for tag in candidates)
+
+
+def _utc(dt: datetime) -> datetime:
+    # Mongo hands back naive UTC datetimes
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def http_date(dt: datetime) -> str:
+    return format_datetime(_utc(dt), usegmt=True)
+
+
+def _modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        # An unparseable date is ignored
+        return True
+    # HTTP dates have one second resolution
+    return _utc(last_modified).replace(microsecond=0) > _utc(since)
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None,
+                  cache_control: Optional[str] = None) -> Dict[str, str]:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return headers
+
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None,
+                 cache_control: Optional[str] = None) -> Optional[Response]:
+    """A 304 response if the client's copy is current, else None"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = etag_matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        fresh = bool(if_modified_since) and last_modified is not None and not _modified_since(
+            if_modified_since, last_modified
+        )
+    if not fresh:
+        return None
+    route = request.scope.get("route")
+    metrics.HTTP_NOT_MODIFIED.labels(getattr(route, "path", request.url.path)).inc()
+    return Response(status_code=304, headers=cache_headers(etag, last_modified, cache_control))
+
+
+def cached_json(content: Any, etag: str, last_modified: Optional[datetime] = None,
+                cache_control: Optional[str] = None) -> JSONResponse:
+    return JSONResponse(jsonable_encoder(content), headers=cache_headers(etag, last_modified, cache_control))
+
+
+def revalidate_policy(max_age: int) -> str:
+    """Cache-Control for shared resources: cache for ``max_age`` seconds, then revalidate"""
+    if max_age <= 0:
+        return "public, no-cache"
+    return f"public, max-age={max_age}, must-revalidate"
@@ -0,0 +1,199 @@
+# core/metrics.py
+"""Prometheus metrics shared across the app.
+
+Everything registers on the default registry. main.py serves it at /metrics
+with ``prometheus_client.generate_latest``, next to the HTTP metrics the
+lazily built Instrumentator middleware records.
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+# Circuit breakers / adaptive timeouts (services/resilience.py)
+BREAKER_STATE = Gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state per dependency (0=closed, 1=half_open, 2=open)",
+    ["dependency"],
+)
+BREAKER_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total",
+    "Circuit breaker state transitions",
+    ["dependency", "state"],
+)
+BREAKER_REJECTIONS = Counter(
+    "circuit_breaker_rejections_total",
+    "Calls short-circuited to a fallback because the breaker was open",
+    ["dependency"],
+)
+DEPENDENCY_TIMEOUT = Gauge(
+    "dependency_timeout_seconds",
+    "Current adaptive timeout per dependency",
+    ["dependency"],
+)
+DEPENDENCY_LATENCY = Histogram(
+    "dependency_latency_seconds",
+    "Latency of calls to upstream dependencies",
+    ["dependency", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32),
+)
+
+# Admission control for LLM-backed endpoints (services/admission.py)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "admission_queue_wait_seconds",
+    "Time requests waited for an LLM concurrency slot",
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Requests rejected with 429 by admission control",
+    ["reason"],
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "LLM-backed requests currently holding a concurrency slot",
+)
+ADMISSION_QUEUED = Gauge(
+    "admission_queue_depth",
+    "Requests waiting for an LLM concurrency slot",
+)
+
+# MongoDB driver monitoring (db_monitoring.py)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command latency by collection and operation",
+    ["collection", "command", "outcome"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    "mongo_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the pool",
+    ["outcome"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+MONGO_POOL_IN_USE = Gauge(
+    "mongo_pool_connections_in_use",
+    "Connections currently checked out of the pool",
+    ["address"],
+)
+MONGO_POOL_OPEN = Gauge(
+    "mongo_pool_connections_open",
+    "Open connections in the pool",
+    ["address"],
+)
+MONGO_HEARTBEAT_DURATION = Histogram(
+    "mongo_server_heartbeat_seconds",
+    "Server heartbeat round-trip time",
+    ["address", "outcome"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+
+# Near-duplicate prompt reuse (services/similarity.py)
+SIMILARITY_LOOKUPS = Counter(
+    "similarity_cache_lookups_total",
+    "Similarity index lookups for platform post requests",
+    ["result"],
+)
+
+# Conditional / change-detecting scraping (services/conditional_fetch.py)
+SCRAPE_BYTES_SAVED = Counter(
+    "scrape_bytes_saved_total",
+    "Response bytes not downloaded thanks to 304s or skipped refreshes",
+    ["source"],
+)
+SCRAPE_PARSES_SKIPPED = Counter(
+    "scrape_parses_skipped_total",
+    "Scrapes whose parse was skipped because the source had not changed",
+    ["source", "reason"],
+)
+
+# Trend source crawl scheduler (services/trend_sources.py)
+TREND_SOURCE_DURATION = Histogram(
+    "trend_source_duration_seconds",
+    "Time spent collecting from each trend source",
+    ["source", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32),
+)
+CRAWL_ROBOTS_BLOCKED = Counter(
+    "crawl_robots_blocked_total",
+    "Fetches skipped because robots.txt disallows them",
+    ["domain"],
+)
+
+# Prompt size per LLM call (services/ai_client.py)
+LLM_PROMPT_CHARS = Histogram(
+    "llm_prompt_chars",
+    "Characters in prompts sent to the LLM",
+    ["kind"],
+    buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000, 64000),
+)
+
+# WebSocket chat (controllers/live_chat_controller.py)
+WS_CONNECTIONS = Gauge(
+    "chat_ws_connections",
+    "Open chat WebSocket connections in this worker",
+)
+WS_MESSAGES_REJECTED = Counter(
+    "chat_ws_messages_rejected_total",
+    "Chat WebSocket messages rejected because too many turns were pending",
+)
+
+# Cold session archival (services/archiver.py)
+SESSIONS_ARCHIVED = Counter(
+    "chat_sessions_archived_total",
+    "Chat sessions moved to the compressed archive",
+)
+SESSIONS_REHYDRATED = Counter(
+    "chat_sessions_rehydrated_total",
+    "Archived chat sessions restored on read",
+)
+ARCHIVE_BYTES_SAVED = Counter(
+    "chat_archive_bytes_saved_total",
+    "BSON bytes saved by compressing archived sessions",
+)
+
+# Idempotency keys (services/idempotency.py)
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total",
+    "Requests sent with an Idempotency-Key, by whether the work ran or was reused",
+    ["outcome"],
+)
+
+# Conditional requests (core/http_cache.py)
+HTTP_NOT_MODIFIED = Counter(
+    "http_not_modified_total",
+    "Requests answered with 304 Not Modified",
+    ["route"],
+)
+
+# Embedded SQLite storage (repositories/sqlite.py)
+SQLITE_WRITE_BATCH = Histogram(
+    "sqlite_write_batch_size",
+    "Writes committed together in one SQLite transaction",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+SQLITE_COMMIT_DURATION = Histogram(
+    "sqlite_commit_duration_seconds",
+    "Time to apply and commit one batch of SQLite writes",
+)
+
+# Speculative post drafts (services/speculation.py)
+SPECULATIVE_DRAFTS = Counter(
+    "speculative_drafts_total",
+    "Speculative platform drafts: generated, failed, served to a follow-up, or wasted",
+    ["outcome"],
+)
+SPECULATION_LOOKUPS = Counter(
+    "speculation_lookups_total",
+    "Platform post requests answered from a speculative draft (hit) or generated fresh (miss)",
+    ["result"],
+)
+SPECULATION_SKIPPED = Counter(
+    "speculation_skipped_total",
+    "Speculative drafts not generated, by reason (budget, busy)",
+    ["reason"],
+)
+
+# Traffic capture (services/capture.py)
+TRAFFIC_CAPTURED = Counter(
+    "traffic_captured_total",
+    "Sampled requests written to the capture file, or dropped because the writer fell behind",
+    ["outcome"],
+)
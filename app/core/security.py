@@ -0,0 +1,31 @@
+# core/security.py
+from typing import Optional
+from fastapi import Header, HTTPException
+from .config import settings
+
+
+def is_admin_key(api_key: Optional[str]) -> bool:
+    """True when admin routes are enabled and the key matches."""
+    return bool(settings.ADMIN_API_KEY) and api_key == settings.ADMIN_API_KEY
+
+
+def client_key(request) -> Optional[str]:
+    """Identity for per-key rate limits: the API key, or the client address without one"""
+    return request.headers.get("x-api-key") or (request.client.host if request.client else None)
+
+
+def too_many_requests(e) -> HTTPException:
+    """429 for an AdmissionRejected, with its Retry-After hint"""
+    return HTTPException(
+        status_code=429,
+        detail=f"Too many requests ({e.reason})",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+async def require_admin(x_api_key: Optional[str] = Header(None)):
+    """Dependency guarding admin-only routes with the ADMIN_API_KEY setting."""
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if x_api_key != settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
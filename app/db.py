@@ -1,20 +1,44 @@
-# Import the AsyncIOMotorClient from the motor library for asynchronous MongoDB connections.
-from motor.motor_asyncio import AsyncIOMotorClient
 # Import the Optional type hint from the typing module.
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 # Import the settings object from the core.config module.
 from .core.config import settings
 
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
 # Declare a global variable 'client' of type AsyncIOMotorClient, initially set to None.
-client: Optional[AsyncIOMotorClient] = None
+client: Optional["AsyncIOMotorClient"] = None
+
+# Build the driver options (timeouts, pool sizing, compression, monitoring) from the settings.
+def mongo_client_options() -> dict:
+    options = {
+        "serverSelectionTimeoutMS": 5000,
+        "connectTimeoutMS": 5000,
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+    }
+    if settings.MONGO_MAX_IDLE_TIME_MS is not None:
+        options["maxIdleTimeMS"] = settings.MONGO_MAX_IDLE_TIME_MS
+    if settings.MONGO_WAIT_QUEUE_TIMEOUT_MS is not None:
+        options["waitQueueTimeoutMS"] = settings.MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if settings.MONGO_COMPRESSORS:
+        # e.g. "zstd,snappy,zlib"; the server picks the first one it supports
+        options["compressors"] = settings.MONGO_COMPRESSORS
+    if settings.MONGO_MONITORING:
+        # Command, pool and heartbeat listeners feeding the Prometheus metrics
+        from .db_monitoring import event_listeners
+        options["event_listeners"] = event_listeners()
+    return options
 
 # Asynchronous function to connect to the MongoDB database.
 async def connect_to_mongo(app):
     # Access the global 'client' variable.
     global client
     try:
-        # Create an instance of AsyncIOMotorClient using the MONGO_URI from the settings.
-        client = AsyncIOMotorClient(settings.MONGO_URI, serverSelectionTimeoutMS=5000, connectTimeoutMS=5000)
+        # Import motor (and pymongo) on first connect rather than at app import.
+        from motor.motor_asyncio import AsyncIOMotorClient
+        # Create an instance of AsyncIOMotorClient using the MONGO_URI and pool settings.
+        client = AsyncIOMotorClient(settings.MONGO_URI, **mongo_client_options())
         # Test the connection
         await client.admin.command('ismaster')
         # Assign the database instance to the app's state for access in other parts of the application.
@@ -35,4 +59,39 @@ async def close_mongo_connection(app):
         # Close the MongoDB connection.
         client.close()
         # Print a confirmation message to the console.
-        print("Disconnected from MongoDB")
\ No newline at end of file
+        print("Disconnected from MongoDB")
+# Asynchronous function to create the indexes the hot queries rely on, concurrently.
+async def ensure_indexes(db):
+    # Import asyncio to run the index builds in parallel.
+    import asyncio
+    # Each index backs a sort/filter used by the routers and controllers.
+    results = await asyncio.gather(
+        db.contents.create_index([("created_at", -1)]),
+        # Newest update for the GET /contents/ validator
+        db.contents.create_index([("updated_at", -1)]),
+        # Full-text index for GET /contents/search; titles weigh more than bodies.
+        db.contents.create_index(
+            [("title", "text"), ("body", "text")], weights={"title": 3, "body": 1}, name="contents_text"
+        ),
+        db.chats.create_index([("updated_at", -1)]),
+        db.interaction_analytics.create_index([("session_id", 1), ("timestamp", -1)]),
+        # Keyset order of the analytics export (time, _id); the chats export pages on _id.
+        db.interaction_analytics.create_index([("timestamp", 1), ("_id", 1)]),
+        return_exceptions=True,
+    )
+    # Report failures without stopping startup; the app works without them, just slower.
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Index creation failed: {result}")
+
+# 503 detail for Mongo-only endpoints on the SQLite backend: the feature is missing, not down.
+MONGO_ONLY_DETAIL = "Requires MongoDB; not available with STORAGE_BACKEND=sqlite (see README, Storage Backends)"
+
+# Return the Mongo database for an endpoint that needs it, or fail with 503.
+def require_mongo(request):
+    db = request.app.state.db
+    if db is None:
+        from fastapi import HTTPException
+        sqlite = settings.STORAGE_BACKEND.lower() == "sqlite"
+        raise HTTPException(status_code=503, detail=MONGO_ONLY_DETAIL if sqlite else "Database not available")
+    return db
@@ -0,0 +1,105 @@
+# pymongo monitoring listeners that feed the Prometheus metrics in core/metrics.py.
+# Imported from connect_to_mongo only, so pymongo stays out of app import time.
+import threading
+import time
+
+from pymongo import monitoring
+
+from .core import metrics
+
+# Commands whose first field is not a collection name
+_NON_COLLECTION_COMMANDS = {"ismaster", "isMaster", "hello", "ping", "endSessions", "buildInfo", "saslStart", "saslContinue"}
+
+
+def _address(address) -> str:
+    host, port = address
+    return f"{host}:{port}"
+
+
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        collection = "admin"
+        if event.command_name not in _NON_COLLECTION_COMMANDS:
+            value = event.command.get(event.command_name)
+            if event.command_name == "getMore":
+                # {"getMore": <cursor id>, "collection": <name>}
+                value = event.command.get("collection")
+            if isinstance(value, str):
+                collection = value
+        self._pending[(event.request_id, event.connection_id)] = collection
+
+    def _observe(self, event, outcome):
+        collection = self._pending.pop((event.request_id, event.connection_id), "unknown")
+        # duration_micros is measured by the driver around the wire round trip
+        metrics.MONGO_COMMAND_DURATION.labels(collection, event.command_name, outcome).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._observe(event, "success")
+
+    def failed(self, event):
+        self._observe(event, "failure")
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        # Checkout start and finish are reported on the same (executor) thread
+        self._checkout_started = threading.local()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        metrics.MONGO_POOL_OPEN.labels(_address(event.address)).inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        metrics.MONGO_POOL_OPEN.labels(_address(event.address)).dec()
+
+    def connection_check_out_started(self, event):
+        self._checkout_started.value = time.perf_counter()
+
+    def _checkout_wait(self, outcome):
+        started = getattr(self._checkout_started, "value", None)
+        if started is not None:
+            metrics.MONGO_POOL_CHECKOUT_WAIT.labels(outcome).observe(time.perf_counter() - started)
+            self._checkout_started.value = None
+
+    def connection_check_out_failed(self, event):
+        self._checkout_wait("failure")
+
+    def connection_checked_out(self, event):
+        self._checkout_wait("success")
+        metrics.MONGO_POOL_IN_USE.labels(_address(event.address)).inc()
+
+    def connection_checked_in(self, event):
+        metrics.MONGO_POOL_IN_USE.labels(_address(event.address)).dec()
+
+
+class HeartbeatMetrics(monitoring.ServerHeartbeatListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        metrics.MONGO_HEARTBEAT_DURATION.labels(_address(event.connection_id), "success").observe(event.duration)
+
+    def failed(self, event):
+        metrics.MONGO_HEARTBEAT_DURATION.labels(_address(event.connection_id), "failure").observe(event.duration)
+
+
+def event_listeners():
+    """Listeners to pass to AsyncIOMotorClient(event_listeners=...)"""
+    return [CommandMetrics(), PoolMetrics(), HeartbeatMetrics()]
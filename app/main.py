@@ -1,27 +1,121 @@
 # app/main.py
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from prometheus_fastapi_instrumentator import Instrumentator
+from fastapi.responses import JSONResponse, Response
 from .core.config import settings
-from .db import connect_to_mongo, close_mongo_connection
-from .routers import content_router, chat_router
+from .db import connect_to_mongo, close_mongo_connection, ensure_indexes
+from .repositories import configure_repositories
+from .services.trend_store import configure_trend_store
+from .services.job_worker import job_pool
+from .services.hashtags import hashtag_series
+from .services.archiver import session_archiver
+from .services.idempotency import idempotency_store
+from .middleware import CaptureTrafficMiddleware, MetricsMiddleware, ProfileRequestMiddleware
+from .routers import content_router, chat_router, admin_router, jobs_router, analytics_router, export_router
 
 logger = logging.getLogger("uvicorn.error")
 
-def create_app():
-    app = FastAPI(title="Content Bot API")
 
-    @app.on_event("startup")
-    async def startup_event():
-        await connect_to_mongo(app)
-        logger.info("Connected to MongoDB")
+async def warmup(app: FastAPI):
+    """Connect storage, initialize the LLM client and prefetch trends in parallel.
+
+    Marks the app ready when done, whatever the outcome: each step already has a
+    degraded mode (no DB, mock LLM, fallback trends). ``/ready`` reports which
+    steps succeeded; a step still running after the timeout counts as failed
+    until it finishes.
+    """
+    checks = app.state.checks
+    storage_ready = asyncio.Event()
+
+    async def init_storage():
+        try:
+            # The embedded SQLite backend runs without a Mongo server
+            if settings.STORAGE_BACKEND.lower() != "sqlite":
+                await connect_to_mongo(app)
+            app.state.repos = await configure_repositories(app.state.db)
+            await configure_trend_store(app.state.db)
+        finally:
+            storage_ready.set()
+        checks["storage"] = app.state.repos is not None
+        if app.state.db is not None:
+            await asyncio.gather(
+                ensure_indexes(app.state.db), job_pool.start(app.state.db), hashtag_series.configure(app.state.db),
+                session_archiver.start(app.state.db), idempotency_store.configure(app.state.db),
+            )
+
+    async def init_llm():
+        from .services.ai_client import ai_client
+        checks["llm"] = await ai_client.warmup()
+        if settings.SIMILARITY_CACHE_ENABLED:
+            from .services.similarity import similarity_index
+            await asyncio.to_thread(similarity_index.load)
+            similarity_index.start(settings.SIMILARITY_SAVE_INTERVAL_SECONDS)
+
+    async def prefetch_trends():
+        from .services.scraper import fetch_trending_formats, trend_analyzer
+        # Serve the last local snapshot until the first refresh completes
+        await asyncio.to_thread(trend_analyzer.load_snapshot)
+        # Wait for the shared trend store so a warm snapshot from another worker is reused
+        await storage_ready.wait()
+        checks["trends"] = bool(await fetch_trending_formats())
+
+    steps = app.state.warmup_steps = [
+        asyncio.create_task(init_storage(), name="warmup-storage"),
+        asyncio.create_task(init_llm(), name="warmup-llm"),
+        asyncio.create_task(prefetch_trends(), name="warmup-trends"),
+    ]
+    done, pending = await asyncio.wait(steps, timeout=settings.WARMUP_TIMEOUT_SECONDS)
+    for task in done:
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Warmup step {task.get_name()} failed: {task.exception()}")
+    if pending:
+        # Slow steps keep running in the background; they are cancelled on shutdown
+        logger.warning(f"Warmup did not finish within {settings.WARMUP_TIMEOUT_SECONDS}s, serving anyway")
+    app.state.ready = True
+    logger.info(f"Warmup complete: {checks}")
+
 
-    @app.on_event("shutdown")
-    async def shutdown_event():
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.db = None
+    app.state.repos = None
+    app.state.ready = False
+    app.state.checks = {"storage": False, "llm": False, "trends": False}
+    # Warm up in the background so liveness answers immediately; /ready gates traffic
+    app.state.warmup_steps = []
+    warmup_task = asyncio.create_task(warmup(app))
+    try:
+        yield
+    finally:
+        tasks = [warmup_task, *app.state.warmup_steps]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await job_pool.stop()
+        await session_archiver.stop()
+        from .services.summarizer import summarizer
+        await summarizer.stop()
+        from .services.speculation import speculator
+        await speculator.stop()
+        if settings.CAPTURE_ENABLED:
+            from .services.capture import traffic_capture
+            await asyncio.to_thread(traffic_capture.close)
+        if settings.SIMILARITY_CACHE_ENABLED:
+            from .services.similarity import similarity_index
+            await similarity_index.stop()
+            similarity_index.save()
+        if app.state.repos is not None:
+            await app.state.repos.close()
         await close_mongo_connection(app)
         logger.info("MongoDB connection closed")
 
+
+def create_app():
+    app = FastAPI(title="Content Bot API", lifespan=lifespan)
+
     # Add CORS middleware
     app.add_middleware(
         CORSMiddleware,
@@ -30,22 +124,52 @@ def create_app():
         allow_headers=["*"],
     )
 
+    # Per-request sampling profiles (admin key + "X-Profile: 1" header)
+    app.add_middleware(ProfileRequestMiddleware)
+
+    # Sampled traffic capture for offline replay (opt-in)
+    if settings.CAPTURE_ENABLED:
+        app.add_middleware(CaptureTrafficMiddleware)
+
     # Instrument the app with Prometheus metrics
-    Instrumentator().instrument(app).expose(app)
+    app.add_middleware(MetricsMiddleware)
 
     # Include routers - use the router objects directly
     app.include_router(content_router)
     app.include_router(chat_router)
+    app.include_router(admin_router)
+    app.include_router(jobs_router)
+    app.include_router(analytics_router)
+    app.include_router(export_router)
+
+    @app.get("/metrics")
+    def metrics():
+        from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+        return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
 
     # Add health check endpoint
     @app.get("/")
     async def root():
         return {"message": "Content Bot API is running"}
 
+    # Liveness: the process is up and the event loop responds. Keep it free of I/O.
     @app.get("/health")
     async def health_check():
         return {"status": "healthy"}
 
+    # Readiness: warmup finished, so requests are served from warm caches.
+    @app.get("/ready")
+    async def readiness_check():
+        checks = app.state.checks
+        if not getattr(app.state, "ready", False):
+            return JSONResponse({"status": "starting", "checks": checks}, status_code=503)
+        if not any(checks.values()):
+            # Every step failed or timed out: only mock replies would be served
+            return JSONResponse({"status": "failed", "checks": checks}, status_code=503)
+        if not all(checks.values()):
+            return {"status": "degraded", "checks": checks}
+        return {"status": "ready", "checks": checks}
+
     return app
 
-app = create_app()
\ No newline at end of file
+app = create_app()
@@ -71,3 +71,119 @@ class SimpleAuthMiddleware(BaseHTTPMiddleware):
                 return JSONResponse({"detail": "Unauthorized"}, status_code=401)
         # If the authentication is successful or not required, call the next middleware or request handler.
         return await call_next(request)
+
+# Pure ASGI middleware that profiles a single request when it carries "X-Profile: 1"
+# and a valid admin key. Requests without the header pass straight through, so the
+# cost when profiling is off is one header scan.
+from .core.config import settings
+from .core.security import is_admin_key
+
+
+class ProfileRequestMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile") != b"1" or not is_admin_key(headers.get(b"x-api-key", b"").decode("latin-1")):
+            return await self.app(scope, receive, send)
+
+        # Import lazily so the profiler is only loaded when someone asks for it.
+        from .services.profiler import profiler
+        sampler = profiler.start_request(settings.PROFILER_INTERVAL_MS / 1000.0)
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", sampler.profile_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.finish_request(sampler)
+
+
+# HTTP request metrics from prometheus_fastapi_instrumentator. The instrumentator
+# is imported on the first request rather than when the app is built, so it
+# stays out of app import time (scripts/bench_startup.py).
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._instrumented = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if self._instrumented is None:
+            from prometheus_fastapi_instrumentator.middleware import PrometheusInstrumentatorMiddleware
+            self._instrumented = PrometheusInstrumentatorMiddleware(self.app)
+        await self._instrumented(scope, receive, send)
+
+
+# Pure ASGI middleware that records sampled /api/chat and /contents requests for
+# offline replay (services/capture.py). Only installed when CAPTURE_ENABLED is set.
+CAPTURE_PREFIXES = ("/api/chat", "/contents")
+
+
+class CaptureTrafficMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(CAPTURE_PREFIXES):
+            return await self.app(scope, receive, send)
+
+        from .services.capture import MAX_CAPTURED_BODY, traffic_capture
+
+        method, path = scope["method"], scope["path"]
+        key, pending = traffic_capture.request_key(method, path, scope.get("query_string", b""))
+        if not pending and not traffic_capture.sampled(key):
+            return await self.app(scope, receive, send)
+        # Pending: the key is in the request body (a chat turn) or only in the response (something new)
+        decision = {"sampled": None if pending else True}
+
+        started = time.time()
+        start = time.perf_counter()
+        request_body = bytearray()
+        response_body = bytearray()
+        response = {"status": 500, "bytes": 0}
+
+        async def receive_and_keep():
+            message = await receive()
+            if message["type"] == "http.request" and decision["sampled"] is not False:
+                if len(request_body) <= MAX_CAPTURED_BODY:
+                    request_body.extend(message.get("body", b""))
+                if decision["sampled"] is None and not message.get("more_body"):
+                    body_key = traffic_capture.body_key(path, bytes(request_body))
+                    if body_key is not None:
+                        decision["sampled"] = traffic_capture.sampled(body_key)
+                        if not decision["sampled"]:
+                            request_body.clear()
+            return message
+
+        async def send_and_keep(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                response["bytes"] += len(chunk)
+                if decision["sampled"] is not False and len(response_body) <= MAX_CAPTURED_BODY:
+                    response_body.extend(chunk)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_keep, send_and_keep)
+        finally:
+            if decision["sampled"] is None:
+                decision["sampled"] = traffic_capture.sampled(traffic_capture.response_key(path, bytes(response_body)))
+            if decision["sampled"]:
+                traffic_capture.record(
+                    method, path, scope.get("query_string", b""), dict(scope.get("headers") or []),
+                    started, time.perf_counter() - start, bytes(request_body),
+                    response["status"], bytes(response_body), response["bytes"],
+                )
@@ -42,8 +42,8 @@ class ContentUpdate(BaseModel):
     body: Optional[str] = Field(None, max_length=5000)
 # Import BaseModel and Field from pydantic for data validation and settings management.
 from pydantic import BaseModel, Field
-# Import Optional for defining optional fields.
-from typing import Optional
+# Import Optional and List for defining optional and list fields.
+from typing import Optional, List
 # Import datetime for handling date and time.
 from datetime import datetime
 
@@ -73,3 +73,15 @@ class ContentUpdate(BaseModel):
     title: Optional[str] = Field(None, max_length=100)
     # Optional new body for the content, with a maximum length of 5000 characters.
     body: Optional[str] = Field(None, max_length=5000)
+
+# Search result: a content item plus its relevance score.
+class ContentSearchResult(ContentResponse):
+    # Text relevance score from the full-text index (higher is more relevant).
+    score: float
+
+# Page of search results with an opaque cursor for the next page.
+class ContentSearchResponse(BaseModel):
+    # Results ordered by descending relevance.
+    results: List[ContentSearchResult]
+    # Cursor to pass back for the next page, None when there are no more results.
+    next_cursor: Optional[str] = None
@@ -0,0 +1,16 @@
+# repositories/__init__.py
+from .base import (
+    AnalyticsRepository,
+    ContentRepository,
+    Repositories,
+    SessionRepository,
+    configure_repositories,
+)
+
+__all__ = [
+    "AnalyticsRepository",
+    "ContentRepository",
+    "Repositories",
+    "SessionRepository",
+    "configure_repositories",
+]
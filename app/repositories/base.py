@@ -0,0 +1,147 @@
+# repositories/base.py
+"""Storage interfaces for contents, chat sessions and interaction analytics.
+
+Controllers talk to these instead of Motor collections, so the same code runs
+on MongoDB or on an embedded SQLite file (single-node and edge deployments).
+IDs are ObjectId-shaped strings on every backend. Features that depend on
+Mongo specifics (exports, session archival, batch jobs, the message window
+endpoint) keep using ``app.state.db`` and are unavailable without Mongo.
+"""
+import abc
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def encode_search_cursor(score: float, content_id: str) -> str:
+    raw = json.dumps({"s": score, "id": content_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, str]:
+    """Raises ValueError for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return float(data["s"]), str(data["id"])
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+class ContentRepository(abc.ABC):
+    @abc.abstractmethod
+    async def create(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        ...
+
+    @abc.abstractmethod
+    async def get(self, content_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abc.abstractmethod
+    async def version(self, content_id: str) -> Optional[datetime]:
+        """Last update, without loading the body; None if it does not exist"""
+
+    @abc.abstractmethod
+    async def list(self, skip: int, limit: int) -> List[Dict[str, Any]]:
+        """Newest first"""
+
+    @abc.abstractmethod
+    async def list_version(self) -> Dict[str, Any]:
+        """``count`` and newest ``updated_at``; any insert, update or delete changes one of them"""
+
+    @abc.abstractmethod
+    async def update(self, content_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, content_id: str) -> bool:
+        ...
+
+    @abc.abstractmethod
+    async def search(self, query: str, limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Ranked full-text search on title/body, keyset-paginated on (score, id)"""
+
+
+class SessionRepository(abc.ABC):
+    @abc.abstractmethod
+    async def get_or_create(self, session_id: Optional[str], tail: int) -> Tuple[Dict[str, Any], str]:
+        """The session with only its last ``tail`` messages plus ``message_total``; a new one if unknown"""
+
+    @abc.abstractmethod
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Full session document"""
+
+    @abc.abstractmethod
+    async def recent(self, limit: int) -> List[Dict[str, Any]]:
+        """Most recently updated sessions as ``{"session_id", "messages"}``"""
+
+    @abc.abstractmethod
+    async def add_user_message(self, session_id: str, message: Dict[str, Any]):
+        ...
+
+    @abc.abstractmethod
+    async def add_assistant_message(self, session_id: str, message: Dict[str, Any],
+                                    suggestions: List[Dict[str, Any]]):
+        """Append the reply and fold its suggestions into the session's suggestion stats"""
+
+    @abc.abstractmethod
+    async def add_preferred_platforms(self, session_id: str, platforms: List[str]):
+        ...
+
+    @abc.abstractmethod
+    async def summary_state(self, session_id: str, fold_limit: int) -> Optional[Dict[str, Any]]:
+        """``summary``, ``summary_upto``, ``message_total`` and up to ``fold_limit`` unsummarized messages"""
+
+    @abc.abstractmethod
+    async def save_summary(self, session_id: str, expected_upto: int, summary: str, upto: int) -> bool:
+        """Store a summary unless another writer advanced it past ``expected_upto`` meanwhile"""
+
+
+class AnalyticsRepository(abc.ABC):
+    @abc.abstractmethod
+    async def log_interaction(self, doc: Dict[str, Any]):
+        ...
+
+    @abc.abstractmethod
+    async def recent(self, session_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Newest first"""
+
+
+class Repositories:
+    name = "none"
+
+    def __init__(self, contents: ContentRepository, sessions: SessionRepository, analytics: AnalyticsRepository):
+        self.contents = contents
+        self.sessions = sessions
+        self.analytics = analytics
+
+    async def close(self):
+        return None
+
+
+async def configure_repositories(db) -> Optional[Repositories]:
+    """Pick the backend from settings.STORAGE_BACKEND (auto|mongo|sqlite).
+
+    ``auto`` uses Mongo when connected and nothing otherwise (the stateless
+    degraded mode).
+    """
+    backend = settings.STORAGE_BACKEND.lower()
+    if backend == "sqlite":
+        from .sqlite import SQLiteRepositories
+
+        repos = SQLiteRepositories(settings.SQLITE_PATH)
+        await repos.start()
+    elif backend in ("auto", "mongo") and db is not None:
+        from .mongo import MongoRepositories
+
+        repos = MongoRepositories(db)
+    else:
+        repos = None
+    logger.info(f"Storage backend: {repos.name if repos else 'none'}")
+    return repos
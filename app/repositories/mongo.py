@@ -0,0 +1,258 @@
+# repositories/mongo.py
+"""MongoDB backend: ``contents``, ``chats`` and ``interaction_analytics``."""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from ..services.archiver import session_archiver
+from .base import (
+    AnalyticsRepository,
+    ContentRepository,
+    Repositories,
+    SessionRepository,
+    decode_search_cursor,
+    encode_search_cursor,
+)
+
+
+def doc_to_response(doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Converts a MongoDB document to a dictionary, renaming '_id' to 'id'."""
+    if doc is None:
+        return None
+    result = doc.copy()
+    _id = result.pop('_id', None)
+    result['id'] = str(_id) if _id else None
+    return result
+
+
+class MongoContentRepository(ContentRepository):
+    def __init__(self, db):
+        self.collection = db.contents
+
+    async def create(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        payload = dict(fields)
+        now = datetime.utcnow()
+        payload["created_at"] = now
+        payload["updated_at"] = now
+        res = await self.collection.insert_one(payload)
+        doc = await self.collection.find_one({"_id": res.inserted_id})
+        return doc_to_response(doc)
+
+    async def get(self, content_id: str) -> Optional[Dict[str, Any]]:
+        if not ObjectId.is_valid(content_id):
+            return None
+        doc = await self.collection.find_one({"_id": ObjectId(content_id)})
+        return doc_to_response(doc)
+
+    async def version(self, content_id: str) -> Optional[datetime]:
+        if not ObjectId.is_valid(content_id):
+            return None
+        doc = await self.collection.find_one({"_id": ObjectId(content_id)}, {"updated_at": 1, "created_at": 1})
+        if doc is None:
+            return None
+        return doc.get("updated_at") or doc.get("created_at")
+
+    async def list(self, skip: int, limit: int) -> List[Dict[str, Any]]:
+        cursor = self.collection.find().skip(skip).limit(limit).sort("created_at", -1)
+        return [doc_to_response(doc) async for doc in cursor]
+
+    async def list_version(self) -> Dict[str, Any]:
+        count = await self.collection.estimated_document_count()
+        latest = await self.collection.find({}, {"updated_at": 1}).sort("updated_at", -1).limit(1).to_list(length=1)
+        return {"count": count, "updated_at": latest[0].get("updated_at") if latest else None}
+
+    async def update(self, content_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not ObjectId.is_valid(content_id):
+            return None
+        if not fields:
+            return await self.get(content_id)
+        update_data = {**fields, "updated_at": datetime.utcnow()}
+        from pymongo import ReturnDocument  # deferred: pymongo is heavy at import time
+        res = await self.collection.find_one_and_update(
+            {"_id": ObjectId(content_id)},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc_to_response(res)
+
+    async def delete(self, content_id: str) -> bool:
+        if not ObjectId.is_valid(content_id):
+            return False
+        res = await self.collection.delete_one({"_id": ObjectId(content_id)})
+        return res.deleted_count == 1
+
+    async def search(self, query: str, limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+        pipeline = [
+            {"$match": {"$text": {"$search": query}}},
+            {"$addFields": {"score": {"$meta": "textScore"}}},
+        ]
+        if cursor:
+            last_score, last_id = decode_search_cursor(cursor)
+            if not ObjectId.is_valid(last_id):
+                raise ValueError("Invalid cursor")
+            pipeline.append({"$match": {"$or": [
+                {"score": {"$lt": last_score}},
+                {"score": last_score, "_id": {"$lt": ObjectId(last_id)}},
+            ]}})
+        pipeline += [
+            {"$sort": {"score": -1, "_id": -1}},
+            {"$limit": limit},
+        ]
+
+        results = []
+        last = None
+        async for doc in self.collection.aggregate(pipeline):
+            last = doc
+            results.append(doc_to_response(doc))
+        next_cursor = encode_search_cursor(last["score"], str(last["_id"])) if last and len(results) == limit else None
+        return {"results": results, "next_cursor": next_cursor}
+
+
+class MongoSessionRepository(SessionRepository):
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.chats
+
+    async def get_or_create(self, session_id: Optional[str], tail: int) -> Tuple[Dict[str, Any], str]:
+        if session_id and ObjectId.is_valid(session_id):
+            # Load only the tail of the messages the prompt can use, plus the full count
+            pipeline = [
+                {"$match": {"_id": ObjectId(session_id)}},
+                {"$addFields": {
+                    "message_total": {"$size": {"$ifNull": ["$messages", []]}},
+                    "messages": {"$slice": [{"$ifNull": ["$messages", []]}, -tail]},
+                }},
+            ]
+            sessions = await self.collection.aggregate(pipeline).to_list(length=1)
+            if not sessions and await session_archiver.rehydrate(self.db, ObjectId(session_id)):
+                sessions = await self.collection.aggregate(pipeline).to_list(length=1)
+            if sessions:
+                return sessions[0], session_id
+
+        # Create new session with enhanced schema
+        session_doc = {
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+            "messages": [],
+            "interaction_count": 0,
+            "platform_requests": {},
+            "suggestion_stats": {
+                "total_suggestions": 0,
+                "platforms_used": [],
+                "last_suggestion_date": None
+            },
+            "user_preferences": {
+                "preferred_platforms": [],
+                "content_types": []
+            }
+        }
+        res = await self.collection.insert_one(session_doc)
+        session = await self.collection.find_one({"_id": res.inserted_id})
+        return session, str(res.inserted_id)
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Rehydrated from the archive if it went cold"""
+        if not ObjectId.is_valid(session_id):
+            return None
+        session = await self.collection.find_one({"_id": ObjectId(session_id)})
+        if session is None:
+            session = await session_archiver.rehydrate(self.db, ObjectId(session_id))
+        return session
+
+    async def recent(self, limit: int) -> List[Dict[str, Any]]:
+        cursor = self.collection.find().sort("updated_at", -1).limit(limit)
+        return [{"session_id": str(doc.get("_id")), "messages": doc.get("messages", [])} async for doc in cursor]
+
+    async def _update(self, session_id: str, update: Dict[str, Any]):
+        """Apply ``update``; a session archived since it was loaded is restored first"""
+        _id = ObjectId(session_id)
+        result = await self.collection.update_one({"_id": _id}, update)
+        if result.matched_count == 0 and await session_archiver.rehydrate(self.db, _id):
+            await self.collection.update_one({"_id": _id}, update)
+
+    async def add_user_message(self, session_id: str, message: Dict[str, Any]):
+        await self._update(session_id, {
+            "$push": {"messages": message},
+            "$set": {"updated_at": datetime.utcnow()},
+            "$inc": {"interaction_count": 1}
+        })
+
+    async def add_assistant_message(self, session_id: str, message: Dict[str, Any],
+                                    suggestions: List[Dict[str, Any]]):
+        update_operation = {
+            "$push": {"messages": message},
+            "$set": {"updated_at": datetime.utcnow()}
+        }
+
+        # Update suggestion statistics if suggestions were provided
+        if suggestions:
+            platforms = list(set(suggestion.get("platform", "unknown") for suggestion in suggestions))
+            update_operation["$inc"] = {
+                "suggestion_stats.total_suggestions": len(suggestions),
+                **{f"platform_requests.{platform}": 1 for platform in platforms}
+            }
+            update_operation["$addToSet"] = {
+                "suggestion_stats.platforms_used": {"$each": platforms}
+            }
+            update_operation["$set"]["suggestion_stats.last_suggestion_date"] = datetime.utcnow()
+
+        await self._update(session_id, update_operation)
+
+    async def add_preferred_platforms(self, session_id: str, platforms: List[str]):
+        await self._update(
+            session_id, {"$addToSet": {"user_preferences.preferred_platforms": {"$each": platforms}}}
+        )
+
+    async def summary_state(self, session_id: str, fold_limit: int) -> Optional[Dict[str, Any]]:
+        pipeline = [
+            {"$match": {"_id": ObjectId(session_id)}},
+            {"$project": {
+                "summary": 1,
+                "summary_upto": {"$ifNull": ["$summary_upto", 0]},
+                "message_total": {"$size": {"$ifNull": ["$messages", []]}},
+                "pending": {"$slice": [
+                    {"$ifNull": ["$messages", []]}, {"$ifNull": ["$summary_upto", 0]}, max(1, fold_limit),
+                ]},
+            }},
+        ]
+        docs = await self.collection.aggregate(pipeline).to_list(length=1)
+        if not docs:
+            return None
+        docs[0]["pending"] = docs[0]["pending"][:fold_limit]
+        return docs[0]
+
+    async def save_summary(self, session_id: str, expected_upto: int, summary: str, upto: int) -> bool:
+        if expected_upto:
+            covered = {"summary_upto": expected_upto}
+        else:
+            covered = {"$or": [{"summary_upto": 0}, {"summary_upto": {"$exists": False}}]}
+        result = await self.collection.update_one(
+            {"_id": ObjectId(session_id), **covered},
+            {"$set": {
+                "summary": summary,
+                "summary_upto": upto,
+                "summary_updated_at": datetime.utcnow(),
+            }},
+        )
+        return result.modified_count == 1
+
+
+class MongoAnalyticsRepository(AnalyticsRepository):
+    def __init__(self, db):
+        self.collection = db.interaction_analytics
+
+    async def log_interaction(self, doc: Dict[str, Any]):
+        await self.collection.insert_one(doc)
+
+    async def recent(self, session_id: str, limit: int) -> List[Dict[str, Any]]:
+        return await self.collection.find({"session_id": session_id}).sort("timestamp", -1).limit(limit).to_list(
+            length=limit
+        )
+
+
+class MongoRepositories(Repositories):
+    name = "mongo"
+
+    def __init__(self, db):
+        super().__init__(MongoContentRepository(db), MongoSessionRepository(db), MongoAnalyticsRepository(db))
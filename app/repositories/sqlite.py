@@ -0,0 +1,569 @@
+# repositories/sqlite.py
+"""Embedded SQLite backend for single-node and edge deployments.
+
+One database file in WAL mode, so readers never block the writer or each
+other. All writes go through a single writer thread that commits whatever
+has queued up in one transaction (group commit): a write returns only once
+its batch is committed, but concurrent writes share a transaction and a sync
+instead of paying for one each. Each write runs in its own savepoint, so a
+failing write does not take the rest of its batch down. Reads run on a small
+thread pool with one connection per thread.
+
+Sessions are split into a ``sessions`` row and one ``messages`` row per
+message, so appending a message or loading the prompt tail does not rewrite
+or read the whole conversation.
+"""
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from ..core import metrics
+from ..core.config import settings
+from .base import (
+    AnalyticsRepository,
+    ContentRepository,
+    Repositories,
+    SessionRepository,
+    decode_search_cursor,
+    encode_search_cursor,
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    body TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contents_created_at ON contents (created_at DESC);
+CREATE INDEX IF NOT EXISTS contents_updated_at ON contents (updated_at DESC);
+
+-- Full-text index kept in sync with contents by triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS contents_fts USING fts5(title, body, content='contents', content_rowid='rowid');
+CREATE TRIGGER IF NOT EXISTS contents_fts_insert AFTER INSERT ON contents BEGIN
+    INSERT INTO contents_fts (rowid, title, body) VALUES (new.rowid, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS contents_fts_delete AFTER DELETE ON contents BEGIN
+    INSERT INTO contents_fts (contents_fts, rowid, title, body) VALUES ('delete', old.rowid, old.title, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS contents_fts_update AFTER UPDATE ON contents BEGIN
+    INSERT INTO contents_fts (contents_fts, rowid, title, body) VALUES ('delete', old.rowid, old.title, old.body);
+    INSERT INTO contents_fts (rowid, title, body) VALUES (new.rowid, new.title, new.body);
+END;
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    interaction_count INTEGER NOT NULL DEFAULT 0,
+    message_total INTEGER NOT NULL DEFAULT 0,
+    summary TEXT,
+    summary_upto INTEGER NOT NULL DEFAULT 0,
+    summary_updated_at TEXT,
+    -- platform_requests, suggestion_stats and user_preferences as JSON
+    state TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at DESC);
+
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS interaction_analytics (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS interaction_analytics_session ON interaction_analytics (session_id, timestamp DESC);
+"""
+
+Write = Callable[..., Any]
+
+
+def _ts(value: datetime) -> str:
+    # Fixed width so timestamps sort correctly as text
+    return value.isoformat(timespec="microseconds")
+
+
+def _dt(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return _ts(value)
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _dumps(doc: Any) -> str:
+    return json.dumps(doc, default=_json_default, separators=(",", ":"))
+
+
+class SQLiteStore:
+    """Connections, the group-commit writer and the reader pool for one database file."""
+
+    def __init__(self, path: str, batch_size: int, batch_wait: float, read_threads: int):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._writer_thread = ThreadPoolExecutor(1, thread_name_prefix="sqlite-writer")
+        self._reader_threads = ThreadPoolExecutor(read_threads, thread_name_prefix="sqlite-reader")
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._writes: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode: transactions are opened explicitly
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        conn.execute("PRAGMA busy_timeout=5000")
+        self._connections.append(conn)
+        return conn
+
+    def _open_writer(self):
+        self._write_conn = self._connect()
+        self._write_conn.executescript(SCHEMA)
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._writer_thread, self._open_writer)
+        self._writes = asyncio.Queue()
+        self._task = asyncio.create_task(self._write_loop(), name="sqlite-writer")
+
+    async def read(self, func: Callable[..., Any], *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._reader_threads, self._read, func, args)
+
+    def _read(self, func, args):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            conn.execute("PRAGMA query_only=1")
+        # One read transaction, so multi-statement reads see a single snapshot
+        conn.execute("BEGIN")
+        try:
+            return func(conn, *args)
+        finally:
+            conn.execute("COMMIT")
+
+    async def write(self, func: Write, *args) -> Any:
+        """Queue a write; returns its result once the batch holding it is committed"""
+        if self._writes is None:
+            raise RuntimeError("SQLite store is not started")
+        future = asyncio.get_running_loop().create_future()
+        self._writes.put_nowait((func, args, future))
+        return await future
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._writes.get()
+            if item is None:
+                break
+            batch = [item]
+            if self.batch_wait > 0 and self._writes.qsize() < self.batch_size:
+                await asyncio.sleep(self.batch_wait)
+            while len(batch) < self.batch_size and not self._writes.empty():
+                item = self._writes.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            started = time.perf_counter()
+            results = await loop.run_in_executor(self._writer_thread, self._apply, batch)
+            metrics.SQLITE_COMMIT_DURATION.observe(time.perf_counter() - started)
+            metrics.SQLITE_WRITE_BATCH.observe(len(batch))
+            for (_, _, future), (ok, value) in zip(batch, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _apply(self, batch) -> List[Tuple[bool, Any]]:
+        conn = self._write_conn
+        results: List[Tuple[bool, Any]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for func, args, _ in batch:
+                conn.execute("SAVEPOINT write")
+                try:
+                    value = func(conn, *args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    results.append((False, e))
+                else:
+                    results.append((True, value))
+                conn.execute("RELEASE write")
+            conn.execute("COMMIT")
+            return results
+        except Exception as e:
+            logger.warning(f"SQLite batch of {len(batch)} writes failed: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            return [(False, e)] * len(batch)
+
+    async def close(self):
+        """Commit queued writes, then close every connection"""
+        if self._task is not None:
+            self._writes.put_nowait(None)
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        loop = asyncio.get_running_loop()
+        if self._write_conn is not None:
+            await loop.run_in_executor(self._writer_thread, self._write_conn.execute, "PRAGMA wal_checkpoint(TRUNCATE)")
+        for conn in self._connections:
+            conn.close()
+        self._connections.clear()
+        self._writer_thread.shutdown(wait=False)
+        self._reader_threads.shutdown(wait=False)
+
+
+def _content(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "body": row["body"],
+        "created_at": _dt(row["created_at"]),
+        "updated_at": _dt(row["updated_at"]),
+    }
+
+
+class SQLiteContentRepository(ContentRepository):
+    COLUMNS = ("title", "body")
+
+    def __init__(self, store: SQLiteStore):
+        self.store = store
+
+    async def create(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        doc = {"id": str(ObjectId()), **{key: fields[key] for key in self.COLUMNS}, "created_at": now, "updated_at": now}
+        await self.store.write(self._insert, doc)
+        return doc
+
+    @staticmethod
+    def _insert(conn, doc):
+        conn.execute(
+            "INSERT INTO contents (id, title, body, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (doc["id"], doc["title"], doc["body"], _ts(doc["created_at"]), _ts(doc["updated_at"])),
+        )
+
+    async def get(self, content_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.read(self._get, content_id)
+
+    @staticmethod
+    def _get(conn, content_id):
+        row = conn.execute("SELECT * FROM contents WHERE id = ?", (content_id,)).fetchone()
+        return _content(row) if row else None
+
+    async def version(self, content_id: str) -> Optional[datetime]:
+        return await self.store.read(self._version, content_id)
+
+    @staticmethod
+    def _version(conn, content_id):
+        row = conn.execute("SELECT updated_at FROM contents WHERE id = ?", (content_id,)).fetchone()
+        return _dt(row["updated_at"]) if row else None
+
+    async def list(self, skip: int, limit: int) -> List[Dict[str, Any]]:
+        return await self.store.read(self._list, skip, limit)
+
+    @staticmethod
+    def _list(conn, skip, limit):
+        rows = conn.execute(
+            "SELECT * FROM contents ORDER BY created_at DESC LIMIT ? OFFSET ?", (limit, skip)
+        ).fetchall()
+        return [_content(row) for row in rows]
+
+    async def list_version(self) -> Dict[str, Any]:
+        return await self.store.read(self._list_version)
+
+    @staticmethod
+    def _list_version(conn):
+        row = conn.execute("SELECT count(*) AS count, max(updated_at) AS updated_at FROM contents").fetchone()
+        return {"count": row["count"], "updated_at": _dt(row["updated_at"])}
+
+    async def update(self, content_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        fields = {key: value for key, value in fields.items() if key in self.COLUMNS}
+        if not fields:
+            return await self.get(content_id)
+        return await self.store.write(self._update, content_id, fields, datetime.utcnow())
+
+    @classmethod
+    def _update(cls, conn, content_id, fields, now):
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        conn.execute(
+            f"UPDATE contents SET {assignments}, updated_at = ? WHERE id = ?",
+            (*fields.values(), _ts(now), content_id),
+        )
+        return cls._get(conn, content_id)
+
+    async def delete(self, content_id: str) -> bool:
+        return await self.store.write(self._delete, content_id)
+
+    @staticmethod
+    def _delete(conn, content_id):
+        return conn.execute("DELETE FROM contents WHERE id = ?", (content_id,)).rowcount == 1
+
+    async def search(self, query: str, limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+        # Any of the words, like Mongo's $text; quoting keeps FTS5 syntax out of user input
+        terms = re.findall(r"\w+", query)
+        after = decode_search_cursor(cursor) if cursor else None
+        if not terms:
+            return {"results": [], "next_cursor": None}
+        match = " OR ".join(f'"{term}"' for term in terms)
+        results = await self.store.read(self._search, match, limit, after)
+        last = results[-1] if len(results) == limit else None
+        return {"results": results, "next_cursor": encode_search_cursor(last["score"], last["id"]) if last else None}
+
+    @staticmethod
+    def _search(conn, match, limit, after):
+        # bm25() is lower-is-better; negate it so scores rank like Mongo's textScore. Titles weigh 3x.
+        sql = (
+            "SELECT * FROM (SELECT c.*, -bm25(contents_fts, 3.0, 1.0) AS score FROM contents_fts "
+            "JOIN contents c ON c.rowid = contents_fts.rowid WHERE contents_fts MATCH ?)"
+        )
+        params: List[Any] = [match]
+        if after:
+            sql += " WHERE score < ? OR (score = ? AND id < ?)"
+            params += [after[0], after[0], after[1]]
+        sql += " ORDER BY score DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return [{**_content(row), "score": row["score"]} for row in conn.execute(sql, params).fetchall()]
+
+
+def _new_state() -> Dict[str, Any]:
+    return {
+        "platform_requests": {},
+        "suggestion_stats": {
+            "total_suggestions": 0,
+            "platforms_used": [],
+            "last_suggestion_date": None
+        },
+        "user_preferences": {
+            "preferred_platforms": [],
+            "content_types": []
+        }
+    }
+
+
+def _session(row: sqlite3.Row, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    doc = {
+        "_id": row["id"],
+        "created_at": _dt(row["created_at"]),
+        "updated_at": _dt(row["updated_at"]),
+        "messages": messages,
+        "message_total": row["message_total"],
+        "interaction_count": row["interaction_count"],
+        **json.loads(row["state"]),
+    }
+    if row["summary"] is not None:
+        doc["summary"] = row["summary"]
+        doc["summary_upto"] = row["summary_upto"]
+    return doc
+
+
+class SQLiteSessionRepository(SessionRepository):
+    def __init__(self, store: SQLiteStore):
+        self.store = store
+
+    async def get_or_create(self, session_id: Optional[str], tail: int) -> Tuple[Dict[str, Any], str]:
+        if session_id:
+            session = await self.store.read(self._load, session_id, tail)
+            if session:
+                return session, session_id
+        now = datetime.utcnow()
+        session_id = str(ObjectId())
+        await self.store.write(self._insert, session_id, now)
+        session = {"_id": session_id, "created_at": now, "updated_at": now, "messages": [], "message_total": 0,
+                   "interaction_count": 0, **_new_state()}
+        return session, session_id
+
+    @staticmethod
+    def _insert(conn, session_id, now):
+        conn.execute(
+            "INSERT INTO sessions (id, created_at, updated_at, state) VALUES (?, ?, ?, ?)",
+            (session_id, _ts(now), _ts(now), _dumps(_new_state())),
+        )
+
+    @staticmethod
+    def _load(conn, session_id, tail=None):
+        row = conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        if tail is None:
+            rows = conn.execute("SELECT doc FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT doc FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?", (session_id, tail)
+            ).fetchall()[::-1]
+        return _session(row, [json.loads(r["doc"]) for r in rows])
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.read(self._load, session_id)
+
+    async def recent(self, limit: int) -> List[Dict[str, Any]]:
+        return await self.store.read(self._recent, limit)
+
+    @classmethod
+    def _recent(cls, conn, limit):
+        rows = conn.execute("SELECT id FROM sessions ORDER BY updated_at DESC LIMIT ?", (limit,)).fetchall()
+        items = []
+        for row in rows:
+            session = cls._load(conn, row["id"])
+            items.append({"session_id": row["id"], "messages": session["messages"]})
+        return items
+
+    @staticmethod
+    def _append(conn, session_id, message, interaction: int) -> Optional[Dict[str, Any]]:
+        """Append a message; returns the session's stored state, or None if it does not exist"""
+        row = conn.execute("SELECT message_total, state FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "INSERT INTO messages (session_id, seq, doc) VALUES (?, ?, ?)",
+            (session_id, row["message_total"], _dumps(message)),
+        )
+        conn.execute(
+            "UPDATE sessions SET message_total = message_total + 1, interaction_count = interaction_count + ?,"
+            " updated_at = ? WHERE id = ?",
+            (interaction, _ts(datetime.utcnow()), session_id),
+        )
+        return json.loads(row["state"])
+
+    async def add_user_message(self, session_id: str, message: Dict[str, Any]):
+        await self.store.write(self._append, session_id, message, 1)
+
+    async def add_assistant_message(self, session_id: str, message: Dict[str, Any],
+                                    suggestions: List[Dict[str, Any]]):
+        await self.store.write(self._add_assistant, session_id, message, suggestions)
+
+    @classmethod
+    def _add_assistant(cls, conn, session_id, message, suggestions):
+        state = cls._append(conn, session_id, message, 0)
+        if state is None or not suggestions:
+            return
+        platforms = list(set(suggestion.get("platform", "unknown") for suggestion in suggestions))
+        stats = state["suggestion_stats"]
+        stats["total_suggestions"] += len(suggestions)
+        stats["platforms_used"] += [p for p in platforms if p not in stats["platforms_used"]]
+        stats["last_suggestion_date"] = datetime.utcnow()
+        for platform in platforms:
+            state["platform_requests"][platform] = state["platform_requests"].get(platform, 0) + 1
+        conn.execute("UPDATE sessions SET state = ? WHERE id = ?", (_dumps(state), session_id))
+
+    async def add_preferred_platforms(self, session_id: str, platforms: List[str]):
+        await self.store.write(self._add_preferred, session_id, platforms)
+
+    @staticmethod
+    def _add_preferred(conn, session_id, platforms):
+        row = conn.execute("SELECT state FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return
+        state = json.loads(row["state"])
+        preferred = state["user_preferences"]["preferred_platforms"]
+        preferred += [p for p in platforms if p not in preferred]
+        conn.execute("UPDATE sessions SET state = ? WHERE id = ?", (_dumps(state), session_id))
+
+    async def summary_state(self, session_id: str, fold_limit: int) -> Optional[Dict[str, Any]]:
+        return await self.store.read(self._summary_state, session_id, fold_limit)
+
+    @staticmethod
+    def _summary_state(conn, session_id, fold_limit):
+        row = conn.execute(
+            "SELECT summary, summary_upto, message_total FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        rows = conn.execute(
+            "SELECT doc FROM messages WHERE session_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+            (session_id, row["summary_upto"], fold_limit),
+        ).fetchall()
+        return {
+            "summary": row["summary"],
+            "summary_upto": row["summary_upto"],
+            "message_total": row["message_total"],
+            "pending": [json.loads(r["doc"]) for r in rows],
+        }
+
+    async def save_summary(self, session_id: str, expected_upto: int, summary: str, upto: int) -> bool:
+        return await self.store.write(self._save_summary, session_id, expected_upto, summary, upto)
+
+    @staticmethod
+    def _save_summary(conn, session_id, expected_upto, summary, upto):
+        return conn.execute(
+            "UPDATE sessions SET summary = ?, summary_upto = ?, summary_updated_at = ? WHERE id = ? AND summary_upto = ?",
+            (summary, upto, _ts(datetime.utcnow()), session_id, expected_upto),
+        ).rowcount == 1
+
+
+class SQLiteAnalyticsRepository(AnalyticsRepository):
+    def __init__(self, store: SQLiteStore):
+        self.store = store
+
+    async def log_interaction(self, doc: Dict[str, Any]):
+        await self.store.write(self._insert, doc)
+
+    @staticmethod
+    def _insert(conn, doc):
+        conn.execute(
+            "INSERT INTO interaction_analytics (session_id, timestamp, doc) VALUES (?, ?, ?)",
+            (doc["session_id"], _ts(doc["timestamp"]), _dumps(doc)),
+        )
+
+    async def recent(self, session_id: str, limit: int) -> List[Dict[str, Any]]:
+        return await self.store.read(self._recent, session_id, limit)
+
+    @staticmethod
+    def _recent(conn, session_id, limit):
+        rows = conn.execute(
+            "SELECT id, doc FROM interaction_analytics WHERE session_id = ? ORDER BY timestamp DESC LIMIT ?",
+            (session_id, limit),
+        ).fetchall()
+        return [{"_id": row["id"], **json.loads(row["doc"])} for row in rows]
+
+
+class SQLiteRepositories(Repositories):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.store = SQLiteStore(
+            path,
+            batch_size=settings.SQLITE_BATCH_SIZE,
+            batch_wait=settings.SQLITE_BATCH_WAIT_MS / 1000,
+            read_threads=settings.SQLITE_READ_THREADS,
+        )
+        super().__init__(
+            SQLiteContentRepository(self.store),
+            SQLiteSessionRepository(self.store),
+            SQLiteAnalyticsRepository(self.store),
+        )
+
+    async def start(self):
+        await self.store.start()
+
+    async def close(self):
+        await self.store.close()
@@ -1,4 +1,8 @@
 from .content import router as content_router
 from .chat import router as chat_router
+from .admin import router as admin_router
+from .jobs import router as jobs_router
+from .analytics import router as analytics_router
+from .export import router as export_router
 
-__all__ = ["content_router", "chat_router"]
+__all__ = ["content_router", "chat_router", "admin_router", "jobs_router", "analytics_router", "export_router"]
@@ -0,0 +1,63 @@
+# routers/admin.py
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from ..core.config import settings
+from ..core.security import require_admin
+from ..db import require_mongo
+from ..services.archiver import session_archiver
+from ..services.profiler import profiler
+from ..services.resilience import breaker_states
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+def _profile_response(sampler) -> PlainTextResponse:
+    summary = sampler.summary()
+    return PlainTextResponse(
+        sampler.collapsed(),
+        headers={f"X-Profile-{key.replace('_', '-').title()}": str(value) for key, value in summary.items()},
+    )
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def capture_profile(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(None, ge=1, le=1000),
+):
+    """Sample this worker for N seconds; returns collapsed stacks for flame graphs."""
+    if seconds > settings.PROFILER_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be <= {settings.PROFILER_MAX_SECONDS}")
+    if profiler.busy:
+        raise HTTPException(status_code=409, detail="A profile capture is already running")
+    interval = (interval_ms or settings.PROFILER_INTERVAL_MS) / 1000.0
+    sampler = await profiler.capture(seconds, interval)
+    return _profile_response(sampler)
+
+
+@router.get("/profile/requests/{profile_id}", response_class=PlainTextResponse)
+async def get_request_profile(profile_id: str):
+    """Fetch a profile recorded for a single request sent with X-Profile: 1."""
+    sampler = profiler.get_request_profile(profile_id)
+    if sampler is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return _profile_response(sampler)
+
+
+@router.get("/breakers")
+async def get_breakers():
+    """Current circuit breaker state and adaptive timeout per dependency."""
+    return {"breakers": breaker_states()}
+
+
+@router.get("/archive")
+async def get_archive_report(request: Request):
+    """Archived session totals, working-set and storage savings, hot collection size."""
+    db = require_mongo(request)
+    return await session_archiver.report(db)
+
+
+@router.post("/archive/run")
+async def run_archive(request: Request):
+    """Archive one batch of cold sessions now instead of waiting for the next pass."""
+    db = require_mongo(request)
+    return await session_archiver.run_once(db)
@@ -1,21 +1,55 @@
 # routers/analytics.py
-from fastapi import APIRouter, Request, HTTPException
-from typing import Optional
+import json
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from typing import Optional, Tuple
 from ..controllers.chat_controller import get_chat_analytics
+from ..core.http_cache import cached_json, make_etag, not_modified, revalidate_policy
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
 @router.get("/session/{session_id}")
 async def get_session_analytics(request: Request, session_id: str):
-    db = request.app.state.db
-    return await get_chat_analytics(db, session_id)
+    repos = request.app.state.repos
+    if repos is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    return await get_chat_analytics(repos, session_id)
+
+def _trends_cache(refreshed: datetime, ttl: timedelta) -> Tuple[str, datetime, str]:
+    """ETag, Last-Modified and Cache-Control for trends refreshed at ``refreshed``"""
+    last_modified = datetime.fromtimestamp(refreshed.timestamp(), timezone.utc)
+    remaining = int((refreshed + ttl - datetime.now()).total_seconds())
+    return make_etag("instagram_trends", refreshed.timestamp()), last_modified, revalidate_policy(max(0, remaining))
 
 @router.get("/trends/instagram")
 async def get_instagram_trends(request: Request):
-    db = request.app.state.db
+    from ..services.scraper import fetch_instagram_trends, instagram_scraper
+
+    # Fresh trends in memory are validated without touching the trend store or the network
+    refreshed = instagram_scraper.cached_at("instagram_trends")
+    if refreshed is not None:
+        etag, last_modified, cache_control = _trends_cache(refreshed, instagram_scraper.cache_duration)
+        unchanged = not_modified(request, etag, last_modified, cache_control)
+        if unchanged:
+            return unchanged
     try:
-        from ..services.scraper import fetch_instagram_trends
         trends = await fetch_instagram_trends()
-        return {"trends": trends}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch Instagram trends: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to fetch Instagram trends: {str(e)}")
+    body = {"trends": trends}
+    refreshed = instagram_scraper.cached_at("instagram_trends")
+    if refreshed is None:
+        # Fallback trends: revalidate every time so real ones replace them as soon as possible
+        etag = make_etag("instagram_trends", json.dumps(jsonable_encoder(body), sort_keys=True))
+        return not_modified(request, etag, cache_control="no-cache") or cached_json(body, etag, cache_control="no-cache")
+    etag, last_modified, cache_control = _trends_cache(refreshed, instagram_scraper.cache_duration)
+    return not_modified(request, etag, last_modified, cache_control) or cached_json(body, etag, last_modified, cache_control)
+
+@router.get("/hashtags/rising")
+async def get_rising_hashtags(
+    window_hours: int = Query(24, ge=1, le=72),
+    limit: int = Query(10, ge=1, le=100),
+):
+    from ..services.hashtags import hashtag_series
+    return {"window_hours": window_hours, "hashtags": await hashtag_series.rising(window_hours, limit)}
@@ -1,7 +1,15 @@
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Request, HTTPException, Query, Response, WebSocket
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Optional
-from ..controllers.chat_controller import handle_chat
+from ..controllers.chat_controller import handle_chat, get_session, get_session_version, get_message_window
+from ..controllers import live_chat_controller
+from ..core.http_cache import etag_matches, make_etag
+from ..core.security import client_key, too_many_requests
+from ..db import require_mongo
+from ..services.admission import admission, AdmissionRejected
+from ..services.idempotency import IdempotencyError, run_idempotent
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
@@ -13,37 +21,104 @@ class ChatRequest(BaseModel):
 
 @router.post("/chat")
 async def chat_endpoint(request: Request, body: ChatRequest):
-    db = request.app.state.db
+    repos = request.app.state.repos
     if not body.message:
         raise HTTPException(status_code=400, detail="message is required")
     
-    # If DB is available, use it; otherwise return mock response
-    if not db:
-        from ..services.ai_client import ai_client
-        resp = await ai_client.generate_reply(body.message, context=[], trends=[])
-        return {
-            "session_id": "test-session",
-            "reply": resp.get("reply"),
-            "suggestions": resp.get("suggestions", []),
-            "trends": [],
-            "should_suggest": resp.get("should_suggest", False)
-        }
-    
-    resp = await handle_chat(db, body.message, session_id=body.session_id)
-    return resp
+    async def reply():
+        try:
+            admission.check_rate(body.session_id, client_key(request))
+            # If DB is available, use it; otherwise return mock response
+            if repos is None:
+                from ..services.ai_client import ai_client
+                async with admission.admit():
+                    resp = await ai_client.generate_reply(body.message, context=[], trends=[])
+                return {
+                    "session_id": "test-session",
+                    "reply": resp.get("reply"),
+                    "suggestions": resp.get("suggestions", []),
+                    "trends": [],
+                    "should_suggest": resp.get("should_suggest", False),
+                    "missing_platforms": resp.get("missing_platforms", []),
+                    "fallback": resp.get("fallback", False)
+                }
+            
+            # The LLM slot is held around generation only, not trends or persistence
+            resp = await handle_chat(repos, body.message, session_id=body.session_id)
+            return resp
+        except AdmissionRejected as e:
+            raise too_many_requests(e)
+
+    # Retries with the same Idempotency-Key reuse the first reply instead of generating again
+    try:
+        return await run_idempotent(request, "chat", body, 200, reply)
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
 
 @router.get("/chat/history")
 async def chat_history(request: Request, session_id: Optional[str] = None):
-    db = request.app.state.db
-    if not db:
+    repos = request.app.state.repos
+    if repos is None:
         raise HTTPException(status_code=503, detail="Database not available")
     if session_id:
-        return {"history": await db.chats.find_one({"_id": session_id})}
+        session = await get_session(repos, session_id)
+        if session:
+            session["_id"] = str(session["_id"])
+        return {"history": session}
     # return last N sessions (simple)
-    cursor = db.chats.find().sort("updated_at", -1).limit(20)
-    items = []
-    async for doc in cursor:
-        # return minimal view
-        items.append({"session_id": str(doc.get("_id")), "messages": doc.get("messages", [])})
+    items = await repos.sessions.recent(20)
     return {"history": items}
+
+
+def _window_etag(session_id: str, version: dict, *window) -> str:
+    """Messages are append-only, so count + last update identify a session's state"""
+    return make_etag(session_id, version.get("total"), version.get("updated_at"), *window, weak=True)
+
+
+@router.get("/chat/sessions/{session_id}/messages")
+async def chat_messages(
+    request: Request,
+    session_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[str] = Query(None, description="Return the messages before this message_id"),
+    after: Optional[str] = Query(None, description="Return the messages after this message_id"),
+):
+    """A window of a session's messages: the last N, N before `before`, or N after `after`."""
+    db = require_mongo(request)
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
+    # Cheap check first: an unchanged session answers 304 without reading any messages
+    version = await get_session_version(db, session_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    etag = _window_etag(session_id, version, limit, before, after)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    try:
+        window = await get_message_window(db, session_id, limit, before=before, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if window is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    etag = _window_etag(session_id, window, limit, before, after)
+    return JSONResponse(jsonable_encoder(window), headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
+@router.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket, session_id: Optional[str] = None):
+    """Interactive chat: session state stays in memory, replies are streamed."""
+    # Reserved before the first await, so a burst of handshakes cannot overshoot the cap
+    if not live_chat_controller.reserve_connection():
+        # 1013: try again later (another worker may have room)
+        await websocket.close(code=1013)
+        return
+    try:
+        await websocket.accept()
+        await live_chat_controller.serve_live_chat(
+            websocket, websocket.app.state.repos, session_id, client_key(websocket)
+        )
+    finally:
+        live_chat_controller.release_connection()
@@ -1,57 +1,116 @@
 # Import necessary modules from FastAPI and other parts of the application.
 from fastapi import APIRouter, Request, HTTPException, status, Query
-# Import List for type hinting a list of responses.
-from typing import List
+# Import List and Optional for type hinting.
+from typing import List, Optional
 # Import the data models for content creation, response, and updates.
-from ..models import ContentCreate, ContentResponse, ContentUpdate
+from ..models import ContentCreate, ContentResponse, ContentUpdate, ContentSearchResponse
 # Import controller functions that handle the business logic.
 from ..controllers.content_controller import (
-    create_content, get_content, list_contents, update_content, delete_content
+    create_content, get_content, list_contents, update_content, delete_content, search_contents,
+    get_content_version, get_contents_version,
 )
+# Import the conditional GET helpers and settings for the read routes.
+from ..core.config import settings
+from ..core.http_cache import cached_json, make_etag, not_modified, revalidate_policy
+
+# Import the Idempotency-Key helper used by the create route.
+from ..services.idempotency import IdempotencyError, run_idempotent
 
 # Create a new router object with a prefix for all routes in this file and tags for API documentation.
 router = APIRouter(prefix="/contents", tags=["contents"])
 
+# Return the content repository, or fail with 503 when no storage backend is available.
+def _contents(request: Request):
+    repos = request.app.state.repos
+    if repos is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    return repos.contents
+
 # Define a route to create new content.
 # It responds with the created content and a 201 status code on success.
 @router.post("/", response_model=ContentResponse, status_code=status.HTTP_201_CREATED)
 async def create(request: Request, payload: ContentCreate):
-    # Get the database connection from the application state.
-    db = request.app.state.db
-    # Call the controller function to create the content in the database.
-    return await create_content(db, payload)
+    # Get the content repository for the configured storage backend.
+    contents = _contents(request)
+
+    async def create_once():
+        # Call the controller function to create the content in the database.
+        return ContentResponse(**await create_content(contents, payload))
+
+    try:
+        # A retry with the same Idempotency-Key returns the first result instead of a duplicate.
+        return await run_idempotent(request, "contents", payload, status.HTTP_201_CREATED, create_once)
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
 # Define a route to list all content with pagination support.
 # It responds with a list of content.
 @router.get("/", response_model=List[ContentResponse])
 async def list_all(request: Request, skip: int = Query(0, ge=0), limit: int = Query(50, le=200)):
-    # Get the database connection from the application state.
-    db = request.app.state.db
+    # Get the content repository for the configured storage backend.
+    contents = _contents(request)
+    cache_control = revalidate_policy(settings.CONTENT_CACHE_MAX_AGE_SECONDS)
+    # Validate against the collection's size and newest update before reading the page.
+    version = await get_contents_version(contents)
+    etag = make_etag("contents", skip, limit, version["count"], version["updated_at"])
+    # No Last-Modified: a delete lowers the count but leaves the newest updated_at as it was,
+    # so If-Modified-Since would answer 304 for a page that changed. The ETag covers both.
+    unchanged = not_modified(request, etag, cache_control=cache_control)
+    if unchanged:
+        return unchanged
     # Call the controller function to retrieve a list of content from the database.
-    return await list_contents(db, skip=skip, limit=limit)
+    docs = await list_contents(contents, skip=skip, limit=limit)
+    return cached_json([ContentResponse(**doc) for doc in docs], etag, cache_control=cache_control)
+
+# Define a route to search content by title and body, ranked by relevance.
+# Declared before "/{content_id}" so "search" is not treated as an ID.
+@router.get("/search", response_model=ContentSearchResponse)
+async def search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+):
+    # Get the content repository for the configured storage backend.
+    contents = _contents(request)
+    try:
+        # Call the controller function to run the text search, resuming after the cursor if given.
+        return await search_contents(contents, q, limit=limit, cursor=cursor)
+    except ValueError as e:
+        # A malformed cursor is a client error.
+        raise HTTPException(status_code=400, detail=str(e))
 
 # Define a route to get a single piece of content by its ID.
 # It responds with the requested content.
 @router.get("/{content_id}", response_model=ContentResponse)
 async def read(request: Request, content_id: str):
-    # Get the database connection from the application state.
-    db = request.app.state.db
+    # Get the content repository for the configured storage backend.
+    contents = _contents(request)
+    cache_control = revalidate_policy(settings.CONTENT_CACHE_MAX_AGE_SECONDS)
+    # Every write bumps updated_at, so it identifies the version; check it before loading the body.
+    updated_at = await get_content_version(contents, content_id)
+    if updated_at is not None:
+        unchanged = not_modified(request, make_etag("content", content_id, updated_at), updated_at, cache_control)
+        if unchanged:
+            return unchanged
     # Call the controller function to retrieve the content from the database.
-    doc = await get_content(db, content_id)
+    doc = await get_content(contents, content_id)
     # If the content is not found, raise an HTTP 404 error.
     if not doc:
         raise HTTPException(status_code=404, detail="Content not found")
-    # Return the found content.
-    return doc
+    # Return the found content with its validators.
+    updated_at = doc.get("updated_at") or doc.get("created_at")
+    etag = make_etag("content", content_id, updated_at)
+    return cached_json(ContentResponse(**doc), etag, updated_at, cache_control)
 
 # Define a route to update an existing piece of content by its ID.
 # It responds with the updated content.
 @router.put("/{content_id}", response_model=ContentResponse)
 async def update(request: Request, content_id: str, payload: ContentUpdate):
-    # Get the database connection from the application state.
-    db = request.app.state.db
+    # Get the content repository for the configured storage backend.
+    contents = _contents(request)
     # Call the controller function to update the content in the database.
-    doc = await update_content(db, content_id, payload)
+    doc = await update_content(contents, content_id, payload)
     # If the content is not found or the ID is invalid, raise an HTTP 404 error.
     if doc is None:
         raise HTTPException(status_code=404, detail="Content not found or invalid id")
@@ -62,10 +121,10 @@ async def update(request: Request, content_id: str, payload: ContentUpdate):
 # It responds with a 204 status code on success, indicating no content.
 @router.delete("/{content_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete(request: Request, content_id: str):
-    # Get the database connection from the application state.
-    db = request.app.state.db
+    # Get the content repository for the configured storage backend.
+    contents = _contents(request)
     # Call the controller function to delete the content from the database.
-    ok = await delete_content(db, content_id)
+    ok = await delete_content(contents, content_id)
     # If the deletion was unsuccessful (e.g., content not found), raise an HTTP 404 error.
     if not ok:
         raise HTTPException(status_code=404, detail="Content not found")
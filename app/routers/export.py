@@ -0,0 +1,51 @@
+# routers/export.py
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from ..controllers.export_controller import export_query, iter_ndjson
+from ..core.config import settings
+from ..core.security import require_admin
+from ..db import require_mongo
+
+router = APIRouter(prefix="/api/export", tags=["export"], dependencies=[Depends(require_admin)])
+
+
+def _export_response(request: Request, collection: str, start: Optional[datetime], end: Optional[datetime],
+                     cursor: Optional[str], gzip: bool) -> StreamingResponse:
+    db = require_mongo(request)
+    try:
+        query = export_query(collection, start, end, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filename = f"{collection}.ndjson" + (".gz" if gzip else "")
+    return StreamingResponse(
+        iter_ndjson(db, collection, query, settings.EXPORT_BATCH_SIZE, compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/chats")
+async def export_chats(
+    request: Request,
+    start: Optional[datetime] = Query(None, description="Sessions updated at or after this time"),
+    end: Optional[datetime] = Query(None, description="Sessions updated before this time"),
+    cursor: Optional[str] = Query(None, description="`_cursor` of the last line received, to resume"),
+    gzip: bool = False,
+):
+    """Stream chat sessions (all messages included) as NDJSON in `_id` (creation) order; `start`/`end` filter on the last update."""
+    return _export_response(request, "chats", start, end, cursor, gzip)
+
+
+@router.get("/analytics")
+async def export_analytics(
+    request: Request,
+    start: Optional[datetime] = Query(None, description="Interactions at or after this time"),
+    end: Optional[datetime] = Query(None, description="Interactions before this time"),
+    cursor: Optional[str] = Query(None, description="`_cursor` of the last line received, to resume"),
+    gzip: bool = False,
+):
+    """Stream interaction_analytics records as NDJSON, oldest first."""
+    return _export_response(request, "interaction_analytics", start, end, cursor, gzip)
@@ -0,0 +1,59 @@
+# routers/jobs.py
+import hashlib
+from fastapi import APIRouter, Request, HTTPException, Query, status
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from ..core.config import settings
+from ..core.security import client_key, too_many_requests
+from ..db import require_mongo
+from ..controllers.job_controller import count_open_items, create_job, get_job
+from ..services.admission import admission, AdmissionRejected
+from ..services.job_worker import job_pool
+
+router = APIRouter(prefix="/api", tags=["jobs"])
+
+
+class JobRequest(BaseModel):
+    prompts: List[str] = Field(..., min_length=1)
+    session_id: Optional[str] = None
+
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(request: Request, body: JobRequest):
+    db = require_mongo(request)
+    if len(body.prompts) > settings.JOB_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.JOB_MAX_ITEMS} prompts per job")
+    if any(not p.strip() or len(p) > 5000 for p in body.prompts):
+        raise HTTPException(status_code=400, detail="Prompts must be non-empty and at most 5000 characters")
+
+    # Same session and API-key rates as /api/chat, plus a cap on what one caller keeps queued
+    key = client_key(request)
+    try:
+        admission.check_rate(body.session_id, key)
+    except AdmissionRejected as e:
+        raise too_many_requests(e)
+    caller = hashlib.sha256(key.encode()).hexdigest()[:32] if key else None
+    if caller and await count_open_items(db, caller) + len(body.prompts) > settings.JOB_MAX_OPEN_ITEMS_PER_CALLER:
+        raise HTTPException(
+            status_code=429,
+            detail=f"At most {settings.JOB_MAX_OPEN_ITEMS_PER_CALLER} unfinished prompts per caller",
+            headers={"Retry-After": str(settings.JOB_ITEM_LEASE_SECONDS)},
+        )
+
+    job = await create_job(db, body.prompts, session_id=body.session_id, caller=caller)
+    job_pool.notify()
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def read_job(
+    request: Request,
+    job_id: str,
+    after: int = Query(-1, ge=-1, description="Return items with index greater than this"),
+    limit: int = Query(50, ge=1, le=200),
+):
+    db = require_mongo(request)
+    job = await get_job(db, job_id, after=after, limit=limit)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
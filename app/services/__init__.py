@@ -1,5 +1,13 @@
 # app/services/__init__.py
-from .ai_client import generate_reply
-from .scraper import fetch_trending_formats, fetch_instagram_trends
+# Re-exports resolve lazily so importing one service does not load them all.
+__all__ = ["generate_reply", "fetch_trending_formats", "fetch_instagram_trends"]
 
-__all__ = ["generate_reply", "fetch_trending_formats", "fetch_instagram_trends"]
\ No newline at end of file
+
+def __getattr__(name):
+    if name == "generate_reply":
+        from .ai_client import generate_reply
+        return generate_reply
+    if name in ("fetch_trending_formats", "fetch_instagram_trends"):
+        from . import scraper
+        return getattr(scraper, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
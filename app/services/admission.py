@@ -0,0 +1,209 @@
+# services/admission.py
+"""Admission control in front of LLM generation.
+
+Requests first pass per-session and per-API-key token buckets (both are checked
+before either is charged), then take a slot from a global concurrency cap for
+the generation itself only. When every slot is busy they wait in a bounded
+queue with a deadline; anything over a limit is rejected immediately with a
+Retry-After hint rather than slowing every in-flight request down.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from ..core import metrics
+from ..core.config import settings
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def peek(self) -> float:
+        """Seconds until a token is available (0 if one is), without consuming it."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> float:
+        """Consume one token; returns 0 on success or the seconds until one is available."""
+        wait = self.peek()
+        if not wait:
+            self.tokens -= 1
+        return wait
+
+
+class RateLimiter:
+    """Token buckets per key, LRU-bounded so idle keys do not accumulate."""
+
+    def __init__(self, per_minute: float, burst: int, max_keys: int = 10000):
+        self.rate = per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def bucket(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def check(self, key: str) -> float:
+        return self.bucket(key).take()
+
+
+class ConcurrencyLimiter:
+    """Global cap on in-flight generations with a bounded, deadline-limited wait queue.
+
+    Free slots and waiters are tracked here rather than in an asyncio.Semaphore,
+    so a slot can also be taken without waiting (``try_acquire``). A released
+    slot goes straight to the oldest waiter.
+    """
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._free = limit
+        self._waiters: "deque[asyncio.Future]" = deque()
+
+    async def acquire(self):
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            metrics.ADMISSION_QUEUE_WAIT.observe(0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise AdmissionRejected("queue_full", self.queue_timeout)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        metrics.ADMISSION_QUEUED.set(len(self._waiters))
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over as the wait ended: pass it on
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                raise AdmissionRejected("queue_timeout", self.queue_timeout)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            metrics.ADMISSION_QUEUED.set(len(self._waiters))
+            metrics.ADMISSION_QUEUE_WAIT.observe(time.monotonic() - start)
+
+    def has_spare(self, reserve: int) -> bool:
+        """Whether a slot could be taken now with ``reserve`` slots left free and nobody queued"""
+        return not self._waiters and self._free > reserve
+
+    def try_acquire(self, reserve: int) -> bool:
+        """Take a slot without waiting, only if ``reserve`` slots stay free and nobody is queued"""
+        if not self.has_spare(reserve):
+            return False
+        self._free -= 1
+        return True
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._free += 1
+
+
+class AdmissionController:
+    def __init__(self):
+        self.sessions = RateLimiter(settings.SESSION_RATE_PER_MINUTE, settings.SESSION_RATE_BURST)
+        self.api_keys = RateLimiter(settings.API_KEY_RATE_PER_MINUTE, settings.API_KEY_RATE_BURST)
+        self.concurrency = ConcurrencyLimiter(
+            settings.LLM_MAX_CONCURRENCY, settings.LLM_MAX_QUEUE, settings.LLM_QUEUE_TIMEOUT_SECONDS
+        )
+
+    def check_rate(self, session_id: Optional[str], client_key: Optional[str]):
+        """Charge the session and API-key buckets, or raise AdmissionRejected without charging either.
+
+        A request without a session (it starts a new one) is charged to a
+        per-client "new session" bucket, so omitting the id does not bypass
+        the session rate.
+        """
+        session_key = session_id or (f"new:{client_key}" if client_key else None)
+        buckets = []
+        if session_key and self.sessions.enabled:
+            buckets.append(("session_rate", self.sessions.bucket(session_key)))
+        if client_key and self.api_keys.enabled:
+            buckets.append(("api_key_rate", self.api_keys.bucket(client_key)))
+        for reason, bucket in buckets:
+            wait = bucket.peek()
+            if wait:
+                metrics.ADMISSION_REJECTIONS.labels(reason).inc()
+                raise AdmissionRejected(reason, wait)
+        for _, bucket in buckets:
+            bucket.take()
+
+    @asynccontextmanager
+    async def admit(self):
+        """Hold an LLM slot for the duration of the block (wrap only the generation itself)."""
+        try:
+            await self.concurrency.acquire()
+        except AdmissionRejected as e:
+            metrics.ADMISSION_REJECTIONS.labels(e.reason).inc()
+            raise
+        metrics.ADMISSION_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            metrics.ADMISSION_IN_FLIGHT.dec()
+            self.concurrency.release()
+
+    def background_available(self, reserve: int) -> bool:
+        """Whether admit_background(reserve) would get a slot right now; takes nothing"""
+        return self.concurrency.has_spare(reserve)
+
+    @asynccontextmanager
+    async def admit_background(self, reserve: int):
+        """Hold an LLM slot for low-priority work, only while the service is not busy.
+
+        Raises AdmissionRejected("busy") instead of queueing, so background
+        generations never delay or displace user requests.
+        """
+        if not self.concurrency.try_acquire(reserve):
+            raise AdmissionRejected("busy", 1)
+        metrics.ADMISSION_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            metrics.ADMISSION_IN_FLIGHT.dec()
+            self.concurrency.release()
+
+
+# Singleton instance
+admission = AdmissionController()
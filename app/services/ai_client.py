@@ -1,93 +1,292 @@
 # services/ai_client.py
-import os
-import google.generativeai as genai
 from typing import List, Dict, Any, Optional
 import logging
 import re
 import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from ..core import metrics
+from ..core.config import settings
+from .resilience import CircuitOpenError, get_breaker
 
 logger = logging.getLogger(__name__)
 
+gemini_breaker = get_breaker("gemini", settings.GEMINI_TIMEOUT_SECONDS, min_timeout=2.0)
+# Background calls (summaries, speculative drafts) keep their own latency window and failure count,
+# so they neither stretch the interactive timeout nor trip its breaker
+gemini_background_breaker = get_breaker("gemini-background", settings.GEMINI_TIMEOUT_SECONDS, min_timeout=2.0)
+
+PLATFORM_GUIDES = {
+    "linkedin": {
+        "tone": "professional, insightful, value-driven",
+        "content_types": "industry insights, career achievements, professional learnings",
+        "best_practices": "Use professional language, include data/insights, ask thoughtful questions"
+    },
+    "twitter": {
+        "tone": "concise, engaging, conversational",
+        "content_types": "quick thoughts, news reactions, engaging questions, thread stories",
+        "best_practices": "Keep it under 280 characters, use 1-2 relevant hashtags, engage with replies"
+    },
+    "instagram": {
+        "tone": "visual, personal, authentic, engaging",
+        "content_types": "personal stories, behind-the-scenes, visual content, reels",
+        "best_practices": "High-quality visuals essential, use 5-10 relevant hashtags, engaging captions"
+    },
+    "facebook": {
+        "tone": "friendly, personal, community-oriented",
+        "content_types": "personal updates, community stories, event shares, longer narratives",
+        "best_practices": "Tell a short story, invite comments with a question, use 0-3 hashtags"
+    }
+}
+
+PLATFORM_NAMES = {
+    "linkedin": "LinkedIn",
+    "twitter": "Twitter/X",
+    "instagram": "Instagram",
+    "facebook": "Facebook"
+}
+
+PLATFORM_KEYWORDS = {
+    'linkedin': ['linkedin', 'linkedin post', 'professional post'],
+    'twitter': ['twitter', 'tweet', 'x post', 'x.com'],
+    'instagram': ['instagram', 'ig post', 'insta post'],
+    'facebook': ['facebook', 'fb post']
+}
+
+# Asking for a fresh take on the same request; a stored generation would repeat the last one
+REGENERATE_INTENT = re.compile(
+    r"\b(regenerate|another|different|alternative|again|redo|rewrite|re-write|new (one|version|take))\b"
+)
+
 class GeminiClient:
-    def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
+    def __init__(self, api_key: Optional[str] = None):
+        # Construction is free: the SDK is imported and configured on first use
+        self._api_key = api_key
+        self._initialized = False
+        self._client = None
+        self._model = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def client(self):
+        self._ensure_initialized()
+        return self._client
+
+    @property
+    def model(self):
+        self._ensure_initialized()
+        return self._model
+
+    async def warmup(self) -> bool:
+        """Import and configure the SDK off the event loop; True if a real model is available"""
+        await asyncio.to_thread(self._ensure_initialized)
+        return self._model is not None
+
+    def _ensure_initialized(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        
+        api_key = self._api_key or settings.GEMINI_API_KEY
         if not api_key:
             logger.warning("GEMINI_API_KEY not found, using mock responses")
-            self.client = None
-            self.model = None
             return
         
         try:
+            import google.generativeai as genai
             genai.configure(api_key=api_key)
             # Try to get the correct model name/initialization
             try:
-                self.model = genai.GenerativeModel('gemini-pro')
-                self.client = genai
+                self._model = genai.GenerativeModel('gemini-pro')
+                self._client = genai
             except (AttributeError, TypeError):
                 # Fallback if GenerativeModel not available
                 logger.warning("GenerativeModel not available, using mock responses")
-                self.client = None
-                self.model = None
+                self._client = None
+                self._model = None
         except Exception as e:
             logger.warning(f"Gemini initialization failed: {e}, using mock responses")
-            self.client = None
-            self.model = None
+            self._client = None
+            self._model = None
 
-    async def generate_reply(self, message: str, context: List[Dict[str, Any]] = None, trends: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def generate_reply(self, message: str, context: List[Dict[str, Any]] = None, trends: List[Dict[str, Any]] = None, session_id: Optional[str] = None) -> Dict[str, Any]:
         """Generate AI response with platform-specific post generation"""
         
-        # Check if user is requesting specific platform post
-        platform_request = self._detect_platform_request(message)
+        # Check if user is requesting specific platform posts
+        platform_requests = self._detect_platform_requests(message)
+        
+        if platform_requests:
+            # Near-duplicate post requests reuse a stored generation instead of calling the model
+            reused = self._find_similar_generation(platform_requests, message, context, session_id)
+            if reused:
+                return reused
         
-        if platform_request:
-            return await self._generate_platform_specific_post(message, platform_request, context, trends)
+        if len(platform_requests) > 1:
+            return await self._generate_multi_platform_posts(message, platform_requests, context, trends, session_id)
+        if platform_requests:
+            return await self._generate_platform_specific_post(message, platform_requests[0], context, trends, session_id)
         
         if not self.client:
             return self._mock_response(message, trends)
         
         try:
             prompt = self._build_conversation_prompt(message, context, trends, is_general=True)
-            response = self.model.generate_content(prompt)
+            response = await gemini_breaker.call(self._generate_content, prompt, "reply", kind="reply")
             
             return self._parse_ai_response(response.text, message)
             
+        except CircuitOpenError:
+            return self._mock_response(message, trends)
         except Exception as e:
             logger.error(f"Gemini API error: {e}")
             return self._mock_response(message, trends)
     
+    async def _generate_content(self, prompt: str, kind: str = "reply"):
+        """Run the blocking SDK call off the event loop so timeouts can fire.
+        
+        A timeout cannot stop the thread, so calls run on a pool no larger than
+        the admission limit: calls abandoned by a timeout keep their worker until
+        they return, new calls wait in the pool's queue (and are dropped from it
+        if their own deadline passes first), and real concurrency never exceeds
+        the cap.
+        """
+        metrics.LLM_PROMPT_CHARS.labels(kind).observe(len(prompt))
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=settings.LLM_MAX_CONCURRENCY, thread_name_prefix="gemini")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.model.generate_content, prompt)
+    
+    async def summarize_conversation(self, summary: str, messages: List[Dict[str, Any]], max_chars: int) -> str:
+        """Fold ``messages`` into the running conversation ``summary``"""
+        transcript = "\n".join(
+            f"{'User' if m.get('role') == 'user' else 'Assistant'}: {m.get('text', '')}" for m in messages
+        )
+        if self.client:
+            prompt = f"""
+            Update the running summary of a conversation between a user and a social media content assistant.
+            Keep the user's goals, brand details, platforms, preferences and any decisions or drafts they liked.
+            Drop greetings and filler. Answer with the updated summary only, at most {max_chars} characters.
+            
+            CURRENT SUMMARY:
+            {summary or "None yet."}
+            
+            NEW MESSAGES:
+            {transcript}
+            """
+            try:
+                response = await gemini_background_breaker.call(self._generate_content, prompt, "summary", kind="summary")
+                text = (response.text or "").strip()
+                if text:
+                    return text[:max_chars]
+            except CircuitOpenError:
+                pass
+            except Exception as e:
+                logger.warning(f"Gemini summary error: {e}")
+        return self._mock_summary(summary, messages, max_chars)
+    
+    def _mock_summary(self, summary: str, messages: List[Dict[str, Any]], max_chars: int) -> str:
+        """Extractive summary without the model: what the user asked, most recent kept"""
+        asks = [f"User asked: {m.get('text', '')[:160]}" for m in messages if m.get("role") == "user"]
+        text = "\n".join(filter(None, [summary, *asks]))
+        return text[-max_chars:]
+    
     def _detect_platform_request(self, message: str) -> Optional[str]:
         """Detect if user is requesting a specific platform post"""
+        platforms = self._detect_platform_requests(message)
+        return platforms[0] if platforms else None
+    
+    def _detect_platform_requests(self, message: str) -> List[str]:
+        """Detect every platform the user is requesting, in the order they are mentioned"""
         message_lower = message.lower()
         
-        platform_keywords = {
-            'linkedin': ['linkedin', 'linkedin post', 'professional post'],
-            'twitter': ['twitter', 'tweet', 'x post', 'x.com'],
-            'instagram': ['instagram', 'ig post', 'insta post'],
-            'facebook': ['facebook', 'fb post']
-        }
+        positions = {}
+        for platform, keywords in PLATFORM_KEYWORDS.items():
+            found = [message_lower.find(keyword) for keyword in keywords if keyword in message_lower]
+            if found:
+                positions[platform] = min(found)
         
-        for platform, keywords in platform_keywords.items():
-            if any(keyword in message_lower for keyword in keywords):
-                return platform
-        
-        return None
+        return sorted(positions, key=positions.get)
     
-    async def _generate_platform_specific_post(self, message: str, platform: str, context: List[Dict[str, Any]] = None, trends: List[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Generate content for specific platform request"""
+    async def _generate_platform_specific_post(self, message: str, platform: str, context: List[Dict[str, Any]] = None, trends: List[Dict[str, Any]] = None, session_id: Optional[str] = None, background: bool = False) -> Dict[str, Any]:
+        """Generate content for specific platform request.
+        
+        ``background`` generations (speculative drafts) go through the background
+        breaker and are not indexed for reuse; the caller indexes what it serves.
+        """
         
         if not self.client:
             return self._mock_platform_response(message, platform)
         
         try:
             prompt = self._build_platform_specific_prompt(message, platform, context, trends)
-            response = self.model.generate_content(prompt)
+            breaker = gemini_background_breaker if background else gemini_breaker
+            response = await breaker.call(self._generate_content, prompt, "platform", kind="platform")
             
-            return self._parse_platform_response(response.text, platform, message)
+            parsed = self._parse_platform_response(response.text, platform, message)
+            if not background:
+                self._remember_generation([platform], message, context, parsed, session_id)
+            return parsed
             
+        except CircuitOpenError:
+            return self._mock_platform_response(message, platform)
         except Exception as e:
             logger.error(f"Platform-specific generation error: {e}")
             return self._mock_platform_response(message, platform)
     
+    async def _generate_multi_platform_posts(self, message: str, platforms: List[str], context: List[Dict[str, Any]] = None, trends: List[Dict[str, Any]] = None, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Generate posts for several platforms from one combined prompt (one LLM round trip)"""
+        
+        if not self.client:
+            return self._mock_multi_platform_response(message, platforms)
+        
+        try:
+            prompt = self._build_multi_platform_prompt(message, platforms, context, trends)
+            response = await gemini_breaker.call(self._generate_content, prompt, "multi", kind="multi")
+            
+            parsed = self._parse_multi_platform_response(response.text, platforms, message)
+            self._remember_generation(platforms, message, context, parsed, session_id)
+            return parsed
+            
+        except CircuitOpenError:
+            return self._mock_multi_platform_response(message, platforms)
+        except Exception as e:
+            logger.error(f"Multi-platform generation error: {e}")
+            return self._mock_multi_platform_response(message, platforms)
+    
+    def _similarity_text(self, message: str, context: List[Dict[str, Any]] = None) -> str:
+        """Request plus the user's last couple of turns, since posts are built from both"""
+        recent = [m.get("text", "") for m in (context or []) if m.get("role") == "user"][-2:]
+        return " ".join(recent + [message])
+    
+    def _find_similar_generation(self, platforms: List[str], message: str, context: List[Dict[str, Any]] = None, session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        if not settings.SIMILARITY_CACHE_ENABLED or REGENERATE_INTENT.search(message.lower()):
+            return None
+        from .similarity import request_key, similarity_index
+        from .speculation import is_plain_request
+        
+        # A request with its own instructions ("...but make it shorter") only reuses a post made for the same words
+        plain = is_plain_request(message)
+        request = request_key(message)
+        
+        def reusable(meta: Dict[str, Any]) -> bool:
+            # Asking again in the same session means the earlier post was not what the user wanted
+            if session_id and meta.get("session") == session_id:
+                return False
+            return plain or meta.get("request") == request
+        
+        return similarity_index.lookup(",".join(sorted(platforms)), self._similarity_text(message, context), reusable)
+    
+    def _remember_generation(self, platforms: List[str], message: str, context: List[Dict[str, Any]], response: Dict[str, Any], session_id: Optional[str] = None):
+        # Placeholder or partial responses must not be served again as if generated
+        if (not settings.SIMILARITY_CACHE_ENABLED or not response.get("suggestions")
+                or response.get("fallback") or response.get("missing_platforms")):
+            return
+        from .similarity import request_key, similarity_index
+        similarity_index.add(
+            ",".join(sorted(platforms)), self._similarity_text(message, context), response,
+            {"request": request_key(message), "session": session_id},
+        )
+    
     def _build_conversation_prompt(self, message: str, context: List[Dict[str, Any]] = None, trends: List[Dict[str, Any]] = None, is_general: bool = True) -> str:
         """Build prompt for general conversation"""
         
@@ -137,25 +336,7 @@ class GeminiClient:
         context_text = self._build_context_text(context)
         trends_text = self._build_trends_text(trends)
         
-        platform_guides = {
-            "linkedin": {
-                "tone": "professional, insightful, value-driven",
-                "content_types": "industry insights, career achievements, professional learnings",
-                "best_practices": "Use professional language, include data/insights, ask thoughtful questions"
-            },
-            "twitter": {
-                "tone": "concise, engaging, conversational",
-                "content_types": "quick thoughts, news reactions, engaging questions, thread stories",
-                "best_practices": "Keep it under 280 characters, use 1-2 relevant hashtags, engage with replies"
-            },
-            "instagram": {
-                "tone": "visual, personal, authentic, engaging",
-                "content_types": "personal stories, behind-the-scenes, visual content, reels",
-                "best_practices": "High-quality visuals essential, use 5-10 relevant hashtags, engaging captions"
-            }
-        }
-        
-        guide = platform_guides.get(platform, platform_guides["linkedin"])
+        guide = PLATFORM_GUIDES.get(platform, PLATFORM_GUIDES["linkedin"])
         
         return f"""
         Generate a {platform} post based on the user's request and conversation history.
@@ -193,13 +374,70 @@ class GeminiClient:
         }}
         """
     
+    def _build_multi_platform_prompt(self, message: str, platforms: List[str], context: List[Dict[str, Any]] = None, trends: List[Dict[str, Any]] = None) -> str:
+        """Build one prompt asking for a post per platform, each with its own guide"""
+        
+        context_text = self._build_context_text(context)
+        trends_text = self._build_trends_text(trends)
+        
+        guides_text = ""
+        for platform in platforms:
+            guide = PLATFORM_GUIDES.get(platform, PLATFORM_GUIDES["linkedin"])
+            guides_text += f"""
+        Platform: {platform}
+        Tone: {guide['tone']}
+        Content Types: {guide['content_types']}
+        Best Practices: {guide['best_practices']}
+        """
+        
+        names = ", ".join(PLATFORM_NAMES.get(p, p) for p in platforms)
+        
+        return f"""
+        Generate one post for EACH of these platforms based on the user's request and conversation history: {", ".join(platforms)}.
+        Adapt the same story to every platform's tone and format; do not copy the same text across platforms.
+        {guides_text}
+        Current Trends:
+        {trends_text}
+        
+        Conversation Context:
+        {context_text}
+        
+        User's Request: {message}
+        
+        Provide exactly one suggestion per platform, in this exact JSON format:
+        {{
+            "reply": "I've created posts for {names} based on your content. Here's why each approach works well:",
+            "suggestions": [
+                {{
+                    "platform": "one of: {", ".join(platforms)}",
+                    "type": "recommended_content_type",
+                    "content": "the actual post content ready to copy-paste",
+                    "hashtags": ["#relevant", "#hashtags"],
+                    "why_effective": "detailed explanation of why this post will perform well",
+                    "visual_recommendation": "specific advice on images/videos needed and why",
+                    "best_time": "optimal posting time with reasoning",
+                    "engagement_tips": ["specific tip 1", "specific tip 2", "specific tip 3"],
+                    "performance_prediction": "what kind of engagement to expect"
+                }}
+            ],
+            "should_suggest": true
+        }}
+        """
+    
     def _build_context_text(self, context: List[Dict[str, Any]] = None) -> str:
         """Build context from conversation history"""
         if not context:
             return "No previous conversation."
         
         context_text = ""
-        for msg in context[-8:]:  # Last 8 messages
+        messages = []
+        for msg in context:
+            # The rolling summary stands in for the turns older than the recent window
+            if msg.get("role") == "summary":
+                context_text += f"Summary of the earlier conversation: {msg.get('text', '')}\n"
+            else:
+                messages.append(msg)
+        for msg in messages[-settings.CHAT_CONTEXT_MESSAGES:]:
             role = "User" if msg.get("role") == "user" else "Assistant"
             context_text += f"{role}: {msg.get('text', '')}\n"
         
@@ -232,14 +470,16 @@ class GeminiClient:
                 return {
                     "reply": response_text[:500],
                     "suggestions": self._generate_fallback_suggestions(original_message),
-                    "should_suggest": True
+                    "should_suggest": True,
+                    "fallback": True
                 }
         except json.JSONDecodeError:
             logger.warning("Failed to parse AI response as JSON")
             return {
                 "reply": response_text[:500],
                 "suggestions": self._generate_fallback_suggestions(original_message),
-                "should_suggest": True
+                "should_suggest": True,
+                "fallback": True
             }
     
     def _parse_platform_response(self, response_text: str, platform: str, original_message: str) -> Dict[str, Any]:
@@ -253,6 +493,60 @@ class GeminiClient:
         
         return parsed
     
+    def _match_platform(self, label: Any, platforms: List[str]) -> Optional[str]:
+        """Requested platform a model-written label refers to ("LinkedIn", "Twitter/X", "X", "instagram reel")"""
+        text = str(label or "").strip().lower()
+        if not text:
+            return None
+        for platform in platforms:
+            names = {platform, PLATFORM_NAMES.get(platform, platform).lower(), *PLATFORM_KEYWORDS.get(platform, [])}
+            if text in names or (platform == "twitter" and text == "x"):
+                return platform
+        for platform in platforms:
+            if platform in text:
+                return platform
+        return None
+    
+    def _parse_multi_platform_response(self, response_text: str, platforms: List[str], original_message: str) -> Dict[str, Any]:
+        """Split a combined response into one suggestion per requested platform.
+        
+        Platforms the model skipped are listed in ``missing_platforms`` and
+        mentioned in the reply rather than filled with made-up posts.
+        """
+        parsed = self._parse_ai_response(response_text, original_message)
+        if parsed.get("fallback"):
+            # Not JSON at all: nothing usable for any platform
+            return self._mock_multi_platform_response(original_message, platforms)
+        
+        by_platform = {}
+        for suggestion in parsed.get("suggestions") or []:
+            if not isinstance(suggestion, dict):
+                continue
+            platform = self._match_platform(suggestion.get("platform"), platforms)
+            if platform and platform not in by_platform:
+                suggestion["platform"] = platform
+                by_platform[platform] = suggestion
+        
+        missing = [p for p in platforms if p not in by_platform]
+        parsed["suggestions"] = [by_platform[p] for p in platforms if p in by_platform]
+        parsed["should_suggest"] = True
+        if missing:
+            logger.warning(f"Multi-platform generation skipped {missing}")
+            names = ", ".join(PLATFORM_NAMES.get(p, p) for p in missing)
+            parsed["missing_platforms"] = missing
+            parsed["reply"] = f"{parsed.get('reply') or ''} I couldn't create the {names} post this time; ask again to retry it.".strip()
+        return parsed
+    
+    def _mock_multi_platform_response(self, message: str, platforms: List[str]) -> Dict[str, Any]:
+        """Mock response for a multi-platform request"""
+        names = ", ".join(PLATFORM_NAMES.get(p, p) for p in platforms)
+        return {
+            "reply": f"I've created posts for {names} based on your content. Here are tailored suggestions:",
+            "suggestions": [self._mock_platform_response(message, p)["suggestions"][0] for p in platforms],
+            "should_suggest": True,
+            "fallback": True
+        }
+    
     def _mock_response(self, message: str, trends: List[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Enhanced mock response"""
         reply = f"I understand you're sharing about your day! '{message[:100]}...' "
@@ -261,18 +555,13 @@ class GeminiClient:
         return {
             "reply": reply,
             "suggestions": [],
-            "should_suggest": False
+            "should_suggest": False,
+            "fallback": True
         }
     
     def _mock_platform_response(self, message: str, platform: str) -> Dict[str, Any]:
         """Mock platform-specific response"""
-        platform_names = {
-            "linkedin": "LinkedIn",
-            "twitter": "Twitter/X",
-            "instagram": "Instagram"
-        }
-        
-        platform_name = platform_names.get(platform, platform)
+        platform_name = PLATFORM_NAMES.get(platform, platform)
         
         return {
             "reply": f"I've created a {platform_name} post for you based on your content. Here's a tailored suggestion:",
@@ -289,7 +578,8 @@ class GeminiClient:
                     "performance_prediction": "Expected good engagement with 5-10+ comments"
                 }
             ],
-            "should_suggest": True
+            "should_suggest": True,
+            "fallback": True
         }
     
     def _generate_fallback_suggestions(self, message: str) -> List[Dict[str, Any]]:
@@ -345,5 +635,5 @@ class GeminiClient:
 # Singleton instance
 ai_client = GeminiClient()
 
-async def generate_reply(message: str, context: List[Dict[str, Any]] = None, trends: List[Dict[str, Any]] = None) -> Dict[str, Any]:
-    return await ai_client.generate_reply(message, context, trends)
\ No newline at end of file
+async def generate_reply(message: str, context: List[Dict[str, Any]] = None, trends: List[Dict[str, Any]] = None, session_id: Optional[str] = None) -> Dict[str, Any]:
+    return await ai_client.generate_reply(message, context, trends, session_id)
\ No newline at end of file
@@ -0,0 +1,162 @@
+# services/archiver.py
+"""Moves cold chat sessions out of the hot ``chats`` collection.
+
+Sessions idle for ``ARCHIVE_IDLE_DAYS`` are BSON-encoded, zlib-compressed
+and stored as a single binary blob in ``chats_archive``. The hot copy is then
+deleted, but only if the session was not updated in the meantime. Reading an
+archived session (see ``repositories/mongo.py``) rehydrates it into ``chats``
+and removes the blob, so callers never see the difference. A write to a
+session that was archived after the caller loaded it matches nothing in
+``chats``; the repository then rehydrates the session and applies the write
+again, so a turn racing the archiver is not lost.
+"""
+import asyncio
+import logging
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import bson
+
+from ..core import metrics
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CODEC = "bson+zlib"
+
+
+def pack_session(doc: Dict[str, Any]) -> Dict[str, Any]:
+    raw = bson.encode(doc)
+    blob = zlib.compress(raw, 9)
+    return {
+        "_id": doc["_id"],
+        "codec": CODEC,
+        "blob": bson.Binary(blob),
+        "raw_bytes": len(raw),
+        "stored_bytes": len(blob),
+        "message_count": len(doc.get("messages", [])),
+        "created_at": doc.get("created_at"),
+        "updated_at": doc.get("updated_at"),
+        "archived_at": datetime.utcnow(),
+    }
+
+
+def unpack_session(archived: Dict[str, Any]) -> Dict[str, Any]:
+    if archived.get("codec") != CODEC:
+        raise ValueError(f"Unknown archive codec {archived.get('codec')!r}")
+    return bson.decode(zlib.decompress(archived["blob"]))
+
+
+class SessionArchiver:
+    def __init__(self, idle_days: float, interval: float, batch_size: int):
+        self.idle_days = idle_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.db = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, db):
+        if db is None or self._task is not None or not settings.ARCHIVE_ENABLED:
+            return
+        self.db = db
+        self._task = asyncio.create_task(self._loop(), name="session-archiver")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                result = await self.run_once(self.db)
+                if result["archived"]:
+                    logger.info(f"Archived {result['archived']} cold sessions, {result['bytes_saved']} bytes saved")
+            except Exception as e:
+                logger.warning(f"Session archival failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, db, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Archive one batch of sessions idle past the cutoff"""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.idle_days)
+        query = {
+            "updated_at": {"$lt": cutoff},
+            # A rehydrated session gets a fresh idle period
+            "$or": [{"rehydrated_at": {"$exists": False}}, {"rehydrated_at": {"$lt": cutoff}}],
+        }
+        archived = bytes_saved = 0
+        docs: List[Dict[str, Any]] = await db.chats.find(query).sort("updated_at", 1).limit(self.batch_size).to_list(
+            length=self.batch_size
+        )
+        for doc in docs:
+            packed = pack_session(doc)
+            await db.chats_archive.replace_one({"_id": doc["_id"]}, packed, upsert=True)
+            res = await db.chats.delete_one({"_id": doc["_id"], "updated_at": doc.get("updated_at")})
+            if res.deleted_count != 1:
+                # Updated while we were archiving it: it is not cold any more
+                await db.chats_archive.delete_one({"_id": doc["_id"]})
+                continue
+            archived += 1
+            bytes_saved += packed["raw_bytes"] - packed["stored_bytes"]
+        metrics.SESSIONS_ARCHIVED.inc(archived)
+        metrics.ARCHIVE_BYTES_SAVED.inc(max(0, bytes_saved))
+        return {"archived": archived, "bytes_saved": bytes_saved}
+
+    async def rehydrate(self, db, session_id) -> Optional[Dict[str, Any]]:
+        """Move an archived session back into ``chats`` and return it; None if it exists in neither"""
+        archived = await db.chats_archive.find_one({"_id": session_id})
+        if archived is None:
+            # A concurrent caller may have restored it already (it inserts before deleting the archive)
+            return await db.chats.find_one({"_id": session_id})
+        doc = unpack_session(archived)
+        doc["rehydrated_at"] = datetime.utcnow()
+        from pymongo.errors import DuplicateKeyError
+
+        try:
+            await db.chats.insert_one(doc)
+        except DuplicateKeyError:
+            # Another request rehydrated it first
+            pass
+        await db.chats_archive.delete_one({"_id": session_id})
+        metrics.SESSIONS_REHYDRATED.inc()
+        return await db.chats.find_one({"_id": session_id})
+
+    async def report(self, db) -> Dict[str, Any]:
+        """Archive totals and the hot collection's current size"""
+        totals = await db.chats_archive.aggregate([
+            {"$group": {
+                "_id": None,
+                "sessions": {"$sum": 1},
+                "messages": {"$sum": "$message_count"},
+                "raw_bytes": {"$sum": "$raw_bytes"},
+                "stored_bytes": {"$sum": "$stored_bytes"},
+            }},
+        ]).to_list(length=1)
+        archive = totals[0] if totals else {"sessions": 0, "messages": 0, "raw_bytes": 0, "stored_bytes": 0}
+        archive.pop("_id", None)
+        raw, stored = archive["raw_bytes"], archive["stored_bytes"]
+        report = {
+            "archive": archive,
+            # Bytes no longer in the hot working set, and what compression saved on disk
+            "working_set_bytes_saved": raw,
+            "storage_bytes_saved": raw - stored,
+            "compression_ratio": round(raw / stored, 2) if stored else None,
+            "hot": None,
+        }
+        try:
+            stats = await db.command("collStats", "chats")
+            report["hot"] = {key: stats.get(key) for key in ("count", "size", "avgObjSize", "storageSize")}
+        except Exception as e:
+            logger.debug(f"collStats unavailable: {e}")
+        return report
+
+
+# Singleton instance
+session_archiver = SessionArchiver(
+    idle_days=settings.ARCHIVE_IDLE_DAYS,
+    interval=settings.ARCHIVE_INTERVAL_SECONDS,
+    batch_size=settings.ARCHIVE_BATCH_SIZE,
+)
@@ -0,0 +1,332 @@
+# services/capture.py
+"""Sampled capture of production traffic for offline replay.
+
+``CaptureTrafficMiddleware`` asks ``TrafficCapture`` whether a ``/api/chat``
+or ``/contents`` request is sampled before buffering anything, and hands each
+sampled request, once finished, to ``TrafficCapture.record``, which appends
+one JSON line per request to a size-rotated file (``CAPTURE_PATH``,
+``.1`` ... ``.N`` backups). Each record has the arrival time, server-side
+duration, status, request body/query after redaction, and the shape of the
+payloads (text lengths, platforms asked for, suggestions returned).
+``scripts/replay_capture.py`` re-runs a capture against a local instance.
+
+Sampling is consistent per chat session and per content document (a keyed
+hash of its id), so a captured conversation or create/read/update chain is
+complete. The id comes from the path or query where it is there; otherwise
+(a chat turn naming its session in the body, a new session or document whose
+id is only in the response) it is found in the raw bytes without parsing
+them, and only sampled requests are parsed. Session ids and idempotency keys are replaced by keyed pseudonyms;
+free-text fields are masked word by word, keeping the words that decide how a
+request is handled (platform names, "give me a post"). Writes happen on a
+background thread through a bounded queue; when it is full, records are
+dropped rather than slowing requests down.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from ..core import metrics
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Request bodies and responses larger than this are recorded by size only
+MAX_CAPTURED_BODY = 256 * 1024
+QUEUE_SIZE = 10000
+
+OBJECT_ID = re.compile(r"\b[0-9a-f]{24}\b")
+WORD = re.compile(r"\w+")
+CHAT_SESSION_PATH = re.compile(r"^(/api/chat/sessions/)([^/]+)")
+# Sampling keys in raw request/response bodies, found without parsing them
+SESSION_FIELD = re.compile(rb'"session_id"\s*:\s*"([^"\\]+)"')
+CONTENT_ID_FIELD = re.compile(rb'"id"\s*:\s*"([0-9a-f]{24})"')
+
+# Words kept by CAPTURE_REDACT=mask: platform names, request phrasing and "another one", so a
+# masked message takes the same path (platform post, regeneration, served draft) when replayed
+KEEP_WORDS = {
+    "a", "an", "the", "me", "my", "us", "for", "of", "on", "to", "and", "i", "it", "this", "that", "about",
+    "some", "one", "please", "can", "could", "would", "you", "want", "need", "now", "also", "ok", "okay",
+    "sure", "great", "thanks", "give", "write", "create", "make", "draft", "generate", "post", "posts",
+    "tweet", "linkedin", "professional", "twitter", "x", "com", "instagram", "insta", "ig", "facebook", "fb",
+    "regenerate", "another", "different", "alternative", "again", "redo", "rewrite", "re", "new", "version",
+    "take",
+}
+
+
+def route_of(path: str) -> str:
+    """Path with ids replaced, to group requests by endpoint"""
+    return OBJECT_ID.sub("{id}", CHAT_SESSION_PATH.sub(r"\1{id}", path))
+
+
+def _text_shape(value: str) -> Dict[str, int]:
+    return {"chars": len(value), "words": len(value.split())}
+
+
+class RotatingWriter:
+    """Appends lines to ``path`` on a background thread, rotating at ``max_bytes``."""
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self, line: str) -> bool:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(line)
+            return True
+        except queue.Full:
+            return False
+
+    def _run(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        f = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                line = self._queue.get()
+                if line is None:
+                    break
+                if self.max_bytes and f.tell() + len(line) > self.max_bytes and f.tell() > 0:
+                    f.close()
+                    self._rotate()
+                    f = open(self.path, "a", encoding="utf-8")
+                f.write(line)
+                if self._queue.empty():
+                    f.flush()
+        except Exception as e:
+            logger.error(f"Traffic capture writer stopped: {e}")
+        finally:
+            f.close()
+
+    def _rotate(self):
+        """traffic.jsonl -> .1 -> .2 ...; the oldest backup is dropped"""
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def close(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+
+class TrafficCapture:
+    def __init__(self, sample_rate: float, redact: str, redact_fields: str, salt: str, writer: RotatingWriter):
+        self.sample_rate = sample_rate
+        self.redact = redact.lower()
+        self.redact_fields = {f.strip() for f in redact_fields.split(",") if f.strip()}
+        # Without a configured salt, pseudonyms are only stable for this process
+        self._key = (salt or secrets.token_hex(16)).encode()
+        self.writer = writer
+
+    def _digest(self, value: str) -> str:
+        return hmac.new(self._key, value.encode(), hashlib.sha256).hexdigest()
+
+    def pseudonym(self, prefix: str, value: Optional[str]) -> Optional[str]:
+        return f"{prefix}{self._digest(value)[:16]}" if value else None
+
+    def sampled(self, key: Optional[str]) -> bool:
+        """Same decision for every request about the same session or document"""
+        if self.sample_rate >= 1:
+            return True
+        if self.sample_rate <= 0:
+            return False
+        if key is None:
+            return secrets.randbelow(1_000_000) < self.sample_rate * 1_000_000
+        return int(self._digest(key)[:8], 16) < self.sample_rate * 0x100000000
+
+    def request_key(self, method: str, path: str, query_string: bytes) -> Tuple[Optional[str], bool]:
+        """The sampling key named by the path or query, and whether the body or response may name it instead"""
+        if path.startswith("/api/chat"):
+            path_session = CHAT_SESSION_PATH.match(path)
+            if path_session:
+                return _chat_session(path_session.group(2)), False
+            session_id = dict(parse_qsl(query_string.decode("latin-1"))).get("session_id")
+            if session_id:
+                return _chat_session(session_id), False
+        else:
+            ids = OBJECT_ID.findall(path)
+            if ids:
+                return ids[0], False
+        return None, method == "POST"
+
+    @staticmethod
+    def body_key(path: str, request_body: bytes) -> Optional[str]:
+        """The chat session a request body continues, if any"""
+        if not path.startswith("/api/chat"):
+            return None
+        found = SESSION_FIELD.search(request_body)
+        return _chat_session(found.group(1).decode("latin-1")) if found else None
+
+    @staticmethod
+    def response_key(path: str, response_body: bytes) -> Optional[str]:
+        """The session or document a response created"""
+        found = (SESSION_FIELD if path.startswith("/api/chat") else CONTENT_ID_FIELD).search(response_body)
+        if not found:
+            return None
+        key = found.group(1).decode("latin-1")
+        return _chat_session(key) if path.startswith("/api/chat") else key
+
+    def mask(self, value: str) -> str:
+        if self.redact == "none":
+            return value
+        if self.redact == "full":
+            return WORD.sub(lambda m: "x" * len(m.group()), value)
+        return WORD.sub(lambda m: m.group() if m.group().lower() in KEEP_WORDS else "x" * len(m.group()), value)
+
+    def record(self, method: str, path: str, query_string: bytes, headers: Dict[bytes, bytes], started: float,
+               duration: float, request_body: bytes, status: int, response_body: bytes, response_bytes: int):
+        """Redact and queue one finished, sampled request; never raises"""
+        try:
+            line = self._build(method, path, query_string, headers, started, duration, request_body,
+                               status, response_body, response_bytes)
+        except Exception as e:
+            logger.warning(f"Traffic capture failed for {method} {path}: {e}")
+            return
+        if line is None:
+            return
+        if self.writer.write(line):
+            metrics.TRAFFIC_CAPTURED.labels("captured").inc()
+        else:
+            metrics.TRAFFIC_CAPTURED.labels("dropped").inc()
+
+    def _build(self, method, path, query_string, headers, started, duration, request_body,
+               status, response_body, response_bytes) -> Optional[str]:
+        body = _json_or_none(request_body)
+        response = _json_or_none(response_body)
+        query = dict(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True))
+        route = route_of(path)
+        shape: Dict[str, Any] = {}
+        request_fields = body if isinstance(body, dict) else {}
+        response_fields = response if isinstance(response, dict) else {}
+
+        session_id = None
+        content_id = None
+        if path.startswith("/api/chat"):
+            path_session = CHAT_SESSION_PATH.match(path)
+            session_id = (
+                (path_session.group(2) if path_session else None)
+                or query.get("session_id")
+                or request_fields.get("session_id")
+                or response_fields.get("session_id")
+            )
+            session_id = _chat_session(session_id)
+        else:
+            ids = OBJECT_ID.findall(path)
+            if ids:
+                content_id = ids[0]
+            elif method == "POST":
+                content_id = response_fields.get("id")
+
+        session = self.pseudonym("s", session_id)
+        if CHAT_SESSION_PATH.match(path):
+            path = CHAT_SESSION_PATH.sub(lambda m: m.group(1) + (self.pseudonym("s", m.group(2)) or ""), path)
+        if "session_id" in query:
+            query["session_id"] = self.pseudonym("s", query["session_id"])
+
+        if isinstance(body, dict):
+            for key, value in body.items():
+                if isinstance(value, str):
+                    shape[key] = _text_shape(value)
+            if body.get("session_id"):
+                body["session_id"] = self.pseudonym("s", body["session_id"])
+            if isinstance(body.get("message"), str):
+                from .ai_client import ai_client
+
+                shape["platforms"] = ai_client._detect_platform_requests(body["message"])
+            body = {k: self.mask(v) if k in self.redact_fields and isinstance(v, str) else v
+                    for k, v in body.items()}
+        for key in list(query):
+            if key in self.redact_fields:
+                shape[key] = _text_shape(query[key])
+                query[key] = self.mask(query[key])
+
+        if isinstance(response, dict):
+            if "suggestions" in response:
+                shape["suggestions"] = len(response.get("suggestions") or [])
+                shape["platforms_suggested"] = sorted({s.get("platform") for s in response["suggestions"] or []
+                                                       if isinstance(s, dict) and s.get("platform")})
+                shape["should_suggest"] = bool(response.get("should_suggest"))
+            if isinstance(response.get("results"), list):
+                shape["results"] = len(response["results"])
+            if isinstance(response.get("messages"), list):
+                shape["messages"] = len(response["messages"])
+        elif isinstance(response, list):
+            shape["results"] = len(response)
+
+        idempotency_key = headers.get(b"idempotency-key")
+        record = {
+            "ts": started,
+            "method": method,
+            "path": path,
+            "route": route,
+            "query": query,
+            "session": session,
+            "content_id": content_id,
+            "idempotency_key": self.pseudonym("k", idempotency_key.decode("latin-1")) if idempotency_key else None,
+            "body": body,
+            "request_bytes": len(request_body),
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "response_bytes": response_bytes,
+            "shape": shape,
+        }
+        return json.dumps(record, separators=(",", ":"), default=_json_default) + "\n"
+
+    def close(self):
+        self.writer.close()
+
+
+def _chat_session(session_id: Optional[str]) -> Optional[str]:
+    # The placeholder id of the no-database mode is shared by every client
+    return None if session_id == "test-session" else session_id
+
+
+def _json_or_none(raw: bytes):
+    if not raw or len(raw) > MAX_CAPTURED_BODY:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+# Singleton instance
+traffic_capture = TrafficCapture(
+    sample_rate=settings.CAPTURE_SAMPLE_RATE,
+    redact=settings.CAPTURE_REDACT,
+    redact_fields=settings.CAPTURE_REDACT_FIELDS,
+    salt=settings.CAPTURE_SALT,
+    writer=RotatingWriter(settings.CAPTURE_PATH, settings.CAPTURE_MAX_BYTES, settings.CAPTURE_BACKUP_COUNT),
+)
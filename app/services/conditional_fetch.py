@@ -0,0 +1,101 @@
+# services/conditional_fetch.py
+"""Change-detecting fetches for scrape sources.
+
+Per source we remember the validators (ETag / Last-Modified) and a hash of the
+last body. Requests send If-None-Match / If-Modified-Since; a 304 or an
+identical body hash means the caller can reuse its previous parse. Each
+source's refresh interval adapts to how often it actually changes: it backs off
+while the page stays the same and tightens again when it changes.
+"""
+import hashlib
+import time
+from typing import Dict, Optional
+
+from ..core import metrics
+from ..core.config import settings
+
+CHANGED, NOT_MODIFIED, UNCHANGED, ERROR = "changed", "not_modified", "unchanged", "error"
+# Not fetched: still inside the source's refresh interval
+NOT_DUE = "not_due"
+
+
+class SourceState:
+    __slots__ = ("etag", "last_modified", "body_hash", "body_size", "interval", "next_fetch_at")
+
+    def __init__(self):
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.body_hash: Optional[str] = None
+        self.body_size = 0
+        self.interval = 0.0
+        self.next_fetch_at = 0.0
+
+
+class ConditionalFetcher:
+    def __init__(self, min_interval: float, max_interval: float, backoff: float = 1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.sources: Dict[str, SourceState] = {}
+
+    def _state(self, url: str) -> SourceState:
+        state = self.sources.get(url)
+        if state is None:
+            state = self.sources[url] = SourceState()
+        return state
+
+    def is_due(self, url: str) -> bool:
+        """False while a source that has not been changing is inside its backoff interval"""
+        state = self.sources.get(url)
+        if state is None or state.body_hash is None or time.time() >= state.next_fetch_at:
+            return True
+        metrics.SCRAPE_BYTES_SAVED.labels(url).inc(state.body_size)
+        metrics.SCRAPE_PARSES_SKIPPED.labels(url, "interval").inc()
+        return False
+
+    def request_headers(self, url: str) -> Dict[str, str]:
+        state = self.sources.get(url)
+        headers = {}
+        if state is not None:
+            if state.etag:
+                headers["If-None-Match"] = state.etag
+            if state.last_modified:
+                headers["If-Modified-Since"] = state.last_modified
+        return headers
+
+    def observe(self, url: str, response) -> str:
+        """Classify a response and update validators and the refresh interval"""
+        state = self._state(url)
+        if response.status_code == 304 and state.body_hash is not None:
+            metrics.SCRAPE_BYTES_SAVED.labels(url).inc(state.body_size)
+            metrics.SCRAPE_PARSES_SKIPPED.labels(url, "not_modified").inc()
+            self._schedule(state, changed=False)
+            return NOT_MODIFIED
+        if response.status_code != 200:
+            return ERROR
+
+        body = response.content
+        body_hash = hashlib.blake2b(body, digest_size=16).hexdigest()
+        state.etag = response.headers.get("etag")
+        state.last_modified = response.headers.get("last-modified")
+        state.body_size = len(body)
+        if body_hash == state.body_hash:
+            metrics.SCRAPE_PARSES_SKIPPED.labels(url, "same_hash").inc()
+            self._schedule(state, changed=False)
+            return UNCHANGED
+        state.body_hash = body_hash
+        self._schedule(state, changed=True)
+        return CHANGED
+
+    def _schedule(self, state: SourceState, changed: bool):
+        if changed:
+            state.interval = max(self.min_interval, state.interval / 2)
+        else:
+            state.interval = min(self.max_interval, max(self.min_interval, state.interval) * self.backoff)
+        state.next_fetch_at = time.time() + state.interval
+
+
+# Singleton instance
+conditional_fetcher = ConditionalFetcher(
+    settings.SCRAPE_MIN_INTERVAL_SECONDS, settings.SCRAPE_MAX_INTERVAL_SECONDS
+)
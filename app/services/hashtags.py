@@ -0,0 +1,137 @@
+# services/hashtags.py
+"""Hashtag analytics: category matching and a rolling frequency time series.
+
+Categorisation uses one precompiled regex over every category keyword plus a
+per-tag memo, instead of testing each hashtag against each keyword. The
+pattern is a lookahead tried at every position, so keywords that overlap but
+start at different positions all match ("lifestyle" gives lifestyle and
+fashion via "style"); at one position only the longest keyword matches, which
+is why keywords that prefix each other belong to the same category. Each
+source's hashtag counts are appended to hourly buckets once per hour (see
+``HashtagPageSource``); the buckets live in Mongo (``hashtag_buckets``, one
+``$inc`` upsert per record, shared by all workers) or in memory when no DB is
+configured. Velocity queries only read the buckets inside the two windows
+being compared, never the raw scrape history.
+"""
+import re
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+HASHTAG_CATEGORIES = {
+    "lifestyle": ["lifestyle", "life", "daily", "motivation", "inspiration"],
+    "travel": ["travel", "wanderlust", "adventure", "explore"],
+    "food": ["food", "foodie", "recipe", "cooking"],
+    "fashion": ["fashion", "style", "outfit", "beauty"],
+    "tech": ["tech", "technology", "innovation", "gadgets"],
+    "business": ["business", "entrepreneur", "startup", "marketing"]
+}
+
+BUCKET_SECONDS = 3600
+
+
+class CategoryMatcher:
+    """Matches hashtags to categories with a single compiled pattern."""
+
+    def __init__(self, categories: Dict[str, List[str]]):
+        self.categories = list(categories)
+        self._keyword_categories: Dict[str, List[str]] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                self._keyword_categories.setdefault(keyword, []).append(category)
+        # Longest keywords first so the alternation prefers them at each position
+        alternation = "|".join(re.escape(k) for k in sorted(self._keyword_categories, key=len, reverse=True))
+        self._pattern = re.compile(f"(?=({alternation}))")
+        self.match = lru_cache(maxsize=4096)(self._match)
+
+    def _match(self, tag: str) -> frozenset:
+        found = set()
+        for keyword in self._pattern.findall(tag.lower()):
+            found.update(self._keyword_categories[keyword])
+        return frozenset(found)
+
+    def categorize(self, hashtags: List[str], per_category: int = 5) -> Dict[str, List[str]]:
+        """Same shape as before: category -> up to ``per_category`` tags, in category order"""
+        buckets: Dict[str, List[str]] = {}
+        for tag in hashtags:
+            for category in self.match(tag):
+                buckets.setdefault(category, []).append(tag)
+        return {c: buckets[c][:per_category] for c in self.categories if c in buckets}
+
+
+class HashtagSeries:
+    """Hourly hashtag counts; in memory, or shared through a Mongo collection."""
+
+    def __init__(self, retention_hours: int = 7 * 24):
+        self.retention_hours = retention_hours
+        self.collection = None
+        self._memory: "OrderedDict[int, Counter]" = OrderedDict()
+
+    async def configure(self, db):
+        if db is None:
+            self.collection = None
+            return
+        self.collection = db.hashtag_buckets
+        # Buckets expire on their own once past retention
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def record(self, hashtags: List[str], at: Optional[float] = None):
+        counts = Counter(tag.lower() for tag in hashtags)
+        if not counts:
+            return
+        bucket = int((at or time.time()) // BUCKET_SECONDS) * BUCKET_SECONDS
+
+        if self.collection is not None:
+            await self.collection.update_one(
+                {"_id": bucket},
+                {
+                    "$inc": {f"counts.{tag.lstrip('#')}": n for tag, n in counts.items()},
+                    "$setOnInsert": {"expires_at": datetime.utcfromtimestamp(bucket + self.retention_hours * 3600)},
+                },
+                upsert=True,
+            )
+            return
+
+        self._memory.setdefault(bucket, Counter()).update({tag.lstrip("#"): n for tag, n in counts.items()})
+        cutoff = bucket - self.retention_hours * BUCKET_SECONDS
+        while self._memory and next(iter(self._memory)) < cutoff:
+            self._memory.popitem(last=False)
+
+    async def window_counts(self, start_bucket: int, end_bucket: int) -> Counter:
+        """Total counts over hourly buckets in [start_bucket, end_bucket)"""
+        total = Counter()
+        if self.collection is not None:
+            async for doc in self.collection.find({"_id": {"$gte": start_bucket, "$lt": end_bucket}}, {"counts": 1}):
+                total.update(doc.get("counts", {}))
+            return total
+        for bucket, counts in self._memory.items():
+            if start_bucket <= bucket < end_bucket:
+                total.update(counts)
+        return total
+
+    async def rising(self, window_hours: int = 24, limit: int = 10, now: Optional[float] = None) -> List[Dict[str, float]]:
+        """Fastest rising hashtags: mentions in the last window vs the window before it"""
+        # Windows are whole buckets, the current (partial) hour included in the recent one
+        end = int((now or time.time()) // BUCKET_SECONDS) * BUCKET_SECONDS + BUCKET_SECONDS
+        window = window_hours * BUCKET_SECONDS
+        recent = await self.window_counts(end - window, end)
+        previous = await self.window_counts(end - 2 * window, end - window)
+        ranked = []
+        for tag, count in recent.items():
+            before = previous.get(tag, 0)
+            ranked.append({
+                "hashtag": f"#{tag}",
+                "count": count,
+                "previous_count": before,
+                "velocity_per_hour": round((count - before) / window_hours, 3),
+                "growth": round((count + 1) / (before + 1), 3),
+            })
+        ranked.sort(key=lambda r: (r["velocity_per_hour"], r["growth"]), reverse=True)
+        return ranked[:limit]
+
+
+# Singleton instances
+category_matcher = CategoryMatcher(HASHTAG_CATEGORIES)
+hashtag_series = HashtagSeries()
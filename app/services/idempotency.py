@@ -0,0 +1,244 @@
+# services/idempotency.py
+"""Idempotency-Key support for non-idempotent POST endpoints.
+
+The first request with a key claims it (a ``pending`` document in
+``idempotency_keys``), runs, and stores its response for
+``IDEMPOTENCY_TTL_SECONDS``; a TTL index removes old keys. A retry with the
+same key gets the stored response back. A retry that arrives while the first
+request is still running joins it: in the same worker through an in-flight
+future, in another worker by waiting for the stored response. Reusing a key
+with a different request body is rejected with 422.
+
+Without Mongo (the SQLite backend, or no database at all) responses are kept
+in an in-process TTL map instead, bounded to ``IDEMPOTENCY_MEMORY_KEYS``
+entries, so retries to the same worker are still deduplicated.
+
+Only successful responses are stored. Exceptions, 5xx responses and degraded
+bodies flagged ``"error": true`` or ``"fallback": true`` release the key, so the client's retry runs
+again instead of replaying the failure.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from ..core import metrics
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+
+# (status_code, JSON body)
+StoredResponse = Tuple[int, Any]
+
+
+class IdempotencyError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def fingerprint(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(jsonable_encoder(payload), sort_keys=True).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, ttl: float, lease: float, wait: float, memory_keys: int):
+        self.ttl = ttl
+        self.lease = lease
+        self.wait = wait
+        self.memory_keys = memory_keys
+        self.collection = None
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        # key -> (expires at, monotonic; fingerprint; response), used without Mongo
+        self._memory: "OrderedDict[str, Tuple[float, str, StoredResponse]]" = OrderedDict()
+
+    async def configure(self, db):
+        if db is None:
+            self.collection = None
+            return
+        self.collection = db.idempotency_keys
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def run(self, key: str, request_fingerprint: str,
+                  compute: Callable[[], Awaitable[StoredResponse]]) -> Tuple[StoredResponse, bool]:
+        """Run ``compute`` once per key; returns ``(response, replayed)``"""
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._check_fingerprint(inflight[0], request_fingerprint)
+            metrics.IDEMPOTENCY_REQUESTS.labels("joined").inc()
+            future = inflight[1]
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                # The request we joined was cancelled (client gone, shutdown), not this one
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    raise IdempotencyError(409, "The request with this Idempotency-Key was interrupted; retry it")
+                raise
+
+        if self.collection is not None:
+            stored = await self._claim(key, request_fingerprint)
+        else:
+            stored = self._recall(key, request_fingerprint)
+        if stored is not None:
+            metrics.IDEMPOTENCY_REQUESTS.labels("replayed").inc()
+            return stored, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (request_fingerprint, future)
+        metrics.IDEMPOTENCY_REQUESTS.labels("new").inc()
+        try:
+            response = await compute()
+        except BaseException as e:
+            # Failures are not remembered: the client may retry with the same key
+            if self.collection is not None:
+                await self._release(key)
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                # Nobody else may be waiting on the future; do not log it as unretrieved
+                future.exception()
+            else:
+                future.cancel()
+            raise
+        else:
+            if self.collection is None:
+                if _storable(response):
+                    self._remember(key, request_fingerprint, response)
+            elif _storable(response):
+                await self._store(key, request_fingerprint, response)
+            else:
+                await self._release(key)
+            future.set_result(response)
+            return response, False
+        finally:
+            self._inflight.pop(key, None)
+
+    def _recall(self, key: str, request_fingerprint: str) -> Optional[StoredResponse]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires, stored_fingerprint, response = entry
+        if expires <= time.monotonic():
+            del self._memory[key]
+            return None
+        self._check_fingerprint(stored_fingerprint, request_fingerprint)
+        return response
+
+    def _remember(self, key: str, request_fingerprint: str, response: StoredResponse):
+        self._memory[key] = (time.monotonic() + self.ttl, request_fingerprint, response)
+        self._memory.move_to_end(key)
+        # Oldest first: drop expired entries, then whatever exceeds the bound
+        while self._memory:
+            oldest = next(iter(self._memory.values()))
+            if oldest[0] > time.monotonic() and len(self._memory) <= self.memory_keys:
+                break
+            self._memory.popitem(last=False)
+
+    async def _claim(self, key: str, request_fingerprint: str) -> Optional[StoredResponse]:
+        """Claim the key; returns the stored response if the key was already used"""
+        from pymongo.errors import DuplicateKeyError
+
+        deadline = asyncio.get_running_loop().time() + self.wait
+        while True:
+            now = datetime.utcnow()
+            try:
+                await self.collection.insert_one({
+                    "_id": key,
+                    "state": "pending",
+                    "fingerprint": request_fingerprint,
+                    "expires_at": now + timedelta(seconds=self.lease),
+                })
+                return None
+            except DuplicateKeyError:
+                doc = await self.collection.find_one({"_id": key})
+            if doc is None:
+                continue
+            self._check_fingerprint(doc.get("fingerprint"), request_fingerprint)
+            if doc.get("state") == "done":
+                return doc["status_code"], doc["body"]
+            if doc["expires_at"] <= now:
+                # The worker that claimed it died; take the key over
+                await self.collection.delete_one({"_id": key, "state": "pending", "expires_at": doc["expires_at"]})
+                continue
+            # Another worker is running the same request: wait for its response
+            if asyncio.get_running_loop().time() >= deadline:
+                raise IdempotencyError(409, "A request with this Idempotency-Key is still in progress")
+            await asyncio.sleep(0.25)
+
+    async def _store(self, key: str, request_fingerprint: str, response: StoredResponse):
+        status_code, body = response
+        try:
+            await self.collection.replace_one(
+                {"_id": key},
+                {
+                    "state": "done",
+                    "fingerprint": request_fingerprint,
+                    "status_code": status_code,
+                    "body": body,
+                    "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl),
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to store idempotent response: {e}")
+
+    async def _release(self, key: str):
+        try:
+            await self.collection.delete_one({"_id": key, "state": "pending"})
+        except Exception as e:
+            logger.warning(f"Failed to release idempotency key: {e}")
+
+    @staticmethod
+    def _check_fingerprint(stored: Optional[str], request_fingerprint: str):
+        if stored and stored != request_fingerprint:
+            raise IdempotencyError(422, "Idempotency-Key was already used with a different request body")
+
+
+def _storable(response: StoredResponse) -> bool:
+    """Whether a retry should get this response back rather than run again"""
+    status_code, body = response
+    # Degraded bodies: an error, or a mock/fallback reply given while the model was unavailable
+    return status_code < 500 and not (isinstance(body, dict) and (body.get("error") or body.get("fallback")))
+
+
+async def run_idempotent(request, scope: str, payload: Any, status_code: int,
+                         compute: Callable[[], Awaitable[Any]]):
+    """Run an endpoint body under the request's Idempotency-Key, if it sent one.
+
+    Without the header this just awaits ``compute``. With it, returns a
+    JSONResponse; replays carry ``Idempotent-Replayed: true``.
+    """
+    key = request.headers.get("idempotency-key")
+    if not key:
+        return await compute()
+    if len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(400, f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+
+    # Keys are scoped to the endpoint and the caller
+    caller = request.headers.get("x-api-key") or (request.client.host if request.client else "")
+    scoped_key = f"{scope}:{hashlib.sha256(caller.encode()).hexdigest()[:16]}:{key}"
+
+    async def compute_response() -> StoredResponse:
+        return status_code, jsonable_encoder(await compute())
+
+    (stored_status, body), replayed = await idempotency_store.run(scoped_key, fingerprint(payload), compute_response)
+    headers = {"Idempotent-Replayed": "true"} if replayed else {}
+    return JSONResponse(body, status_code=stored_status, headers=headers)
+
+
+# Singleton instance
+idempotency_store = IdempotencyStore(
+    ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+    lease=settings.IDEMPOTENCY_LEASE_SECONDS,
+    wait=settings.IDEMPOTENCY_WAIT_SECONDS,
+    memory_keys=settings.IDEMPOTENCY_MEMORY_KEYS,
+)
@@ -0,0 +1,155 @@
+# services/job_worker.py
+"""Bounded worker pool for batch generation jobs.
+
+Job items live in Mongo (see controllers/job_controller.py). Workers claim
+pending items atomically, run them through the Gemini client, and write the
+result back, so progress survives restarts and several app processes can share
+one queue. Items left "running" by a dead worker are requeued after a lease.
+
+Generation is low priority: a worker only claims an item while a background
+admission slot is available, and holds the slot around the model call alone
+(not the trend fetch or the writes), so batch work never takes the slots
+interactive requests need. An item that loses the slot race, or is
+interrupted by shutdown, goes back to the queue without using up an attempt.
+A mock or fallback reply counts as a failed attempt and is retried with
+backoff. A failing claim or write is logged and the worker carries on; the
+sweeper requeues whatever it held.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from ..controllers.job_controller import (
+    claim_next_item, complete_item, ensure_job_indexes, requeue_stale_items, retry_item
+)
+from ..core.config import settings
+from .admission import AdmissionRejected, admission
+from .ai_client import generate_reply
+from .scraper import fetch_trending_formats_bounded
+
+logger = logging.getLogger(__name__)
+
+# How long a worker waits before asking again when the LLM is busy
+BUSY_BACKOFF_SECONDS = 1.0
+
+
+class GenerationUnavailable(Exception):
+    """The model did not answer; the reply is a placeholder, not a result"""
+
+
+class JobWorkerPool:
+    def __init__(self, workers: int, poll_interval: float = 5.0):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.db = None
+        self._tasks: List[asyncio.Task] = []
+        # One event per worker: a shared one is cleared by whichever worker runs first
+        self._wakeups: List[asyncio.Event] = []
+
+    async def start(self, db):
+        if db is None or self._tasks:
+            return
+        self.db = db
+        try:
+            await ensure_job_indexes(db)
+        except Exception as e:
+            logger.warning(f"Job index creation failed: {e}")
+        self._wakeups = [asyncio.Event() for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.create_task(self._worker(wakeup), name=f"job-worker-{i}") for i, wakeup in enumerate(self._wakeups)
+        ]
+        self._tasks.append(asyncio.create_task(self._sweeper(), name="job-sweeper"))
+        logger.info(f"Job worker pool started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeups = []
+
+    def notify(self):
+        """Wake idle workers after new items were submitted"""
+        for wakeup in self._wakeups:
+            wakeup.set()
+
+    async def _worker(self, wakeup: asyncio.Event):
+        while True:
+            wakeup.clear()
+            try:
+                # Check before claiming: a busy LLM must not use up an item's attempts
+                if not admission.background_available(settings.JOB_RESERVE_SLOTS):
+                    await asyncio.sleep(BUSY_BACKOFF_SECONDS)
+                    continue
+                item = await claim_next_item(self.db, self.owner)
+                if item is not None:
+                    await self._run_item(item)
+                    continue
+            except AdmissionRejected:
+                await asyncio.sleep(BUSY_BACKOFF_SECONDS)
+                continue
+            except Exception as e:
+                # A database error must not end the worker; the sweeper requeues an item it held
+                logger.error(f"Job worker iteration failed: {e}")
+                await asyncio.sleep(BUSY_BACKOFF_SECONDS)
+                continue
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_item(self, item):
+        try:
+            trends = await fetch_trending_formats_bounded()
+            try:
+                async with admission.admit_background(settings.JOB_RESERVE_SLOTS):
+                    resp = await generate_reply(item["message"], context=[], trends=trends)
+            except AdmissionRejected:
+                # The slot went between the check and now: requeue without using up an attempt
+                await retry_item(self.db, item, item.get("error"), count_attempt=False)
+                raise
+            if resp.get("fallback"):
+                raise GenerationUnavailable("model unavailable, got a placeholder reply")
+            result = {
+                "reply": resp.get("reply"),
+                "suggestions": resp.get("suggestions", []),
+                "should_suggest": resp.get("should_suggest", False),
+                "missing_platforms": resp.get("missing_platforms", []),
+            }
+        except asyncio.CancelledError:
+            # Shutting down: leave the item for the next process to pick up, attempt not counted
+            await asyncio.shield(retry_item(self.db, item, "interrupted", count_attempt=False))
+            raise
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            logger.error(f"Job item {item.get('_id')} failed: {e}")
+            attempts = item.get("attempts", 1)
+            if attempts < settings.JOB_MAX_ATTEMPTS:
+                await retry_item(self.db, item, str(e), delay=settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1))
+            else:
+                await complete_item(self.db, item, error=str(e))
+        else:
+            await complete_item(self.db, item, result=result)
+
+    async def _sweeper(self):
+        """Requeue items whose worker died (on startup, then periodically)"""
+        while True:
+            try:
+                cutoff = datetime.utcnow() - timedelta(seconds=settings.JOB_ITEM_LEASE_SECONDS)
+                requeued = await requeue_stale_items(self.db, cutoff, settings.JOB_MAX_ATTEMPTS)
+                if requeued:
+                    logger.info(f"Requeued {requeued} stale job items")
+                    self.notify()
+            except Exception as e:
+                logger.warning(f"Job sweep failed: {e}")
+            await asyncio.sleep(settings.JOB_ITEM_LEASE_SECONDS / 2)
+
+
+# Singleton instance
+job_pool = JobWorkerPool(settings.JOB_WORKERS)
@@ -0,0 +1,243 @@
+# services/profiler.py
+"""Low-overhead sampling profiler for live diagnosis.
+
+A background thread periodically snapshots the event loop thread's Python stack
+and the await chain of every running asyncio task, then aggregates them into
+"collapsed stack" lines (``frame;frame;frame count``) that flamegraph.pl,
+speedscope and inferno read directly. Nothing runs unless a profile is active.
+"""
+import asyncio
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+_MAX_DEPTH = 128
+# asyncio's default task names, and per-session/per-request suffixes on our own
+_DEFAULT_TASK_NAME = re.compile(r"^Task-\d+$")
+_NAME_ID_SUFFIX = re.compile(r"([-_:](\d+|[0-9a-f]{8,}|test-session))+$")
+
+
+def _frame_label(code, lineno: int) -> str:
+    filename = code.co_filename
+    # Keep labels short and stable across deployments
+    marker = os.sep + "app" + os.sep
+    if marker in filename:
+        filename = "app" + os.sep + filename.split(marker, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{lineno})"
+
+
+def _thread_stack(frame) -> List:
+    """Return the frames of a thread stack, root first."""
+    frames = []
+    while frame is not None and len(frames) < _MAX_DEPTH:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _await_chain(task: asyncio.Task) -> List:
+    """Walk the coroutine await chain of a task, outermost coroutine first."""
+    frames = []
+    coro = task.get_coro()
+    while coro is not None and len(frames) < _MAX_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return frames
+
+
+def _task_label(task: asyncio.Task) -> str:
+    """Stable root label, so stacks of tasks doing the same work aggregate"""
+    name = task.get_name()
+    if _DEFAULT_TASK_NAME.match(name):
+        coro = task.get_coro()
+        return f"task:{getattr(coro, '__qualname__', type(coro).__name__)}"
+    return f"task:{_NAME_ID_SUFFIX.sub('', name)}"
+
+
+def _task_stack(task: asyncio.Task, thread_frames: List) -> Tuple[Optional[str], bool]:
+    """Collapsed stack for a task, extended with sync frames if it is running.
+
+    The second value says whether the task is the one running on the loop thread.
+    """
+    chain = _await_chain(task)
+    if not chain:
+        return None, False
+    labels = [_task_label(task)]
+    labels.extend(_frame_label(f.f_code, f.f_lineno) for f in chain)
+    innermost = chain[-1]
+    # A running task's innermost coroutine frame is on the thread stack; the
+    # frames above it are the synchronous calls it is currently executing.
+    for index, frame in enumerate(thread_frames):
+        if frame is innermost:
+            labels.extend(_frame_label(f.f_code, f.f_lineno) for f in thread_frames[index + 1:])
+            return ";".join(labels), True
+    labels.append("<awaiting>")
+    return ";".join(labels), False
+
+
+class StackSampler:
+    """Samples one event loop from a helper thread.
+
+    ``task`` restricts sampling to one task and the tasks it spawns
+    (per-request profiling); otherwise every task is sampled, plus the loop
+    thread stack when no task is running (callbacks, the selector).
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, loop_thread_id: int,
+                 interval: float = 0.01, task: Optional[asyncio.Task] = None):
+        self.loop = loop
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.task = task
+        # The request task plus child tasks it spawned (wait_for, gather, create_task)
+        self.tasks: Set[asyncio.Task] = {task} if task is not None else set()
+        self.profile_id: Optional[str] = None
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        if self.started_at is not None:
+            self.duration = time.perf_counter() - self.started_at
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample()
+            except Exception:
+                # Sampling races with the loop; a lost sample is harmless
+                continue
+
+    def _sample(self):
+        loop_frame = sys._current_frames().get(self.loop_thread_id)
+        thread_frames = _thread_stack(loop_frame)
+        self.sample_count += 1
+
+        if self.task is not None:
+            # tuple() copies the set without letting the loop thread mutate it midway
+            for task in tuple(self.tasks):
+                if not task.done():
+                    stack, _ = _task_stack(task, thread_frames)
+                    if stack:
+                        self.samples[stack] += 1
+            return
+
+        running = False
+        for task in asyncio.all_tasks(self.loop):
+            stack, is_running = _task_stack(task, thread_frames)
+            if stack:
+                self.samples[stack] += 1
+            running = running or is_running
+        # A running task's frames are already in its own stack; count them once
+        if thread_frames and not running:
+            labels = ["thread:event-loop"]
+            labels.extend(_frame_label(f.f_code, f.f_lineno) for f in thread_frames)
+            self.samples[";".join(labels)] += 1
+
+    def collapsed(self) -> str:
+        """Render samples in collapsed stack format, heaviest stacks first."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "samples": self.sample_count,
+            "unique_stacks": len(self.samples),
+            "duration_s": round(self.duration, 3),
+            "interval_ms": round(self.interval * 1000, 3),
+        }
+
+
+class Profiler:
+    """Process-wide entry point: timed captures and per-request captures."""
+
+    def __init__(self, keep_request_profiles: int = 32):
+        self._capture_lock = asyncio.Lock()
+        self._request_profiles: "OrderedDict[str, StackSampler]" = OrderedDict()
+        self._keep = keep_request_profiles
+        self._active_requests: Set[StackSampler] = set()
+        self._previous_factory = None
+
+    @property
+    def busy(self) -> bool:
+        return self._capture_lock.locked()
+
+    async def capture(self, seconds: float, interval: float) -> StackSampler:
+        """Sample the whole worker for ``seconds`` and return the sampler."""
+        async with self._capture_lock:
+            sampler = StackSampler(asyncio.get_running_loop(), threading.get_ident(), interval)
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                sampler.stop()
+            return sampler
+
+    def start_request(self, interval: float) -> StackSampler:
+        """Start sampling the current task; ``sampler.profile_id`` names the result."""
+        sampler = StackSampler(
+            asyncio.get_running_loop(), threading.get_ident(), interval,
+            task=asyncio.current_task(),
+        )
+        sampler.profile_id = uuid.uuid4().hex
+        if not self._active_requests:
+            self._install_task_factory(sampler.loop)
+        self._active_requests.add(sampler)
+        sampler.start()
+        return sampler
+
+    def _install_task_factory(self, loop: asyncio.AbstractEventLoop):
+        """Attribute tasks created by a profiled request's tasks to its sampler"""
+        previous = self._previous_factory = loop.get_task_factory()
+
+        def factory(loop, coro, **kwargs):
+            if previous is not None:
+                child = previous(loop, coro, **kwargs)
+            else:
+                child = asyncio.Task(coro, loop=loop, **kwargs)
+            parent = asyncio.current_task(loop)
+            if parent is not None:
+                for sampler in self._active_requests:
+                    if parent in sampler.tasks:
+                        sampler.tasks.add(child)
+            return child
+
+        loop.set_task_factory(factory)
+
+    def finish_request(self, sampler: StackSampler):
+        sampler.stop()
+        self._active_requests.discard(sampler)
+        if not self._active_requests:
+            sampler.loop.set_task_factory(self._previous_factory)
+        sampler.tasks.clear()
+        self._request_profiles[sampler.profile_id] = sampler
+        while len(self._request_profiles) > self._keep:
+            self._request_profiles.popitem(last=False)
+
+    def get_request_profile(self, profile_id: str) -> Optional[StackSampler]:
+        return self._request_profiles.get(profile_id)
+
+
+# Singleton instance
+profiler = Profiler()
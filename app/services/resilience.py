@@ -0,0 +1,137 @@
+# services/resilience.py
+"""Circuit breakers with latency-adaptive timeouts for upstream dependencies.
+
+Each breaker tracks recent successful latencies and derives its timeout from a
+high percentile of them, so a healthy dependency gets a tight deadline and a
+degraded one fails fast instead of holding requests for the worst case. After
+``failure_threshold`` consecutive failures the breaker opens and callers go
+straight to their fallback; after ``recovery_timeout`` a limited number of
+half-open probes decide whether to close it again. Calls of different
+``kind`` (e.g. a short reply and a multi-platform generation) keep separate
+latency windows, so each gets its own deadline; failures and state are shared.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict
+
+from ..core import metrics
+from ..core.config import settings
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+DEFAULT_KIND = "default"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, max_timeout: float, min_timeout: float = 0.5,
+                 failure_threshold: int = None, recovery_timeout: float = None,
+                 half_open_max_calls: int = 1, percentile: float = 0.99,
+                 multiplier: float = 2.0, window: int = 200, min_samples: int = 20):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.min_timeout = min(min_timeout, max_timeout)
+        self.failure_threshold = failure_threshold or settings.BREAKER_FAILURE_THRESHOLD
+        self.recovery_timeout = recovery_timeout or settings.BREAKER_RECOVERY_SECONDS
+        self.half_open_max_calls = half_open_max_calls
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.window = window
+        # Recent successful latencies per kind of call
+        self.latencies: Dict[str, deque] = {}
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        metrics.BREAKER_STATE.labels(name).set(0)
+        metrics.DEPENDENCY_TIMEOUT.labels(name).set(max_timeout)
+
+    def timeout(self, kind: str = DEFAULT_KIND) -> float:
+        """Deadline for the next call of ``kind``: percentile of its recent latencies times a safety margin."""
+        latencies = self.latencies.get(kind, ())
+        if len(latencies) < self.min_samples:
+            return self.max_timeout
+        ordered = sorted(latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile))
+        return max(self.min_timeout, min(self.max_timeout, ordered[index] * self.multiplier))
+
+    def allow_request(self) -> bool:
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                return False
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self.half_open_calls >= self.half_open_max_calls:
+                return False
+            self.half_open_calls += 1
+        return True
+
+    def record_success(self, latency: float, kind: str = DEFAULT_KIND):
+        self.latencies.setdefault(kind, deque(maxlen=self.window)).append(latency)
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+        metrics.DEPENDENCY_LATENCY.labels(self.name, "success").observe(latency)
+        # The longest deadline any kind of call currently gets
+        metrics.DEPENDENCY_TIMEOUT.labels(self.name).set(max(self.timeout(k) for k in self.latencies))
+
+    def record_failure(self, latency: float):
+        self.consecutive_failures += 1
+        metrics.DEPENDENCY_LATENCY.labels(self.name, "failure").observe(latency)
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._transition(OPEN)
+
+    def _transition(self, state: str):
+        self.state = state
+        self.half_open_calls = 0
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        metrics.BREAKER_STATE.labels(self.name).set(_STATE_VALUES[state])
+        metrics.BREAKER_TRANSITIONS.labels(self.name, state).inc()
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, kind: str = DEFAULT_KIND, **kwargs) -> Any:
+        """Run ``func`` under the adaptive timeout for ``kind``; raises CircuitOpenError when open."""
+        if not self.allow_request():
+            metrics.BREAKER_REJECTIONS.labels(self.name).inc()
+            raise CircuitOpenError(self.name)
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(func(*args, **kwargs), timeout=self.timeout(kind))
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                # Caller gave up; not the dependency's fault. Free the probe slot.
+                if self.state == HALF_OPEN:
+                    self.half_open_calls = max(0, self.half_open_calls - 1)
+                raise
+            self.record_failure(time.monotonic() - start)
+            raise
+        self.record_success(time.monotonic() - start, kind)
+        return result
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str, max_timeout: float, **kwargs) -> CircuitBreaker:
+    """Return the process-wide breaker for a dependency, creating it on first use."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name, max_timeout, **kwargs)
+    return breaker
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    return {
+        name: {
+            "state": b.state,
+            "timeout_s": round(b.timeout(), 3),
+            "timeouts_s": {kind: round(b.timeout(kind), 3) for kind in b.latencies},
+            "consecutive_failures": b.consecutive_failures,
+        }
+        for name, b in _breakers.items()
+    }
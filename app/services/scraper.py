@@ -1,12 +1,16 @@
 # services/scraper.py
 import asyncio
-from typing import List, Dict, Any
-import httpx
-from bs4 import BeautifulSoup
+from typing import List, Dict, Any, Optional
 import logging
 from datetime import datetime, timedelta
 import json
-import re
+
+from ..core.config import settings
+from .hashtags import category_matcher
+from . import trend_snapshot
+from .resilience import CircuitOpenError, get_breaker
+from .trend_sources import CallableSource, crawl_scheduler, source_registry
+from .trend_store import get_trend_store
 
 logger = logging.getLogger(__name__)
 
@@ -23,83 +27,39 @@ class InstagramScraper:
             return cached
         
         try:
-            trends = await asyncio.gather(
-                self._scrape_instagram_hashtags(),
-                self._scrape_instagram_content_patterns(),
-                self._analyze_instagram_formats(),
-                return_exceptions=True
+            # Shared across workers: only the lease holder actually scrapes
+            valid_trends, refreshed_at = await get_trend_store().get_or_refresh(
+                cache_key, self._collect_instagram_trends, self.cache_duration
             )
-            
-            valid_trends = []
-            for trend in trends:
-                if not isinstance(trend, Exception) and trend:
-                    valid_trends.extend(trend)
-            
-            # Add Instagram-specific insights
-            instagram_insights = [
-                {
-                    "platform": "instagram",
-                    "formats": ["reels", "carousel", "single_image", "stories"],
-                    "engagement": "very_high",
-                    "visual_requirements": "High-quality images/videos essential",
-                    "hashtag_strategy": "5-10 relevant hashtags",
-                    "best_practices": [
-                        "Use vertical format for Reels",
-                        "Engaging first frame for videos",
-                        "Personal captions work best",
-                        "Consistent posting schedule"
-                    ]
-                }
-            ]
-            valid_trends.extend(instagram_insights)
-            
-            self._set_cached(cache_key, valid_trends)
+            self._set_cached(cache_key, valid_trends, refreshed_at)
             return valid_trends
             
         except Exception as e:
             logger.error(f"Instagram scraping error: {e}")
             return self._get_instagram_fallback_trends()
     
-    async def _scrape_instagram_hashtags(self) -> List[Dict[str, Any]]:
-        """Scrape popular Instagram hashtags and trends"""
-        trends = []
-        try:
-            # Using Instagram-like sources for trend data
-            urls = [
-                "https://www.displaypurposes.com/",  # Hashtag analytics
-                "https://top-hashtags.com/instagram/",
-            ]
-            
-            async with httpx.AsyncClient() as client:
-                for url in urls:
-                    try:
-                        response = await client.get(url, timeout=10.0)
-                        if response.status_code == 200:
-                            soup = BeautifulSoup(response.text, "html.parser")
-                            
-                            # Extract hashtag patterns (simplified)
-                            hashtags = []
-                            hashtag_elements = soup.find_all(text=re.compile(r'#\w+'))
-                            for element in hashtag_elements[:20]:
-                                hashtags.extend(re.findall(r'#\w+', element))
-                            
-                            if hashtags:
-                                trends.append({
-                                    "type": "hashtag_trends",
-                                    "source": url,
-                                    "popular_hashtags": list(set(hashtags))[:10],
-                                    "content_categories": self._categorize_hashtags(hashtags)
-                                })
-                                
-                    except Exception as e:
-                        logger.debug(f"Failed to scrape {url}: {e}")
-                        continue
-            
-            return trends
-            
-        except Exception as e:
-            logger.error(f"Hashtag scraping error: {e}")
-            return []
+    async def _collect_instagram_trends(self) -> List[Dict[str, Any]]:
+        """Run every Instagram source and merge the results"""
+        valid_trends = await crawl_scheduler.run(source_registry.sources("instagram"))
+        
+        # Add Instagram-specific insights
+        instagram_insights = [
+            {
+                "platform": "instagram",
+                "formats": ["reels", "carousel", "single_image", "stories"],
+                "engagement": "very_high",
+                "visual_requirements": "High-quality images/videos essential",
+                "hashtag_strategy": "5-10 relevant hashtags",
+                "best_practices": [
+                    "Use vertical format for Reels",
+                    "Engaging first frame for videos",
+                    "Personal captions work best",
+                    "Consistent posting schedule"
+                ]
+            }
+        ]
+        valid_trends.extend(instagram_insights)
+        return valid_trends
     
     async def _scrape_instagram_content_patterns(self) -> List[Dict[str, Any]]:
         """Analyze Instagram content patterns"""
@@ -169,22 +129,7 @@ class InstagramScraper:
     
     def _categorize_hashtags(self, hashtags: List[str]) -> Dict[str, List[str]]:
         """Categorize hashtags by content type"""
-        categories = {
-            "lifestyle": ["lifestyle", "life", "daily", "motivation", "inspiration"],
-            "travel": ["travel", "wanderlust", "adventure", "explore"],
-            "food": ["food", "foodie", "recipe", "cooking"],
-            "fashion": ["fashion", "style", "outfit", "beauty"],
-            "tech": ["tech", "technology", "innovation", "gadgets"],
-            "business": ["business", "entrepreneur", "startup", "marketing"]
-        }
-        
-        categorized = {}
-        for category, keywords in categories.items():
-            category_tags = [tag for tag in hashtags if any(keyword in tag.lower() for keyword in keywords)]
-            if category_tags:
-                categorized[category] = category_tags[:5]
-        
-        return categorized
+        return category_matcher.categorize(hashtags)
     
     def _get_instagram_fallback_trends(self) -> List[Dict[str, Any]]:
         """Fallback Instagram trends"""
@@ -217,15 +162,26 @@ class InstagramScraper:
                 return data
         return None
     
-    def _set_cached(self, key: str, data: Any):
-        """Set cached data with timestamp"""
-        self.cache[key] = (data, datetime.now())
+    def _set_cached(self, key: str, data: Any, refreshed_at: Optional[float] = None):
+        """Set cached data with timestamp (the shared snapshot's refresh time if given)"""
+        timestamp = datetime.fromtimestamp(refreshed_at) if refreshed_at else datetime.now()
+        self.cache[key] = (data, timestamp)
+    
+    def cached_at(self, key: str) -> Optional[datetime]:
+        """Refresh time of the cached data if it is still fresh"""
+        if key in self.cache:
+            _, timestamp = self.cache[key]
+            if datetime.now() - timestamp < self.cache_duration:
+                return timestamp
+        return None
 
 class TrendAnalyzer:
-    def __init__(self):
-        self.instagram_scraper = InstagramScraper()
+    def __init__(self, instagram_scraper: Optional[InstagramScraper] = None):
+        self.instagram_scraper = instagram_scraper or InstagramScraper()
         self.cache = {}
         self.cache_duration = timedelta(hours=1)
+        # Refresh time of the trends last written to (or loaded from) the local snapshot
+        self._snapshot_at = 0.0
     
     async def fetch_trending_formats(self) -> List[Dict[str, Any]]:
         """Fetch comprehensive trending formats across all platforms"""
@@ -235,28 +191,32 @@ class TrendAnalyzer:
             return cached
         
         try:
-            # Gather trends from all platforms
-            trends = await asyncio.gather(
-                self.instagram_scraper.scrape_instagram_trends(),
-                self._analyze_linkedin_trends(),
-                self._analyze_twitter_trends(),
-                self._analyze_general_trends(),
-                return_exceptions=True
+            all_trends, refreshed_at = await get_trend_store().get_or_refresh(
+                cache_key, self._collect_trending_formats, self.cache_duration
             )
-            
-            # Combine all trends
-            all_trends = []
-            for trend_list in trends:
-                if not isinstance(trend_list, Exception) and trend_list:
-                    all_trends.extend(trend_list)
-            
-            self._set_cached(cache_key, all_trends)
+            self._set_cached(cache_key, all_trends, refreshed_at)
+            if all_trends:
+                await self._save_snapshot(refreshed_at)
             return all_trends
             
         except Exception as e:
             logger.error(f"Comprehensive trend analysis error: {e}")
             return self._get_fallback_trends()
     
+    async def _collect_trending_formats(self) -> List[Dict[str, Any]]:
+        """Gather trends from all platforms and combine them"""
+        trends = await asyncio.gather(
+            self.instagram_scraper.scrape_instagram_trends(),
+            crawl_scheduler.run(source_registry.sources("platforms")),
+            return_exceptions=True
+        )
+        
+        all_trends = []
+        for trend_list in trends:
+            if not isinstance(trend_list, Exception) and trend_list:
+                all_trends.extend(trend_list)
+        return all_trends
+    
     async def _analyze_linkedin_trends(self) -> List[Dict[str, Any]]:
         """Analyze LinkedIn trends"""
         return [
@@ -327,16 +287,92 @@ class TrendAnalyzer:
                 return data
         return None
     
-    def _set_cached(self, key: str, data: Any):
-        """Set cached data with timestamp"""
-        self.cache[key] = (data, datetime.now())
+    def _set_cached(self, key: str, data: Any, refreshed_at: Optional[float] = None):
+        """Set cached data with timestamp (the shared snapshot's refresh time if given)"""
+        timestamp = datetime.fromtimestamp(refreshed_at) if refreshed_at else datetime.now()
+        self.cache[key] = (data, timestamp)
+    
+    def load_snapshot(self) -> bool:
+        """Seed the analyzer and scraper caches from the local snapshot.
+
+        Stale entries are kept too: they are not served as fresh, but they
+        replace the fallbacks while a refresh runs.
+        """
+        if not settings.TREND_SNAPSHOT_PATH:
+            return False
+        entries = trend_snapshot.load(settings.TREND_SNAPSHOT_PATH)
+        if not entries:
+            return False
+        for key, (data, refreshed_at) in entries.items():
+            owner = self.instagram_scraper if key == "instagram_trends" else self
+            if key not in owner.cache:
+                owner._set_cached(key, data, refreshed_at)
+        self._snapshot_at = max(refreshed_at for _, refreshed_at in entries.values())
+        logger.info(f"Loaded trend snapshot with {len(entries)} entries")
+        return True
+    
+    async def _save_snapshot(self, refreshed_at: float):
+        """Rewrite the local snapshot after a refresh newer than the one on disk"""
+        if not settings.TREND_SNAPSHOT_PATH or refreshed_at <= self._snapshot_at:
+            return
+        entries = {}
+        for owner in (self.instagram_scraper, self):
+            for key, (data, timestamp) in owner.cache.items():
+                entries[key] = (data, timestamp.timestamp())
+        try:
+            await asyncio.to_thread(trend_snapshot.save, settings.TREND_SNAPSHOT_PATH, entries)
+            self._snapshot_at = refreshed_at
+        except OSError as e:
+            logger.warning(f"Failed to write trend snapshot: {e}")
+    
+    def get_cached_or_fallback_trends(self) -> List[Dict[str, Any]]:
+        """Last known trends, even if stale, without touching the network"""
+        if "all_trends" in self.cache:
+            return self.cache["all_trends"][0]
+        return self._get_fallback_trends()
 
-# Global instances
-trend_analyzer = TrendAnalyzer()
+# Global instances (the analyzer reuses the module scraper so they share one cache)
 instagram_scraper = InstagramScraper()
+trend_analyzer = TrendAnalyzer(instagram_scraper)
+
+# Built-in sources that need no network access; scraped pages are registered in trend_sources
+for _source in (
+    CallableSource("instagram:content_patterns", "instagram", instagram_scraper._scrape_instagram_content_patterns),
+    CallableSource("instagram:formats", "instagram", instagram_scraper._analyze_instagram_formats),
+    CallableSource("linkedin", "platforms", trend_analyzer._analyze_linkedin_trends),
+    CallableSource("twitter", "platforms", trend_analyzer._analyze_twitter_trends),
+    CallableSource("general", "platforms", trend_analyzer._analyze_general_trends),
+):
+    source_registry.register(_source)
+
+trends_breaker = get_breaker("trends", settings.TRENDS_TIMEOUT_SECONDS, min_timeout=1.0)
 
 async def fetch_trending_formats() -> List[Dict[str, Any]]:
     return await trend_analyzer.fetch_trending_formats()
 
+# One refresh at a time per worker, shared by every caller waiting on it
+_refresh_task: Optional[asyncio.Task] = None
+
+async def _refresh_trending_formats() -> List[Dict[str, Any]]:
+    """A caller that times out stops waiting; the refresh itself keeps going and fills the cache"""
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(trend_analyzer.fetch_trending_formats(), name="trends-refresh")
+    return await asyncio.shield(_refresh_task)
+
+async def fetch_trending_formats_bounded() -> List[Dict[str, Any]]:
+    """Trends within an adaptive deadline; cached or fallback trends when slow or the breaker is open"""
+    # Fresh cache hits skip the breaker: its timeout is learned from real refreshes only
+    cached = trend_analyzer._get_cached("all_trends")
+    if cached:
+        return cached
+    try:
+        return await trends_breaker.call(_refresh_trending_formats)
+    except CircuitOpenError:
+        return trend_analyzer.get_cached_or_fallback_trends()
+    except asyncio.TimeoutError:
+        logger.warning("Trend analysis timeout")
+        return trend_analyzer.get_cached_or_fallback_trends()
+
 async def fetch_instagram_trends() -> List[Dict[str, Any]]:
     return await instagram_scraper.scrape_instagram_trends()
\ No newline at end of file
@@ -0,0 +1,235 @@
+# services/similarity.py
+"""Local similarity index for reusing generations on near-duplicate prompts.
+
+Prompts are embedded with signed feature hashing over word unigrams/bigrams
+and character trigrams (no external embedding service), L2-normalised, and
+kept in a fixed-size NumPy matrix. A lookup is one matrix-vector product over
+the rows for the same platform key; a cosine score above the threshold returns
+the stored response instead of calling the model. Each row also keeps its
+request (normalised words) and session, and the caller decides which rows it
+may reuse (``accept``). Memory is bounded by ``capacity x dim`` floats, the
+least recently used row is evicted when full, rows older than ``ttl`` are
+never served, and the index persists to a single ``.npz`` file, written
+periodically and on shutdown.
+"""
+import asyncio
+import copy
+import json
+import logging
+import math
+import os
+import re
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+from ..core import metrics
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9#']+")
+
+
+def _features(text: str) -> Dict[str, float]:
+    words = _WORD.findall(text.lower())
+    counts: Dict[str, float] = {}
+    for i, word in enumerate(words):
+        counts["w:" + word] = counts.get("w:" + word, 0) + 1
+        if i:
+            bigram = "b:" + words[i - 1] + " " + word
+            counts[bigram] = counts.get(bigram, 0) + 1
+    squashed = " ".join(words)
+    for i in range(len(squashed) - 2):
+        gram = "c:" + squashed[i:i + 3]
+        counts[gram] = counts.get(gram, 0) + 0.5
+    return counts
+
+
+def request_key(text: str) -> str:
+    """The request's words, lowercased: equal keys are the same request up to case and punctuation"""
+    return " ".join(_WORD.findall(text.lower()))
+
+
+class SimilarityIndex:
+    def __init__(self, dim: int, capacity: int, threshold: float, path: Optional[str] = None, ttl: float = 0):
+        self.dim = dim
+        self.capacity = capacity
+        self.threshold = threshold
+        self.path = path
+        self.ttl = ttl
+        self._np = None
+        self.vectors = None
+        self.platforms: List[Optional[str]] = [None] * capacity
+        self.payloads: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self.meta: List[Dict[str, Any]] = [{} for _ in range(capacity)]
+        self.last_used = None
+        self.added = None
+        self.codes = None
+        self._platform_codes: Dict[str, int] = {}
+        self.size = 0
+        self.dirty = False
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_arrays(self):
+        if self._np is None:
+            import numpy as np  # deferred: keeps numpy out of app import time
+            self._np = np
+            self.vectors = np.zeros((self.capacity, self.dim), dtype=np.float32)
+            self.last_used = np.zeros(self.capacity, dtype=np.float64)
+            self.added = np.zeros(self.capacity, dtype=np.float64)
+            self.codes = np.full(self.capacity, -1, dtype=np.int32)
+        return self._np
+
+    def _code(self, platform: str) -> int:
+        return self._platform_codes.setdefault(platform, len(self._platform_codes))
+
+    def embed(self, text: str):
+        np = self._ensure_arrays()
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in _features(text).items():
+            h = zlib.crc32(feature.encode("utf-8"))
+            # Signed hashing: colliding features cancel out in expectation
+            vector[h % self.dim] += (1.0 if h & 0x80000000 else -1.0) * (1.0 + math.log(count))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, platform: str, text: str,
+               accept: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Optional[Dict[str, Any]]:
+        """Stored response for the most similar prompt on this platform, if above the threshold.
+
+        ``accept`` sees each candidate row's metadata (``request``, ``session``)
+        and leaves out the rows it returns False for.
+        """
+        if not self.size:
+            metrics.SIMILARITY_LOOKUPS.labels("miss").inc()
+            return None
+        np = self._ensure_arrays()
+        code = self._platform_codes.get(platform)
+        rows = []
+        if code is not None:
+            candidates = self.codes[:self.size] == code
+            if self.ttl > 0:
+                candidates &= self.added[:self.size] >= time.time() - self.ttl
+            rows = np.flatnonzero(candidates)
+        if accept is not None:
+            rows = [row for row in rows if accept(self.meta[row])]
+        if not len(rows):
+            metrics.SIMILARITY_LOOKUPS.labels("miss").inc()
+            return None
+        scores = self.vectors[rows] @ self.embed(text)
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        if score < self.threshold:
+            metrics.SIMILARITY_LOOKUPS.labels("miss").inc()
+            return None
+        row = int(rows[best])
+        self.last_used[row] = time.time()
+        metrics.SIMILARITY_LOOKUPS.labels("hit").inc()
+        logger.debug(f"Reusing generation for similar {platform} prompt (score {score:.3f})")
+        return copy.deepcopy(self.payloads[row])
+
+    def add(self, platform: str, text: str, payload: Dict[str, Any], meta: Optional[Dict[str, Any]] = None):
+        np = self._ensure_arrays()
+        if self.size < self.capacity:
+            row = self.size
+            self.size += 1
+        else:
+            # Evict the least recently used (or added) entry
+            row = int(np.argmin(self.last_used))
+        self.vectors[row] = self.embed(text)
+        self.platforms[row] = platform
+        self.codes[row] = self._code(platform)
+        self.payloads[row] = copy.deepcopy(payload)
+        self.meta[row] = dict(meta or {})
+        self.last_used[row] = self.added[row] = time.time()
+        self.dirty = True
+
+    def _snapshot(self) -> Optional[Dict[str, Any]]:
+        """Copy of the entries to persist; None when nothing changed since the last save"""
+        if not self.path or not self.dirty or self._np is None:
+            return None
+        np = self._np
+        self.dirty = False
+        return {
+            "vectors": self.vectors[:self.size].copy(),
+            "last_used": self.last_used[:self.size].copy(),
+            "added": self.added[:self.size].copy(),
+            "meta": np.array(json.dumps(self.meta[:self.size])),
+            "platforms": np.array(json.dumps(self.platforms[:self.size])),
+            "payloads": np.array(json.dumps(self.payloads[:self.size], default=str)),
+        }
+
+    def _write(self, snapshot: Dict[str, Any]):
+        tmp = f"{self.path}.{os.getpid()}.tmp.npz"
+        self._np.savez(tmp, **snapshot)
+        os.replace(tmp, self.path)
+
+    def save(self):
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            self._write(snapshot)
+
+    def start(self, interval: float):
+        """Save periodically, so a crash loses at most ``interval`` seconds of entries"""
+        if self._task is None and self.path and interval > 0:
+            self._task = asyncio.create_task(self._save_loop(interval), name="similarity-save")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _save_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            # Copied on the loop, written off it
+            snapshot = self._snapshot()
+            if snapshot is None:
+                continue
+            try:
+                await asyncio.to_thread(self._write, snapshot)
+            except Exception as e:
+                self.dirty = True
+                logger.warning(f"Saving the similarity index failed: {e}")
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        np = self._ensure_arrays()
+        with np.load(self.path, allow_pickle=False) as data:
+            vectors = data["vectors"]
+            if vectors.shape[1] != self.dim:
+                logger.warning("Similarity index dimension changed, starting empty")
+                return
+            # Files written before rows kept their age and metadata
+            added = data["added"] if "added" in data.files else data["last_used"]
+            meta = json.loads(str(data["meta"])) if "meta" in data.files else [{} for _ in range(len(vectors))]
+            live = np.flatnonzero(added >= time.time() - self.ttl) if self.ttl > 0 else np.arange(len(vectors))
+            count = min(len(live), self.capacity)
+            # Keep the most recently used entries if capacity shrank
+            keep = live[np.argsort(data["last_used"][live])[::-1][:count]]
+            platforms = json.loads(str(data["platforms"]))
+            payloads = json.loads(str(data["payloads"]))
+            self.vectors[:count] = vectors[keep]
+            self.last_used[:count] = data["last_used"][keep]
+            self.added[:count] = added[keep]
+            for i, src in enumerate(keep):
+                self.platforms[i] = platforms[src]
+                self.codes[i] = self._code(platforms[src])
+                self.payloads[i] = payloads[src]
+                self.meta[i] = meta[src]
+            self.size = count
+        logger.info(f"Loaded {self.size} entries into the similarity index")
+
+
+# Singleton instance
+similarity_index = SimilarityIndex(
+    dim=settings.SIMILARITY_DIM,
+    capacity=settings.SIMILARITY_CAPACITY,
+    threshold=settings.SIMILARITY_THRESHOLD,
+    path=settings.SIMILARITY_INDEX_PATH or None,
+    ttl=settings.SIMILARITY_TTL_SECONDS,
+)
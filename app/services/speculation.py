@@ -0,0 +1,259 @@
+# services/speculation.py
+"""Speculative platform drafts for the post request that usually follows.
+
+The common flow is a conversational turn ("today I shipped our new pricing
+page..."), a reply with ``should_suggest: false``, then "give me a LinkedIn
+post". When a conversational turn carries strong intent signals (a post-worthy
+event, platform-flavoured topics, platforms the session asked for before),
+the likeliest platforms are drafted in the background with exactly the
+prompt the follow-up would produce, and kept per session. A plain follow-up
+request for those platforms is then served from the drafts instead of paying
+a full LLM round trip.
+
+Drafts are low priority: one only starts when the admission controller has
+spare LLM slots and nobody is queued, and generations are capped by an hourly
+budget. Drafts that are superseded, expire or are evicted count as wasted.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from ..core import metrics
+from ..core.config import settings
+from .admission import AdmissionRejected, TokenBucket, admission
+
+logger = logging.getLogger(__name__)
+
+# Events people post about
+POSTWORTHY = re.compile(
+    r"\b(launch(ed|ing)?|ship(ped)?|releas(ed|ing)|promot(ed|ion)|new (job|role)|hired|graduat(ed|ion)|"
+    r"certifi(ed|cation)|award|won|milestone|anniversary|published|present(ed|ing)|spoke|keynote|"
+    r"conference|meetup|hackathon|workshop|finished|completed|trip|travel(l?ed|ling)?|vacation|"
+    r"wedding|birthday|concert|marathon|festival|volunteer(ed)?)\b"
+)
+# Topics that lean towards one platform
+PLATFORM_SIGNALS = {
+    "linkedin": re.compile(
+        r"\b(work|career|job|role|team|project|client|customer|manager|promot\w*|launch\w*|ship\w*|"
+        r"conference|present\w*|hired|hiring|interview|startup|business|certifi\w*|product|company)\b"
+    ),
+    "instagram": re.compile(
+        r"\b(trip|travel\w*|beach|photos?|pictures?|friends|vacation|food|dinner|sunset|concert|"
+        r"wedding|hik(e|ed|ing)|outfit|festival)\b"
+    ),
+    "twitter": re.compile(r"\b(thoughts?|opinion|hot take|news|announce\w*|releas\w*|shipped|thread)\b"),
+    "facebook": re.compile(r"\b(family|kids|birthday|anniversary|community|neighbou?rs?|reunion|volunteer\w*)\b"),
+}
+# The user says outright they want to share it
+SHARE_INTENT = re.compile(r"\b(share|post(ing)? about|announce|tell (everyone|people|my network)|caption)\b")
+
+# Words a plain follow-up request ("can you write me a LinkedIn post please") consists of
+REQUEST_WORDS = {
+    "a", "an", "the", "me", "my", "us", "for", "of", "on", "and", "please", "can", "could", "would", "you",
+    "give", "write", "create", "make", "draft", "generate", "now", "also", "one", "post", "posts", "tweet",
+    "it", "this", "that", "about", "some", "ok", "okay", "sure", "great", "thanks", "x", "ig", "fb",
+    "linkedin", "twitter", "instagram", "insta", "facebook", "professional", "to", "i", "want", "need",
+}
+WORD = re.compile(r"[a-z0-9']+")
+
+
+def intent_scores(message: str, preferred: Iterable[str] = ()) -> Dict[str, float]:
+    """Chance (0..1, heuristic) that the next turn asks for a post on each platform"""
+    text = message.lower()
+    base = 0.0
+    if POSTWORTHY.search(text):
+        base += 0.35
+    if SHARE_INTENT.search(text):
+        base += 0.2
+    if len(text) >= 80:
+        # A described day or event, not small talk
+        base += 0.1
+    preferred = set(preferred)
+    scores = {}
+    for platform, pattern in PLATFORM_SIGNALS.items():
+        score = base + min(0.3, 0.15 * len(pattern.findall(text)))
+        if platform in preferred:
+            score += 0.25
+        scores[platform] = round(min(1.0, score), 3)
+    return scores
+
+
+def is_plain_request(message: str) -> bool:
+    """A bare "give me a <platform> post": no extra instructions a draft could not have followed"""
+    return all(w in REQUEST_WORDS for w in WORD.findall(message.lower()))
+
+
+class _Draft:
+    __slots__ = ("platform", "request", "context", "task", "created")
+
+    def __init__(self, platform: str, request: str, context: List[Dict[str, Any]], task: asyncio.Task):
+        self.platform = platform
+        self.request = request
+        self.context = context
+        self.task = task
+        self.created = time.monotonic()
+
+
+class DraftSpeculator:
+    def __init__(self, min_score: float, max_platforms: int, budget_per_hour: float, budget_burst: int,
+                 reserve_slots: int, ttl: float, max_sessions: int):
+        self.min_score = min_score
+        self.max_platforms = max_platforms
+        self.reserve_slots = reserve_slots
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.budget = TokenBucket(budget_per_hour / 3600.0, max(1, budget_burst)) if budget_per_hour > 0 else None
+        self._drafts: "OrderedDict[str, Dict[str, _Draft]]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.SPECULATION_ENABLED and self.budget is not None
+
+    def schedule(self, session_id: Optional[str], message: str, reply: str,
+                 context: List[Dict[str, Any]], trends: List[Dict[str, Any]], preferred: Iterable[str] = ()):
+        """After a conversational turn, draft the posts it will likely be followed by"""
+        if not self.enabled or not session_id:
+            return
+        scores = intent_scores(message, preferred)
+        platforms = sorted((p for p, s in scores.items() if s >= self.min_score), key=scores.get, reverse=True)
+        if not platforms:
+            return
+        # Drafts from an earlier turn no longer match the conversation
+        self.discard(session_id)
+        follow_up_context = [*context, {"role": "user", "text": message}, {"role": "assistant", "text": reply}]
+        from .ai_client import PLATFORM_NAMES
+
+        drafts = {}
+        for platform in platforms[:self.max_platforms]:
+            # Only a look: the token is spent once the draft holds an LLM slot
+            if self.budget.peek() > 0:
+                metrics.SPECULATION_SKIPPED.labels("budget").inc()
+                break
+            # The request the plain follow-up would make
+            request = f"Give me a {PLATFORM_NAMES.get(platform, platform)} post"
+            task = asyncio.create_task(
+                self._generate(platform, request, follow_up_context, trends), name=f"speculate-{platform}-{session_id}"
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            drafts[platform] = _Draft(platform, request, follow_up_context, task)
+        if drafts:
+            self._drafts[session_id] = drafts
+            while len(self._drafts) > self.max_sessions:
+                self._discard_drafts(self._drafts.popitem(last=False)[1])
+
+    async def _generate(self, platform: str, request: str, context: List[Dict[str, Any]],
+                        trends: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        from .ai_client import ai_client
+
+        try:
+            async with admission.admit_background(self.reserve_slots):
+                if self.budget.take() > 0:
+                    metrics.SPECULATION_SKIPPED.labels("budget").inc()
+                    return None
+                # Background breaker: a slow or failing draft must not trip the one user requests go through
+                response = await ai_client._generate_platform_specific_post(
+                    request, platform, context, trends, background=True
+                )
+        except AdmissionRejected:
+            metrics.SPECULATION_SKIPPED.labels("busy").inc()
+            return None
+        except Exception as e:
+            logger.warning(f"Speculative {platform} draft failed: {e}")
+            metrics.SPECULATIVE_DRAFTS.labels("failed").inc()
+            return None
+        if response.get("fallback") or not response.get("suggestions"):
+            # A mock or fallback reply is not worth serving in place of a real generation
+            metrics.SPECULATIVE_DRAFTS.labels("failed").inc()
+            return None
+        metrics.SPECULATIVE_DRAFTS.labels("generated").inc()
+        return response
+
+    async def take(self, session_id: Optional[str], message: str) -> Optional[Dict[str, Any]]:
+        """The reply for a plain post request, built from this session's drafts; None on a miss"""
+        if not self.enabled or not session_id:
+            return None
+        from .ai_client import PLATFORM_NAMES, ai_client
+
+        platforms = ai_client._detect_platform_requests(message)
+        if not platforms:
+            return None
+        drafts = self._drafts.get(session_id)
+        if drafts and time.monotonic() - min(d.created for d in drafts.values()) > self.ttl:
+            self.discard(session_id)
+            drafts = None
+        if not drafts or not is_plain_request(message) or any(p not in drafts for p in platforms):
+            metrics.SPECULATION_LOOKUPS.labels("miss").inc()
+            return None
+
+        responses = []
+        served = []
+        for platform in platforms:
+            draft = drafts.pop(platform)
+            try:
+                # Shielded: a client that goes away must not cancel a draft still in flight
+                response = await asyncio.shield(draft.task)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                response = None
+            if not response or not response.get("suggestions"):
+                metrics.SPECULATION_LOOKUPS.labels("miss").inc()
+                return None
+            responses.append(response)
+            served.append(draft)
+        if not drafts:
+            self._drafts.pop(session_id, None)
+        # Only drafts that were actually served go into the similarity index
+        for draft, response in zip(served, responses):
+            ai_client._remember_generation([draft.platform], draft.request, draft.context, response, session_id)
+        metrics.SPECULATION_LOOKUPS.labels("hit").inc()
+        metrics.SPECULATIVE_DRAFTS.labels("served").inc(len(responses))
+
+        if len(responses) == 1:
+            return responses[0]
+        names = ", ".join(PLATFORM_NAMES.get(p, p) for p in platforms)
+        return {
+            "reply": f"I've created posts for {names} based on your content. Here are tailored suggestions:",
+            "suggestions": [s for response in responses for s in response["suggestions"]],
+            "should_suggest": True,
+        }
+
+    def discard(self, session_id: str):
+        drafts = self._drafts.pop(session_id, None)
+        if drafts:
+            self._discard_drafts(drafts)
+
+    def _discard_drafts(self, drafts: Dict[str, _Draft]):
+        for draft in drafts.values():
+            if draft.task.done():
+                if not draft.task.cancelled() and draft.task.result() is not None:
+                    metrics.SPECULATIVE_DRAFTS.labels("wasted").inc()
+            else:
+                # Still generating: the call is paid for either way
+                draft.task.cancel()
+                metrics.SPECULATIVE_DRAFTS.labels("wasted").inc()
+
+    async def stop(self):
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._drafts.clear()
+        self._tasks.clear()
+
+
+# Singleton instance
+speculator = DraftSpeculator(
+    min_score=settings.SPECULATION_MIN_SCORE,
+    max_platforms=settings.SPECULATION_MAX_PLATFORMS,
+    budget_per_hour=settings.SPECULATION_BUDGET_PER_HOUR,
+    budget_burst=settings.SPECULATION_BUDGET_BURST,
+    reserve_slots=settings.SPECULATION_RESERVE_SLOTS,
+    ttl=settings.SPECULATION_TTL_SECONDS,
+    max_sessions=settings.SPECULATION_MAX_SESSIONS,
+)
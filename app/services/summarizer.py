@@ -0,0 +1,103 @@
+# services/summarizer.py
+"""Rolling conversation summaries that keep chat prompts bounded.
+
+Each session stores ``summary`` (a running summary) and ``summary_upto`` (how
+many of its messages the summary covers). After a reply, a background task
+folds everything except the last ``SUMMARY_KEEP_RECENT`` messages into the
+summary once ``CHAT_CONTEXT_MESSAGES`` unsummarized messages have accumulated.
+Prompts are then built from the summary plus the unsummarized tail, so they
+stay bounded however long the conversation gets.
+
+Summaries are background work: a pass only calls the model when the admission
+controller has a spare slot, and is skipped otherwise (the next turn retries).
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Set
+
+from ..core.config import settings
+from .admission import AdmissionRejected, admission
+
+logger = logging.getLogger(__name__)
+
+# Most messages folded per pass; a lagging session catches up over several turns
+MAX_FOLD_MESSAGES = 40
+
+
+def prompt_context(session: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Summary (as a ``role: summary`` pseudo message) plus the messages it does not cover.
+
+    ``session["messages"]`` may be a tail of the conversation; ``message_total``
+    says how long the full conversation is.
+    """
+    messages = session.get("messages", [])
+    first_index = session.get("message_total", len(messages)) - len(messages)
+    recent = messages[max(0, session.get("summary_upto", 0) - first_index):]
+    if session.get("summary"):
+        return [{"role": "summary", "text": session["summary"]}] + recent
+    return recent
+
+
+class ConversationSummarizer:
+    def __init__(self, window: int, keep_recent: int, max_chars: int):
+        self.window = window
+        self.keep_recent = keep_recent
+        self.max_chars = max_chars
+        self._running: Dict[Any, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule(self, sessions, session_id: str):
+        """Update the session summary in the background; one pass per session at a time"""
+        if not settings.SUMMARY_ENABLED or sessions is None or session_id in self._running:
+            return
+        task = asyncio.create_task(self._run(sessions, session_id), name=f"summarize-{session_id}")
+        self._running[session_id] = task
+        self._tasks.add(task)
+
+    async def _run(self, sessions, session_id: str):
+        try:
+            await self.summarize(sessions, session_id)
+        except Exception as e:
+            logger.warning(f"Summarizing session {session_id} failed: {e}")
+        finally:
+            task = self._running.pop(session_id, None)
+            self._tasks.discard(task)
+
+    async def summarize(self, sessions, session_id: str) -> bool:
+        """Fold older unsummarized messages into the summary; True if it changed"""
+        doc = await sessions.summary_state(session_id, MAX_FOLD_MESSAGES)
+        if doc is None:
+            return False
+        upto = doc["summary_upto"]
+        if doc["message_total"] - upto < self.window:
+            return False
+        fold = doc["pending"][:doc["message_total"] - upto - self.keep_recent]
+        if not fold:
+            return False
+
+        from .ai_client import ai_client
+        try:
+            async with admission.admit_background(settings.SUMMARY_RESERVE_SLOTS):
+                summary = await ai_client.summarize_conversation(doc.get("summary") or "", fold, self.max_chars)
+        except AdmissionRejected:
+            logger.debug(f"Summary for session {session_id} skipped, LLM busy")
+            return False
+
+        # Only applied if no other worker advanced the summary meanwhile
+        return await sessions.save_summary(session_id, upto, summary, upto + len(fold))
+
+    async def stop(self):
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._running.clear()
+        self._tasks.clear()
+
+
+# Singleton instance
+summarizer = ConversationSummarizer(
+    window=settings.CHAT_CONTEXT_MESSAGES,
+    keep_recent=settings.SUMMARY_KEEP_RECENT,
+    max_chars=settings.SUMMARY_MAX_CHARS,
+)
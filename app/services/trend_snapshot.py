@@ -0,0 +1,74 @@
+# services/trend_snapshot.py
+"""Local on-disk copy of the latest trend caches for warm starts.
+
+A new worker loads the file in a single read before its first request, so it
+serves the last scraped trends instead of fallbacks while its own refresh runs.
+Layout: a fixed header (magic, format version, entry count, payload CRC32 and
+length) followed by the zlib-compressed JSON payload. Files with another
+magic/version or a bad checksum are ignored. Writes go to a temp file that
+replaces the snapshot atomically.
+"""
+import json
+import logging
+import os
+import struct
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CBTS"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHHII")
+
+# cache key -> (data, refreshed_at epoch seconds)
+Entries = Dict[str, Tuple[Any, float]]
+
+
+def encode(entries: Entries) -> bytes:
+    payload = zlib.compress(
+        json.dumps(
+            {key: {"data": data, "refreshed_at": refreshed_at} for key, (data, refreshed_at) in entries.items()},
+            separators=(",", ":"),
+            default=str,
+        ).encode("utf-8"),
+        level=6,
+    )
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, len(entries), zlib.crc32(payload), len(payload)) + payload
+
+
+def decode(blob: bytes) -> Optional[Entries]:
+    if len(blob) < _HEADER.size:
+        return None
+    magic, version, _count, crc, length = _HEADER.unpack_from(blob)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+    payload = blob[_HEADER.size:_HEADER.size + length]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        return None
+    raw = json.loads(zlib.decompress(payload))
+    return {key: (entry["data"], entry["refreshed_at"]) for key, entry in raw.items()}
+
+
+def save(path: str, entries: Entries):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(encode(entries))
+    # Atomic swap so concurrently starting workers never read a partial file
+    os.replace(tmp, path)
+
+
+def load(path: str) -> Optional[Entries]:
+    try:
+        with open(path, "rb") as f:
+            blob = f.read()
+    except FileNotFoundError:
+        return None
+    try:
+        entries = decode(blob)
+    except (ValueError, KeyError, zlib.error) as e:
+        logger.warning(f"Ignoring corrupt trend snapshot {path}: {e}")
+        return None
+    if entries is None:
+        logger.warning(f"Ignoring trend snapshot {path} (unknown format or version)")
+    return entries
@@ -0,0 +1,308 @@
+# services/trend_sources.py
+"""Pluggable trend sources and the crawl scheduler that runs them.
+
+A source is anything with a ``name``, a ``group`` and an async
+``collect(crawler)`` returning entries in the usual trend schema. Sources are
+registered in ``source_registry``; the scheduler runs all sources of a group
+concurrently, each under its own time budget (never longer than the trend
+aggregation timeout), and merges their results in registration order. Network access goes through the scheduler's crawler, which
+honours robots.txt (cached per origin, including Crawl-delay), limits
+concurrency and request rate per domain, applies the per-host circuit breaker
+and sends conditional requests.
+"""
+import abc
+import asyncio
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from ..core import metrics
+from ..core.config import settings
+from .conditional_fetch import CHANGED, NOT_DUE, NOT_MODIFIED, UNCHANGED, conditional_fetcher
+from .hashtags import BUCKET_SECONDS, category_matcher, hashtag_series
+from .resilience import get_breaker
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+Trends = List[Dict[str, Any]]
+
+DISALLOWED = "disallowed"
+
+
+class TrendSource(abc.ABC):
+    """Base class for trend sources."""
+
+    name = "source"
+    group = "platforms"
+    # None uses settings.CRAWL_SOURCE_BUDGET_SECONDS
+    budget_seconds: Optional[float] = None
+
+    @abc.abstractmethod
+    async def collect(self, crawler: "Crawler") -> Trends:
+        """Entries in the trend schema; network access only through ``crawler``"""
+
+
+class CallableSource(TrendSource):
+    """Wraps an async function that needs no network access."""
+
+    def __init__(self, name: str, group: str, func: Callable[[], Awaitable[Trends]],
+                 budget_seconds: Optional[float] = None):
+        self.name = name
+        self.group = group
+        self.func = func
+        self.budget_seconds = budget_seconds
+
+    async def collect(self, crawler: "Crawler") -> Trends:
+        return await self.func()
+
+
+class HashtagPageSource(TrendSource):
+    """Hashtags scraped from one page; an unchanged page reuses its last parse.
+
+    The page's hashtags are added to the time series once per hourly bucket,
+    whether or not the page was fetched in that hour (not due, 304, same
+    body): how often a stable page is refetched must not show up as its tags
+    fading. A page that changes within the hour adds only the tags not yet
+    counted in it. Failed fetches add nothing.
+    """
+
+    group = "instagram"
+
+    def __init__(self, url: str, budget_seconds: Optional[float] = None):
+        self.url = url
+        parts = urlparse(url)
+        self.name = f"hashtags:{parts.netloc}{parts.path.rstrip('/')}"
+        self.budget_seconds = budget_seconds
+        self._last: Optional[Dict[str, Any]] = None
+        self._hashtags: List[str] = []
+        # The bucket last recorded into, and the tags counted in it
+        self._bucket: Optional[int] = None
+        self._counted: set = set()
+
+    async def collect(self, crawler: "Crawler") -> Trends:
+        outcome, response = await crawler.fetch(self.url)
+        if outcome in (NOT_DUE, NOT_MODIFIED, UNCHANGED):
+            await self._record(self._hashtags)
+        if outcome != CHANGED:
+            return [self._last] if self._last else []
+
+        from bs4 import BeautifulSoup  # deferred: keeps bs4 out of app import time
+
+        soup = BeautifulSoup(response.text, "html.parser")
+        # Extract hashtag patterns (simplified)
+        hashtags = []
+        for element in soup.find_all(text=re.compile(r'#\w+'))[:20]:
+            hashtags.extend(re.findall(r'#\w+', element))
+        self._hashtags = hashtags
+        if not hashtags:
+            self._last = None
+            return []
+
+        await self._record(hashtags)
+        self._last = {
+            "type": "hashtag_trends",
+            "source": self.url,
+            "popular_hashtags": list(set(hashtags))[:10],
+            "content_categories": category_matcher.categorize(hashtags),
+        }
+        return [self._last]
+
+    async def _record(self, hashtags: List[str]):
+        """Feed the rolling time series behind the rising-hashtag queries, once per bucket"""
+        bucket = int(time.time() // BUCKET_SECONDS)
+        if bucket != self._bucket:
+            self._bucket, self._counted = bucket, set()
+        fresh = [tag for tag in hashtags if tag not in self._counted]
+        if not fresh:
+            return
+        try:
+            await hashtag_series.record(fresh)
+        except Exception as e:
+            logger.warning(f"Failed to record hashtag series: {e}")
+            return
+        self._counted.update(fresh)
+
+
+class TrendSourceRegistry:
+    def __init__(self):
+        self._sources: Dict[str, TrendSource] = {}
+
+    def register(self, source: TrendSource) -> TrendSource:
+        self._sources[source.name] = source
+        return source
+
+    def unregister(self, name: str):
+        self._sources.pop(name, None)
+
+    def sources(self, group: Optional[str] = None) -> List[TrendSource]:
+        return [s for s in self._sources.values() if group is None or s.group == group]
+
+
+class RobotsCache:
+    """robots.txt per origin, refetched after ``ttl`` seconds."""
+
+    def __init__(self, ttl: float, user_agent: str):
+        self.ttl = ttl
+        self.user_agent = user_agent
+        self._entries: Dict[str, Tuple[float, RobotFileParser]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def get(self, client: "httpx.AsyncClient", url: str) -> RobotFileParser:
+        parts = urlparse(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        entry = self._entries.get(origin)
+        if entry and entry[0] > time.time():
+            return entry[1]
+
+        async with self._locks.setdefault(origin, asyncio.Lock()):
+            entry = self._entries.get(origin)
+            if entry and entry[0] > time.time():
+                return entry[1]
+            parser = RobotFileParser(origin + "/robots.txt")
+            ttl = self.ttl
+            try:
+                response = await client.get(origin + "/robots.txt", timeout=settings.SCRAPE_TIMEOUT_SECONDS)
+                if response.status_code == 200:
+                    parser.parse(response.text.splitlines())
+                elif response.status_code in (401, 403):
+                    parser.disallow_all = True
+                else:
+                    parser.allow_all = True
+            except Exception as e:
+                # Unreachable robots.txt: allow, but check again soon
+                logger.debug(f"robots.txt fetch failed for {origin}: {e}")
+                parser.allow_all = True
+                ttl = min(ttl, 60)
+            self._entries[origin] = (time.time() + ttl, parser)
+            return parser
+
+    async def allowed(self, client: "httpx.AsyncClient", url: str) -> Tuple[bool, float]:
+        """Whether ``url`` may be fetched, and the origin's Crawl-delay (0 if unset)"""
+        parser = await self.get(client, url)
+        delay = parser.crawl_delay(self.user_agent) if parser.last_checked else None
+        return parser.can_fetch(self.user_agent, url), float(delay or 0)
+
+
+class DomainGate:
+    """Caps concurrent requests to one domain and spaces their start times."""
+
+    def __init__(self, concurrency: int, interval: float):
+        self.interval = interval
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._next_start = 0.0
+
+    @asynccontextmanager
+    async def slot(self, min_interval: float = 0.0):
+        async with self._semaphore:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + max(self.interval, min_interval)
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield
+
+
+class Crawler:
+    """Network access for one scheduler run."""
+
+    def __init__(self, scheduler: "CrawlScheduler", client: "httpx.AsyncClient"):
+        self.scheduler = scheduler
+        self.client = client
+
+    async def fetch(self, url: str) -> Tuple[str, Optional["httpx.Response"]]:
+        """GET ``url`` politely; returns the conditional_fetch outcome and the response"""
+        if not conditional_fetcher.is_due(url):
+            return NOT_DUE, None
+        allowed, crawl_delay = await self.scheduler.robots.allowed(self.client, url)
+        if not allowed:
+            metrics.CRAWL_ROBOTS_BLOCKED.labels(urlparse(url).netloc).inc()
+            return DISALLOWED, None
+
+        domain = urlparse(url).netloc
+        breaker = get_breaker(f"scrape:{domain}", settings.SCRAPE_TIMEOUT_SECONDS)
+        async with self.scheduler.gate(domain).slot(crawl_delay):
+            response = await breaker.call(
+                self._get, url, breaker.timeout(), conditional_fetcher.request_headers(url)
+            )
+        return conditional_fetcher.observe(url, response), response
+
+    async def _get(self, url: str, timeout: float, headers: Dict[str, str]) -> "httpx.Response":
+        """Server errors count as breaker failures"""
+        response = await self.client.get(url, timeout=timeout, headers=headers)
+        if response.status_code >= 500:
+            response.raise_for_status()
+        return response
+
+
+class CrawlScheduler:
+    def __init__(self, domain_concurrency: int, domain_interval: float, source_budget: float,
+                 robots_ttl: float, user_agent: str, max_budget: Optional[float] = None):
+        self.domain_concurrency = domain_concurrency
+        self.domain_interval = domain_interval
+        self.source_budget = source_budget
+        # A source may not outlast the refresh it is part of
+        self.max_budget = max_budget
+        self.user_agent = user_agent
+        self.robots = RobotsCache(robots_ttl, user_agent)
+        self._gates: Dict[str, DomainGate] = {}
+
+    def gate(self, domain: str) -> DomainGate:
+        gate = self._gates.get(domain)
+        if gate is None:
+            gate = self._gates[domain] = DomainGate(self.domain_concurrency, self.domain_interval)
+        return gate
+
+    async def run(self, sources: List[TrendSource]) -> Trends:
+        """Collect from all sources concurrently and merge their entries"""
+        if not sources:
+            return []
+        import httpx  # deferred: keeps httpx out of app import time
+
+        async with httpx.AsyncClient(headers={"User-Agent": self.user_agent}) as client:
+            crawler = Crawler(self, client)
+            results = await asyncio.gather(*(self._run_source(source, crawler) for source in sources))
+        merged = []
+        for trends in results:
+            merged.extend(trends)
+        return merged
+
+    async def _run_source(self, source: TrendSource, crawler: Crawler) -> Trends:
+        budget = source.budget_seconds or self.source_budget
+        if self.max_budget:
+            budget = min(budget, self.max_budget)
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await asyncio.wait_for(source.collect(crawler), budget) or []
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            logger.warning(f"Trend source {source.name} exceeded its {budget}s budget")
+            return []
+        except Exception as e:
+            outcome = "error"
+            logger.debug(f"Trend source {source.name} failed: {e}")
+            return []
+        finally:
+            metrics.TREND_SOURCE_DURATION.labels(source.name, outcome).observe(time.perf_counter() - started)
+
+
+# Singleton instances
+source_registry = TrendSourceRegistry()
+crawl_scheduler = CrawlScheduler(
+    domain_concurrency=settings.CRAWL_DOMAIN_CONCURRENCY,
+    domain_interval=settings.CRAWL_DOMAIN_INTERVAL_SECONDS,
+    source_budget=settings.CRAWL_SOURCE_BUDGET_SECONDS,
+    robots_ttl=settings.CRAWL_ROBOTS_TTL_SECONDS,
+    user_agent=settings.CRAWL_USER_AGENT,
+    max_budget=settings.TRENDS_TIMEOUT_SECONDS,
+)
+
+for _url in filter(None, (u.strip() for u in settings.TREND_HASHTAG_SOURCES.split(","))):
+    source_registry.register(HashtagPageSource(_url))
@@ -0,0 +1,279 @@
+# services/trend_store.py
+"""Trend snapshots shared between uvicorn workers.
+
+Each worker keeps its own in-memory cache, but refreshes go through a shared
+store so only one worker scrapes per TTL window: the worker holding the lease
+refreshes and publishes the snapshot, the others read it (or keep serving the
+previous, stale snapshot) instead of scraping the same sites again.
+
+Backends: MongoDB (``trend_cache``/``trend_leases`` collections with TTL
+indexes), a local directory for single-host deployments without Mongo, and a
+no-op store that keeps the old per-process behaviour.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Snapshot = Dict[str, Any]
+
+
+class TrendStore:
+    """No-op store: every worker refreshes on its own."""
+
+    name = "none"
+
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def get(self, key: str) -> Optional[Snapshot]:
+        return None
+
+    async def put(self, key: str, data: Any, refreshed_at: float, ttl: timedelta):
+        return None
+
+    async def acquire_lease(self, key: str, lease_seconds: float) -> bool:
+        return True
+
+    async def release_lease(self, key: str):
+        return None
+
+    async def get_or_refresh(self, key: str, refresh: Callable[[], Awaitable[Any]], ttl: timedelta) -> Tuple[Any, float]:
+        """Return ``(data, refreshed_at)`` from the shared snapshot, refreshing it if this worker wins the lease."""
+        snapshot = await self._safe(self.get(key))
+        if snapshot and snapshot["fresh_until"] > time.time():
+            return snapshot["data"], snapshot["refreshed_at"]
+
+        if await self._safe(self.acquire_lease(key, settings.TREND_LEASE_SECONDS), default=True):
+            try:
+                data = await refresh()
+                refreshed_at = time.time()
+                if data:
+                    await self._safe(self.put(key, data, refreshed_at, ttl))
+                return data, refreshed_at
+            finally:
+                await self._safe(self.release_lease(key))
+
+        # Another worker is refreshing: serve the previous snapshot if there is one
+        if snapshot:
+            return snapshot["data"], snapshot["refreshed_at"]
+
+        deadline = time.time() + settings.TREND_LEASE_WAIT_SECONDS
+        while time.time() < deadline:
+            await asyncio.sleep(0.25)
+            snapshot = await self._safe(self.get(key))
+            if snapshot:
+                return snapshot["data"], snapshot["refreshed_at"]
+
+        logger.warning(f"Trend refresh for '{key}' held by another worker too long, refreshing locally")
+        return await refresh(), time.time()
+
+    async def _safe(self, awaitable, default=None):
+        """Store failures must never break trend fetching."""
+        try:
+            return await awaitable
+        except Exception as e:
+            logger.warning(f"Trend store ({self.name}) error: {e}")
+            return default
+
+
+class MongoTrendStore(TrendStore):
+    name = "mongo"
+
+    def __init__(self, db):
+        super().__init__()
+        self.snapshots = db.trend_cache
+        self.leases = db.trend_leases
+
+    async def ensure_indexes(self):
+        await self.snapshots.create_index("expires_at", expireAfterSeconds=0)
+        await self.leases.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get(self, key: str) -> Optional[Snapshot]:
+        return await self.snapshots.find_one({"_id": key})
+
+    async def put(self, key: str, data: Any, refreshed_at: float, ttl: timedelta):
+        ttl_seconds = ttl.total_seconds()
+        await self.snapshots.replace_one(
+            {"_id": key},
+            {
+                "data": data,
+                "refreshed_at": refreshed_at,
+                "fresh_until": refreshed_at + ttl_seconds,
+                # Keep stale snapshots around for a while so readers never wait on a scrape
+                "expires_at": datetime.utcfromtimestamp(refreshed_at + 2 * ttl_seconds),
+                "owner": self.owner,
+            },
+            upsert=True,
+        )
+
+    async def acquire_lease(self, key: str, lease_seconds: float) -> bool:
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.utcnow()
+        try:
+            await self.leases.find_one_and_update(
+                {"_id": key, "$or": [{"expires_at": {"$lte": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=lease_seconds)}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            # Upsert collided with a live lease held by another worker
+            return False
+
+    async def release_lease(self, key: str):
+        await self.leases.delete_one({"_id": key, "owner": self.owner})
+
+
+class FileTrendStore(TrendStore):
+    """Snapshots as JSON files in a shared directory, leases as O_EXCL lock files.
+
+    Stale leases are broken under a per-lease O_EXCL marker, so two workers
+    never both take one over.
+    """
+
+    name = "file"
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: str, suffix: str) -> str:
+        return os.path.join(self.path, f"{key}.{suffix}")
+
+    async def get(self, key: str) -> Optional[Snapshot]:
+        return await asyncio.to_thread(self._read, key)
+
+    def _read(self, key: str) -> Optional[Snapshot]:
+        try:
+            with open(self._file(key, "json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    async def put(self, key: str, data: Any, refreshed_at: float, ttl: timedelta):
+        snapshot = {
+            "data": data,
+            "refreshed_at": refreshed_at,
+            "fresh_until": refreshed_at + ttl.total_seconds(),
+            "owner": self.owner,
+        }
+        await asyncio.to_thread(self._write, key, snapshot)
+
+    def _write(self, key: str, snapshot: Snapshot):
+        target = self._file(key, "json")
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, default=str)
+        # Atomic swap so readers never see a partial snapshot
+        os.replace(tmp, target)
+
+    async def acquire_lease(self, key: str, lease_seconds: float) -> bool:
+        return await asyncio.to_thread(self._acquire, key, lease_seconds)
+
+    def _acquire(self, key: str, lease_seconds: float) -> bool:
+        lease_file = self._file(key, "lease")
+        try:
+            fd = os.open(lease_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # Holder may have died without releasing; take the stale lease over
+            return self._take_over(lease_file, lease_seconds)
+        with os.fdopen(fd, "w") as f:
+            f.write(self.owner)
+        return True
+
+    def _lease_identity(self, lease_file: str) -> Optional[Tuple[str, int]]:
+        try:
+            with open(lease_file, "r") as f:
+                return f.read(), os.fstat(f.fileno()).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _take_over(self, lease_file: str, lease_seconds: float) -> bool:
+        """Break an expired lease; exactly one worker can break a given lease.
+
+        The breaker first creates (O_EXCL) a marker named after the stale
+        lease's holder and mtime, so workers racing on the same stale lease
+        cannot both remove it, and nobody can remove a lease created after it.
+        """
+        identity = self._lease_identity(lease_file)
+        if identity is None or time.time() - identity[1] / 1e9 <= lease_seconds:
+            return False
+        marker = f"{lease_file}.break-{hashlib.sha1(repr(identity).encode()).hexdigest()[:16]}"
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        try:
+            # Still the same stale lease? Another breaker may have replaced it already
+            if self._lease_identity(lease_file) != identity:
+                return False
+            os.remove(lease_file)
+            try:
+                fd = os.open(lease_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return False
+            with os.fdopen(fd, "w") as f:
+                f.write(self.owner)
+            return True
+        finally:
+            try:
+                os.remove(marker)
+            except FileNotFoundError:
+                pass
+
+    async def release_lease(self, key: str):
+        await asyncio.to_thread(self._release, key)
+
+    def _release(self, key: str):
+        lease_file = self._file(key, "lease")
+        try:
+            with open(lease_file, "r") as f:
+                if f.read() != self.owner:
+                    return
+            os.remove(lease_file)
+        except FileNotFoundError:
+            pass
+
+
+# Active store; replaced at startup by configure_trend_store()
+trend_store: TrendStore = TrendStore()
+
+
+def get_trend_store() -> TrendStore:
+    return trend_store
+
+
+async def configure_trend_store(db) -> TrendStore:
+    """Pick the shared backend from settings.TREND_STORE (auto|mongo|file|none)."""
+    global trend_store
+    backend = settings.TREND_STORE.lower()
+    if backend == "auto":
+        backend = "mongo" if db is not None else "none"
+
+    if backend == "mongo" and db is not None:
+        store = MongoTrendStore(db)
+        try:
+            await store.ensure_indexes()
+        except Exception as e:
+            logger.warning(f"Trend store index creation failed: {e}")
+        trend_store = store
+    elif backend == "file":
+        trend_store = FileTrendStore(settings.TREND_STORE_PATH)
+    else:
+        trend_store = TrendStore()
+
+    logger.info(f"Trend store backend: {trend_store.name}")
+    return trend_store
@@ -0,0 +1,96 @@
+"""Latency benchmark for GET /contents/search's text query at scale.
+
+Seeds a throwaway database with synthetic content documents (100k by
+default), builds the same text index the app creates, then times ranked
+searches and keyset page-2 fetches through search_contents() on the Mongo
+repository.
+
+    python scripts/bench_search.py --mongo-uri mongodb://localhost:27017 --docs 100000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.controllers.content_controller import search_contents  # noqa: E402
+from app.db import ensure_indexes  # noqa: E402
+from app.repositories.mongo import MongoRepositories  # noqa: E402
+
+WORDS = (
+    "launch project team growth career product design startup marketing coffee travel "
+    "weekend hiring feedback deadline release customer python data learning mentor "
+    "conference workshop remote office milestone funding analytics strategy content"
+).split()
+
+
+def synthetic_doc(i: int, now: datetime) -> dict:
+    title = " ".join(random.choices(WORDS, k=5))
+    body = " ".join(random.choices(WORDS, k=random.randint(40, 200)))
+    created = now - timedelta(minutes=i)
+    return {"title": title[:100], "body": body, "created_at": created, "updated_at": created}
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="content_bot_search_bench")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded database")
+    args = parser.parse_args()
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(args.mongo_uri)
+    db = client[args.db]
+    random.seed(42)
+    try:
+        existing = await db.contents.estimated_document_count()
+        if existing < args.docs:
+            now = datetime.utcnow()
+            start = time.perf_counter()
+            for offset in range(existing, args.docs, 5000):
+                batch = [synthetic_doc(i, now) for i in range(offset, min(offset + 5000, args.docs))]
+                await db.contents.insert_many(batch, ordered=False)
+            print(f"seeded {args.docs - existing} docs in {time.perf_counter() - start:.1f}s")
+        await ensure_indexes(db)
+        contents = MongoRepositories(db).contents
+
+        first_page, second_page = [], []
+        for _ in range(args.queries):
+            query = " ".join(random.sample(WORDS, k=random.randint(1, 3)))
+            start = time.perf_counter()
+            page = await search_contents(contents, query, limit=args.limit)
+            first_page.append((time.perf_counter() - start) * 1000)
+            if page["next_cursor"]:
+                start = time.perf_counter()
+                await search_contents(contents, query, limit=args.limit, cursor=page["next_cursor"])
+                second_page.append((time.perf_counter() - start) * 1000)
+
+        for name, samples in (("first page", first_page), ("next page", second_page)):
+            if samples:
+                print(
+                    f"{name:>10}: n={len(samples)} p50={statistics.median(samples):.1f}ms "
+                    f"p95={percentile(samples, 0.95):.1f}ms p99={percentile(samples, 0.99):.1f}ms "
+                    f"max={max(samples):.1f}ms"
+                )
+    finally:
+        if not args.keep:
+            await client.drop_database(args.db)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""Measure and guard app import time.
+
+Runs ``python -X importtime -c "import app.main"`` in fresh interpreters and
+reports the median total plus the heaviest modules. Exits non-zero when the
+median exceeds ``--budget-ms`` or when a module that must stay lazy (the
+Gemini SDK, the scraping stack, the Mongo driver) is imported at startup, so
+it can run as a CI guard against import-time regressions. The lazy-module
+check also runs as a test in ``tests/test_startup.py``.
+
+    python scripts/bench_startup.py --runs 5 --budget-ms 800
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use only; seeing any of these at startup is a regression
+LAZY_MODULES = [
+    "google.generativeai", "bs4", "httpx", "motor", "pymongo", "numpy", "prometheus_fastapi_instrumentator",
+]
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+CHECK_LAZY = (
+    "import sys, json, app.main; "
+    "print(json.dumps([m for m in {mods!r} if m in sys.modules]))"
+)
+
+
+def run_importtime(target: str):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(f"import {target} failed:\n{proc.stderr[-2000:]}")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if the median import exceeds this")
+    args = parser.parse_args()
+
+    totals, last = [], {}
+    for _ in range(args.runs):
+        last = run_importtime(args.target)
+        totals.append(last.get(args.target, (0, 0))[1] / 1000.0)
+
+    median = statistics.median(totals)
+    print(f"import {args.target}: median {median:.1f} ms, min {min(totals):.1f} ms, max {max(totals):.1f} ms over {args.runs} runs")
+    print("\nHeaviest modules by self time (last run):")
+    for name, (self_us, cumulative_us) in sorted(last.items(), key=lambda kv: kv[1][0], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000.0:8.1f} ms self  {cumulative_us / 1000.0:8.1f} ms cumulative  {name}")
+
+    failed = False
+    proc = subprocess.run(
+        [sys.executable, "-c", CHECK_LAZY.format(mods=LAZY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    eager = proc.stdout.strip()
+    if proc.returncode != 0:
+        print(f"\nCould not check lazy modules:\n{proc.stderr[-2000:]}")
+        failed = True
+    elif eager != "[]":
+        print(f"\nFAIL: modules that must load lazily were imported at startup: {eager}")
+        failed = True
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f"\nFAIL: median import time {median:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Latency/throughput comparison of the Mongo and SQLite storage backends.
+
+Runs the same workload through the repository layer on each backend: content
+inserts, reads by id, list pages and full-text searches, plus chat turns
+(load the session tail, append a user and an assistant message, log the
+interaction). Operations run with ``--concurrency`` in flight, as they would
+under load, so SQLite's group commit is exercised.
+
+    python scripts/bench_storage.py --backends sqlite,mongo --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import ensure_indexes  # noqa: E402
+from app.repositories.mongo import MongoRepositories  # noqa: E402
+from app.repositories.sqlite import SQLiteRepositories  # noqa: E402
+
+WORDS = (
+    "launch project team growth career product design startup marketing coffee travel "
+    "weekend hiring feedback deadline release customer python data learning mentor "
+    "conference workshop remote office milestone funding analytics strategy content"
+).split()
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def report(backend: str, name: str, samples, wall: float):
+    print(
+        f"{backend:>7} {name:<14} n={len(samples):<6} {len(samples) / wall:9.0f} op/s  "
+        f"p50={statistics.median(samples):7.2f}ms p95={percentile(samples, 0.95):7.2f}ms "
+        f"p99={percentile(samples, 0.99):7.2f}ms"
+    )
+
+
+async def timed(backend: str, name: str, count: int, concurrency: int, op):
+    """Run ``op(i)`` ``count`` times with ``concurrency`` in flight; print latency and throughput"""
+    samples = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await op(i)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    report(backend, name, samples, time.perf_counter() - start)
+
+
+async def run_workload(backend: str, repos, args):
+    random.seed(42)
+    ids = []
+
+    async def create(i):
+        doc = await repos.contents.create({
+            "title": " ".join(random.choices(WORDS, k=5)),
+            "body": " ".join(random.choices(WORDS, k=random.randint(40, 200))),
+        })
+        ids.append(doc["id"])
+
+    await timed(backend, "content create", args.docs, args.concurrency, create)
+    await timed(backend, "content get", args.ops, args.concurrency, lambda i: repos.contents.get(random.choice(ids)))
+    await timed(backend, "content list", args.ops, args.concurrency,
+                lambda i: repos.contents.list(random.randint(0, 500), 20))
+    await timed(backend, "content search", args.ops, args.concurrency,
+                lambda i: repos.contents.search(" ".join(random.sample(WORDS, k=2)), 20))
+
+    sessions = [(await repos.sessions.get_or_create(None, 12))[1] for _ in range(args.sessions)]
+
+    async def chat_turn(i):
+        session_id = sessions[i % len(sessions)]
+        await repos.sessions.get_or_create(session_id, 12)
+        now = datetime.utcnow()
+        await repos.sessions.add_user_message(session_id, {"role": "user", "text": f"message {i}", "created_at": now})
+        await repos.sessions.add_assistant_message(
+            session_id,
+            {"role": "assistant", "text": " ".join(random.choices(WORDS, k=60)), "created_at": now},
+            [{"platform": "linkedin", "type": "post"}],
+        )
+        await repos.analytics.log_interaction({"session_id": session_id, "timestamp": now, "user_message": {"length": 9}})
+
+    await timed(backend, "chat turn", args.ops, args.concurrency, chat_turn)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", default="sqlite,mongo")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="content_bot_storage_bench")
+    parser.add_argument("--sqlite-path", default=None, help="defaults to a temporary file")
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    for backend in args.backends.split(","):
+        if backend == "sqlite":
+            with tempfile.TemporaryDirectory() as tmp:
+                repos = SQLiteRepositories(args.sqlite_path or os.path.join(tmp, "bench.db"))
+                await repos.start()
+                try:
+                    await run_workload(backend, repos, args)
+                finally:
+                    await repos.close()
+        elif backend == "mongo":
+            from motor.motor_asyncio import AsyncIOMotorClient
+
+            client = AsyncIOMotorClient(args.mongo_uri, serverSelectionTimeoutMS=5000)
+            try:
+                await client.admin.command("ping")
+            except Exception as e:
+                print(f"  mongo skipped: {e}")
+                continue
+            db = client[args.db]
+            try:
+                await ensure_indexes(db)
+                await run_workload(backend, MongoRepositories(db), args)
+            finally:
+                await client.drop_database(args.db)
+                client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,285 @@
+"""Replay captured production traffic against a local instance.
+
+Reads a capture written with ``CAPTURE_ENABLED`` (the file plus its rotated
+backups, oldest first) and re-sends every request at its original offset from
+the first one, divided by ``--speed``; ``--speed 0`` sends as fast as
+``--concurrency`` allows. Requests about one chat session or content document
+keep their capture order, and the session ids, content ids and idempotency
+keys in the capture are mapped to the ones this instance hands out.
+
+Prints the workload profile of the capture (message lengths, turns per
+session, platform mix), then client-side latency percentiles per route next to
+the server-side durations recorded in production. ``--out`` saves the run;
+``--baseline`` compares this run with a saved one.
+
+    python scripts/replay_capture.py captures/traffic.jsonl --url http://localhost:8000 --speed 4 --out before.json
+    python scripts/replay_capture.py captures/traffic.jsonl --url http://localhost:8000 --speed 4 --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import time
+import uuid
+from collections import Counter, defaultdict
+
+import httpx
+
+OBJECT_ID = re.compile(r"\b[0-9a-f]{24}\b")
+CHAT_SESSION_PATH = re.compile(r"^(/api/chat/sessions/)([^/]+)")
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def load_capture(path: str, limit: int = 0):
+    """Records from ``path`` and its backups (``path.N`` is the oldest), in arrival order"""
+    backups = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        backups.append(f"{path}.{index}")
+        index += 1
+    records = []
+    for name in [*reversed(backups), path]:
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue  # a line cut short by a crash or rotation
+    records.sort(key=lambda r: r["ts"])
+    return records[:limit] if limit else records
+
+
+def print_profile(records):
+    """What the captured workload looks like; the numbers synthetic benchmarks should match"""
+    span = records[-1]["ts"] - records[0]["ts"] if len(records) > 1 else 0
+    print(f"Capture: {len(records)} requests over {span:.0f}s")
+    for route, count in Counter(f"{r['method']} {r['route']}" for r in records).most_common():
+        print(f"  {count:>7}  {route}")
+    chats = [r for r in records if r["method"] == "POST" and r["route"] == "/api/chat"]
+    if not chats:
+        return
+    lengths = [r["shape"]["message"]["chars"] for r in chats if "message" in r.get("shape", {})]
+    if lengths:
+        print(f"  message chars: p50={percentile(lengths, 0.5)} p90={percentile(lengths, 0.9)} "
+              f"p99={percentile(lengths, 0.99)} max={max(lengths)}")
+    turns = list(Counter(r["session"] for r in chats if r.get("session")).values())
+    if turns:
+        print(f"  turns per session: sessions={len(turns)} p50={percentile(turns, 0.5)} "
+              f"p90={percentile(turns, 0.9)} max={max(turns)}")
+    platforms = Counter(p for r in chats for p in r.get("shape", {}).get("platforms", []))
+    conversational = sum(1 for r in chats if not r.get("shape", {}).get("platforms"))
+    mix = ", ".join(f"{p} {n / len(chats):.0%}" for p, n in platforms.most_common())
+    print(f"  platform mix: conversational {conversational / len(chats):.0%}" + (f", {mix}" if mix else ""))
+
+
+class Replayer:
+    def __init__(self, client: httpx.AsyncClient, api_key: str, concurrency: int):
+        self.client = client
+        self.api_key = api_key
+        self.semaphore = asyncio.Semaphore(concurrency) if concurrency > 0 else None
+        # Capture-side id -> id on this instance
+        self.sessions = {}
+        self.contents = {}
+        self.idempotency_keys = defaultdict(lambda: str(uuid.uuid4()))
+        self.latency = defaultdict(list)
+        self.captured = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.skipped = Counter()
+        self.lag = []
+
+    def prepare(self, record):
+        """The request to send, with ids mapped; None if it refers to something this run never created"""
+        path = record["path"]
+        session_path = CHAT_SESSION_PATH.match(path)
+        if session_path:
+            real = self.sessions.get(session_path.group(2))
+            if real is None:
+                return None
+            path = session_path.group(1) + real + path[session_path.end():]
+        for content_id in OBJECT_ID.findall(path):
+            if content_id not in self.contents:
+                return None
+            path = path.replace(content_id, self.contents[content_id])
+
+        params = dict(record.get("query") or {})
+        # Search cursors encode capture-side ids and scores
+        params.pop("cursor", None)
+        if params.get("session_id"):
+            if params["session_id"] not in self.sessions:
+                return None
+            params["session_id"] = self.sessions[params["session_id"]]
+
+        body = record.get("body")
+        if isinstance(body, dict) and "session_id" in body:
+            body = dict(body)
+            # A session that started before the capture begins fresh here
+            body["session_id"] = self.sessions.get(body["session_id"])
+
+        headers = {}
+        if self.api_key:
+            headers["X-API-Key"] = self.api_key
+        if record.get("idempotency_key"):
+            headers["Idempotency-Key"] = self.idempotency_keys[record["idempotency_key"]]
+        return path, params, body, headers
+
+    async def send(self, record, scheduled: float, previous):
+        if previous is not None:
+            # Same session or document: wait for the request before it
+            await asyncio.gather(previous, return_exceptions=True)
+        request = self.prepare(record)
+        route = f"{record['method']} {record['route']}"
+        if request is None:
+            self.skipped[route] += 1
+            return
+        path, params, body, headers = request
+        if self.semaphore is not None:
+            await self.semaphore.acquire()
+        try:
+            start = time.perf_counter()
+            self.lag.append(max(0.0, start - scheduled) * 1000)
+            try:
+                response = await self.client.request(
+                    record["method"], path, params=params, json=body, headers=headers
+                )
+            except httpx.HTTPError as e:
+                self.statuses[route][type(e).__name__] += 1
+                return
+            self.latency[route].append((time.perf_counter() - start) * 1000)
+        finally:
+            if self.semaphore is not None:
+                self.semaphore.release()
+        self.captured[route].append(record["duration_ms"])
+        self.statuses[route][str(response.status_code)] += 1
+        self.learn_ids(record, response)
+
+    def learn_ids(self, record, response):
+        if record["method"] != "POST" or response.status_code >= 300:
+            return
+        try:
+            payload = response.json()
+        except ValueError:
+            return
+        if record.get("session") and record["session"] not in self.sessions and payload.get("session_id"):
+            self.sessions[record["session"]] = payload["session_id"]
+        if record.get("content_id") and payload.get("id"):
+            self.contents[record["content_id"]] = payload["id"]
+
+    async def run(self, records, speed: float):
+        """Dispatch each record at its (scaled) original offset"""
+        chains = {}
+        tasks = []
+        origin = records[0]["ts"]
+        start = time.perf_counter()
+        for record in records:
+            scheduled = start + ((record["ts"] - origin) / speed if speed > 0 else 0)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            chain = record.get("session") or record.get("content_id")
+            task = asyncio.create_task(self.send(record, scheduled, chains.get(chain)))
+            if chain:
+                chains[chain] = task
+            tasks.append(task)
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+    def result(self):
+        return {
+            route: {
+                "latency_ms": self.latency[route],
+                "captured_ms": self.captured[route],
+                "status": dict(self.statuses[route]),
+            }
+            for route in sorted(set(self.latency) | set(self.statuses))
+        }
+
+
+def summarize(samples):
+    if not samples:
+        return None
+    return {
+        "p50": statistics.median(samples),
+        "p90": percentile(samples, 0.9),
+        "p99": percentile(samples, 0.99),
+        "max": max(samples),
+    }
+
+
+def print_report(routes, skipped, lag):
+    print(f"\n{'route':<42} {'n':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}   {'prod p50':>8} {'prod p99':>8}  status")
+    for route, data in routes.items():
+        mine = summarize(data["latency_ms"])
+        prod = summarize(data["captured_ms"])
+        if mine is None:
+            print(f"{route:<42} {0:>6}  {data['status']}")
+            continue
+        print(
+            f"{route:<42} {len(data['latency_ms']):>6} {mine['p50']:8.1f} {mine['p90']:8.1f} {mine['p99']:8.1f} "
+            f"{mine['max']:8.1f}   {prod['p50']:8.1f} {prod['p99']:8.1f}  {data['status']}"
+        )
+    if skipped:
+        print(f"Skipped (ids created before the capture started): {dict(skipped)}")
+    if lag:
+        print(f"Send lag behind schedule: p50={statistics.median(lag):.1f}ms p99={percentile(lag, 0.99):.1f}ms "
+              f"max={max(lag):.1f}ms")
+
+
+def print_comparison(routes, baseline):
+    print(f"\nAgainst baseline ({baseline.get('url')}, speed {baseline.get('speed')}):")
+    print(f"{'route':<42} {'p50':>18} {'p90':>18} {'p99':>18}")
+    for route, data in routes.items():
+        before = summarize(baseline["routes"].get(route, {}).get("latency_ms", []))
+        after = summarize(data["latency_ms"])
+        if before is None or after is None:
+            continue
+        cells = []
+        for p in ("p50", "p90", "p99"):
+            change = (after[p] - before[p]) / before[p] * 100 if before[p] else 0.0
+            cells.append(f"{before[p]:7.1f}->{after[p]:7.1f} {change:+4.0f}%")
+        print(f"{route:<42} " + " ".join(f"{cell:>18}" for cell in cells))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="capture file (rotated backups next to it are read too)")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="N times the original rate; 0 = no pacing")
+    parser.add_argument("--concurrency", type=int, default=0, help="cap on requests in flight (0 = none)")
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N requests")
+    parser.add_argument("--api-key", default=os.environ.get("REPLAY_API_KEY", ""))
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--out", help="save this run as JSON (a later run's --baseline)")
+    parser.add_argument("--baseline", help="a run saved with --out to compare against")
+    args = parser.parse_args()
+
+    records = load_capture(args.capture, args.limit)
+    if not records:
+        print("Capture is empty")
+        return
+    print_profile(records)
+
+    limits = httpx.Limits(max_connections=args.concurrency or 1000, max_keepalive_connections=100)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        replayer = Replayer(client, args.api_key, args.concurrency)
+        wall = await replayer.run(records, args.speed)
+    routes = replayer.result()
+    print(f"\nReplayed {len(records)} requests in {wall:.1f}s at speed {args.speed or 'max'}")
+    print_report(routes, replayer.skipped, replayer.lag)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            print_comparison(routes, json.load(f))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"capture": args.capture, "url": args.url, "speed": args.speed, "routes": routes,
+                       "skipped": dict(replayer.skipped)}, f)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+"""Load test for the chat WebSocket: many idle connections on one worker.
+
+Opens N connections to /api/chat/ws at a fixed ramp rate, keeps them open for
+the test duration with an application-level ping every few seconds, and
+optionally sends one chat message on a subset of them. Reports connect
+latency, ping round trips (how responsive the worker stays with N sockets
+open), first-delta / full-reply times, and failures.
+
+    uvicorn app.main:app --port 8000 --ws-ping-interval 20
+    python scripts/ws_load_test.py --url ws://localhost:8000/api/chat/ws --connections 5000 --duration 60
+
+Raise the open file limit on both sides first (``ulimit -n 65536``).
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import websockets
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class Stats:
+    def __init__(self):
+        self.connect = []
+        self.ping = []
+        self.first_delta = []
+        self.reply = []
+        self.failures = {}
+        self.open = 0
+        self.peak_open = 0
+
+    def fail(self, reason: str):
+        self.failures[reason] = self.failures.get(reason, 0) + 1
+
+
+async def client(url: str, stats: Stats, deadline: float, ping_interval: float, message: str = None):
+    started = time.perf_counter()
+    try:
+        ws = await websockets.connect(url, open_timeout=30, ping_interval=None, max_queue=16)
+    except Exception as e:
+        stats.fail(f"connect:{type(e).__name__}")
+        return
+    stats.connect.append(time.perf_counter() - started)
+    stats.open += 1
+    stats.peak_open = max(stats.peak_open, stats.open)
+    try:
+        if message:
+            sent = time.perf_counter()
+            first_delta = None
+            await ws.send(json.dumps({"type": "message", "message": message}))
+            while True:
+                frame = json.loads(await ws.recv())
+                if frame["type"] == "delta" and first_delta is None:
+                    first_delta = time.perf_counter() - sent
+                    stats.first_delta.append(first_delta)
+                if frame["type"] == "reply":
+                    stats.reply.append(time.perf_counter() - sent)
+                    break
+                if frame["type"] == "error":
+                    stats.fail(f"reply:{frame.get('status')}")
+                    break
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(min(ping_interval, max(0.0, deadline - time.perf_counter())))
+            if time.perf_counter() >= deadline:
+                break
+            sent = time.perf_counter()
+            await ws.send(json.dumps({"type": "ping", "ts": sent}))
+            while json.loads(await ws.recv())["type"] != "pong":
+                pass
+            stats.ping.append(time.perf_counter() - sent)
+    except Exception as e:
+        stats.fail(f"session:{type(e).__name__}")
+    finally:
+        stats.open -= 1
+        await ws.close()
+
+
+def summarize(name: str, values):
+    if not values:
+        return f"{name:<12} n=0"
+    return (
+        f"{name:<12} n={len(values):<6} p50={statistics.median(values) * 1000:8.1f} ms"
+        f"  p99={percentile(values, 0.99) * 1000:8.1f} ms  max={max(values) * 1000:8.1f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:8000/api/chat/ws")
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--ramp", type=float, default=500.0, help="new connections per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to hold connections after ramp-up")
+    parser.add_argument("--ping-interval", type=float, default=10.0)
+    parser.add_argument("--active", type=int, default=0, help="connections that also send one chat message")
+    args = parser.parse_args()
+
+    stats = Stats()
+    ramp_seconds = args.connections / args.ramp
+    deadline = time.perf_counter() + ramp_seconds + args.duration
+    tasks = []
+    for i in range(args.connections):
+        message = f"Write a LinkedIn post about load test run {i}" if i < args.active else None
+        tasks.append(asyncio.create_task(client(args.url, stats, deadline, args.ping_interval, message)))
+        await asyncio.sleep(1 / args.ramp)
+    print(f"Ramped {args.connections} connections in {ramp_seconds:.1f}s, holding for {args.duration:.0f}s")
+    await asyncio.gather(*tasks)
+
+    print(f"Peak open connections: {stats.peak_open}")
+    print(summarize("connect", stats.connect))
+    print(summarize("ping", stats.ping))
+    print(summarize("first delta", stats.first_delta))
+    print(summarize("reply", stats.reply))
+    print(f"Failures: {stats.failures or 'none'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
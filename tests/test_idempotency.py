@@ -0,0 +1,23 @@
+"""Which responses an Idempotency-Key replays instead of running the request again."""
+import pytest
+
+from app.services.idempotency import _storable
+
+
+@pytest.mark.parametrize("response", [
+    (201, {"id": "abc", "title": "Post"}),
+    (200, {"reply": "Hi", "suggestions": [], "fallback": False}),
+    (404, {"detail": "Not found"}),
+])
+def test_results_are_stored(response):
+    assert _storable(response)
+
+
+@pytest.mark.parametrize("response", [
+    (500, {"detail": "Internal error"}),
+    (503, None),
+    (200, {"reply": "Sorry, something went wrong", "error": True}),
+    (200, {"reply": "Placeholder post", "suggestions": [{"platform": "x"}], "fallback": True}),
+])
+def test_failures_and_placeholders_are_not_stored(response):
+    assert not _storable(response)
@@ -0,0 +1,137 @@
+"""Job worker outcomes: what counts as an attempt, and what a worker survives."""
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.core.config import settings
+from app.services import job_worker
+from app.services.admission import AdmissionRejected
+from app.services.job_worker import JobWorkerPool
+
+ITEM = {"_id": "item-1", "job_id": "job-1", "message": "a tweet about my run", "attempts": 1}
+
+
+class Outcomes:
+    """Records the retry_item / complete_item calls a worker makes"""
+
+    def __init__(self):
+        self.retries = []
+        self.completions = []
+
+    async def retry_item(self, db, item, error, delay=0, count_attempt=True):
+        self.retries.append({"error": error, "delay": delay, "count_attempt": count_attempt})
+
+    async def complete_item(self, db, item, result=None, error=None):
+        self.completions.append({"result": result, "error": error})
+
+
+@pytest.fixture
+def outcomes(monkeypatch):
+    recorded = Outcomes()
+    monkeypatch.setattr(job_worker, "retry_item", recorded.retry_item)
+    monkeypatch.setattr(job_worker, "complete_item", recorded.complete_item)
+    monkeypatch.setattr(job_worker, "fetch_trending_formats_bounded", _no_trends)
+    monkeypatch.setattr(job_worker, "BUSY_BACKOFF_SECONDS", 0)
+    return recorded
+
+
+async def _no_trends():
+    return []
+
+
+def reply_with(monkeypatch, generate):
+    monkeypatch.setattr(job_worker, "generate_reply", generate)
+
+
+def test_generated_reply_completes_item(monkeypatch, outcomes):
+    async def generate(message, context, trends):
+        return {"reply": "Done", "suggestions": [{"platform": "twitter", "content": "Ran 10k"}]}
+
+    reply_with(monkeypatch, generate)
+    asyncio.run(JobWorkerPool(1)._run_item(dict(ITEM)))
+    assert outcomes.retries == []
+    assert outcomes.completions[0]["result"]["suggestions"] == [{"platform": "twitter", "content": "Ran 10k"}]
+
+
+def test_fallback_reply_is_a_counted_failure(monkeypatch, outcomes):
+    async def generate(message, context, trends):
+        return {"reply": "Placeholder", "suggestions": [], "fallback": True}
+
+    reply_with(monkeypatch, generate)
+    asyncio.run(JobWorkerPool(1)._run_item(dict(ITEM)))
+    [retry] = outcomes.retries
+    assert retry["count_attempt"] and retry["delay"] == settings.JOB_RETRY_BACKOFF_SECONDS
+    assert outcomes.completions == []
+
+
+def test_last_attempt_fails_item(monkeypatch, outcomes):
+    async def generate(message, context, trends):
+        raise RuntimeError("model error")
+
+    reply_with(monkeypatch, generate)
+    asyncio.run(JobWorkerPool(1)._run_item({**ITEM, "attempts": settings.JOB_MAX_ATTEMPTS}))
+    assert outcomes.retries == []
+    assert outcomes.completions == [{"result": None, "error": "model error"}]
+
+
+def test_busy_model_does_not_use_an_attempt(monkeypatch, outcomes):
+    class Busy:
+        @asynccontextmanager
+        async def admit_background(self, reserve):
+            raise AdmissionRejected("busy", 1)
+            yield
+
+    monkeypatch.setattr(job_worker, "admission", Busy())
+    with pytest.raises(AdmissionRejected):
+        asyncio.run(JobWorkerPool(1)._run_item(dict(ITEM)))
+    assert [retry["count_attempt"] for retry in outcomes.retries] == [False]
+
+
+def test_interrupted_item_does_not_use_an_attempt(monkeypatch, outcomes):
+    async def generate(message, context, trends):
+        await asyncio.sleep(5)
+
+    async def interrupt():
+        task = asyncio.create_task(JobWorkerPool(1)._run_item(dict(ITEM)))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    reply_with(monkeypatch, generate)
+    asyncio.run(interrupt())
+    assert outcomes.retries == [{"error": "interrupted", "delay": 0, "count_attempt": False}]
+
+
+def test_worker_survives_database_errors(monkeypatch, outcomes):
+    claims = []
+
+    async def claim(db, owner):
+        claims.append(owner)
+        if len(claims) == 1:
+            raise ConnectionError("primary stepped down")
+        if len(claims) == 2:
+            return dict(ITEM)
+        return None
+
+    async def generate(message, context, trends):
+        return {"reply": "Done", "suggestions": [{"platform": "twitter", "content": "Ran 10k"}]}
+
+    async def failing_complete(db, item, result=None, error=None):
+        raise ConnectionError("write failed")
+
+    async def run():
+        pool = JobWorkerPool(1, poll_interval=0.01)
+        worker = asyncio.create_task(pool._worker(asyncio.Event()))
+        await asyncio.sleep(0.2)
+        assert not worker.done()
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+    monkeypatch.setattr(job_worker, "claim_next_item", claim)
+    monkeypatch.setattr(job_worker, "complete_item", failing_complete)
+    reply_with(monkeypatch, generate)
+    asyncio.run(run())
+    # A failed claim and a failed write, and the worker went on polling
+    assert len(claims) > 2
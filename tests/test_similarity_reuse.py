@@ -0,0 +1,51 @@
+"""Which stored generations a new request may reuse."""
+import pytest
+
+from app.services import similarity
+from app.services.ai_client import ai_client
+from app.services.similarity import SimilarityIndex
+
+PLATFORMS = ["instagram"]
+CONTEXT = [{"role": "user", "text": "Spent the whole day hiking up to the lake above the village with my dog, "
+                                    "clear skies, cold water, sandwiches at the top and a long way back down"}]
+POST = {"reply": "Here you go", "suggestions": [{"platform": "instagram", "content": "Lake day"}],
+        "missing_platforms": []}
+
+
+@pytest.fixture
+def index(monkeypatch):
+    fresh = SimilarityIndex(dim=512, capacity=16, threshold=0.9)
+    monkeypatch.setattr(similarity, "similarity_index", fresh)
+    return fresh
+
+
+def remember(message, session_id):
+    ai_client._remember_generation(PLATFORMS, message, CONTEXT, POST, session_id)
+
+
+def test_plain_request_reuses_post_from_another_session(index):
+    remember("give me an instagram post", "s1")
+    assert ai_client._find_similar_generation(PLATFORMS, "Write an Instagram post please", CONTEXT, "s2") == POST
+
+
+def test_same_session_never_gets_its_own_post_back(index):
+    remember("give me an instagram post", "s1")
+    assert ai_client._find_similar_generation(PLATFORMS, "give me an instagram post", CONTEXT, "s1") is None
+
+
+def test_refinement_only_reuses_the_same_request(index):
+    remember("give me an instagram post", "s1")
+    refined = "give me an instagram post but keep it under ten words"
+    # Close enough for the index on its own; the request's own instructions keep it from being reused
+    assert index.lookup(",".join(PLATFORMS), ai_client._similarity_text(refined, CONTEXT)) == POST
+    assert ai_client._find_similar_generation(PLATFORMS, refined, CONTEXT, "s2") is None
+
+    remember(refined, "s1")
+    assert ai_client._find_similar_generation(PLATFORMS, refined.upper() + "!", CONTEXT, "s2") == POST
+
+
+def test_expired_rows_are_not_served(index):
+    index.ttl = 60
+    remember("give me an instagram post", "s1")
+    index.added[0] -= 120
+    assert ai_client._find_similar_generation(PLATFORMS, "give me an instagram post", CONTEXT, "s2") is None
@@ -0,0 +1,19 @@
+"""Import-time guard from scripts/bench_startup.py, run as a test."""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from bench_startup import CHECK_LAZY, LAZY_MODULES  # noqa: E402
+
+
+def test_lazy_modules_not_imported_at_startup():
+    proc = subprocess.run(
+        [sys.executable, "-c", CHECK_LAZY.format(mods=LAZY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    assert json.loads(proc.stdout) == []
@@ -0,0 +1,174 @@
+"""Crawler politeness and source budgets against a local fixture server."""
+import asyncio
+import http.server
+import os
+import threading
+import time
+
+import httpx
+import pytest
+
+from app.services.conditional_fetch import CHANGED, conditional_fetcher
+from app.services.trend_sources import (
+    DISALLOWED, CallableSource, Crawler, CrawlScheduler, HashtagPageSource, TrendSource
+)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "crawl")
+USER_AGENT = "ContentBotTest/1.0"
+
+
+class FixtureServer:
+    """Serves a fixture directory; paths under /slow/ answer after ``slow_seconds``."""
+
+    def __init__(self, directory: str, slow_seconds: float = 0.3):
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        lock = threading.Lock()
+        server = self
+
+        class Handler(http.server.SimpleHTTPRequestHandler):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, directory=directory, **kwargs)
+
+            def do_GET(self):
+                with lock:
+                    server.requests.append((self.path, time.monotonic()))
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    if self.path.startswith("/slow/"):
+                        time.sleep(slow_seconds)
+                        self.path = self.path[len("/slow"):]
+                    super().do_GET()
+                finally:
+                    with lock:
+                        server.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def paths(self):
+        return [path for path, _ in self.requests]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def polite_site():
+    server = FixtureServer(os.path.join(FIXTURES, "polite"))
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def open_site():
+    server = FixtureServer(os.path.join(FIXTURES, "open"))
+    yield server
+    server.close()
+
+
+def make_scheduler(**overrides):
+    options = dict(domain_concurrency=2, domain_interval=0.0, source_budget=5.0, robots_ttl=3600,
+                   user_agent=USER_AGENT)
+    options.update(overrides)
+    return CrawlScheduler(**options)
+
+
+async def fetch_all(scheduler, urls):
+    async with httpx.AsyncClient(headers={"User-Agent": USER_AGENT}) as client:
+        crawler = Crawler(scheduler, client)
+        return await asyncio.gather(*(crawler.fetch(url) for url in urls))
+
+
+def test_disallowed_path_is_never_requested(polite_site):
+    [(outcome, response)] = asyncio.run(fetch_all(make_scheduler(), [f"{polite_site.url}/private/tags.html"]))
+    assert outcome == DISALLOWED and response is None
+    assert polite_site.paths() == ["/robots.txt"]
+
+
+def test_robots_fetched_once_per_origin(polite_site):
+    scheduler = make_scheduler()
+    asyncio.run(fetch_all(scheduler, [f"{polite_site.url}/tags.html"]))
+    asyncio.run(fetch_all(scheduler, [f"{polite_site.url}/more.html"]))
+    assert polite_site.paths().count("/robots.txt") == 1
+
+
+def test_crawl_delay_spaces_requests(polite_site):
+    results = asyncio.run(fetch_all(make_scheduler(), [f"{polite_site.url}/tags.html", f"{polite_site.url}/more.html"]))
+    assert [outcome for outcome, _ in results] == [CHANGED, CHANGED]
+    starts = sorted(t for path, t in polite_site.requests if path != "/robots.txt")
+    # Crawl-delay: 1 in the fixture robots.txt; allow for timer granularity
+    assert starts[1] - starts[0] >= 0.95
+
+
+def test_missing_robots_allows_everything(open_site):
+    [(outcome, _)] = asyncio.run(fetch_all(make_scheduler(), [f"{open_site.url}/tags.html"]))
+    assert outcome == CHANGED
+
+
+def test_domain_gate_caps_concurrency(open_site):
+    urls = [f"{open_site.url}/slow/tags.html?n={i}" for i in range(3)]
+    asyncio.run(fetch_all(make_scheduler(domain_concurrency=1), urls))
+    assert open_site.max_in_flight == 1
+
+
+def test_domain_interval_spaces_starts(open_site):
+    urls = [f"{open_site.url}/tags.html?n={i}" for i in range(3)]
+    asyncio.run(fetch_all(make_scheduler(domain_concurrency=3, domain_interval=0.2), urls))
+    starts = sorted(t for path, t in open_site.requests if path != "/robots.txt")
+    assert all(b - a >= 0.18 for a, b in zip(starts, starts[1:]))
+
+
+def test_hashtag_source_reuses_last_parse_when_unchanged(polite_site):
+    source = HashtagPageSource(f"{polite_site.url}/tags.html")
+    scheduler = make_scheduler()
+    first = asyncio.run(scheduler.run([source]))
+    assert set(first[0]["popular_hashtags"]) == {"#travel", "#foodie", "#lifestyle"}
+
+    # Due again: the server answers the conditional request with 304 and the previous parse is served
+    conditional_fetcher.sources[source.url].next_fetch_at = 0
+    assert asyncio.run(scheduler.run([source])) == first
+    assert polite_site.paths().count("/tags.html") == 2
+
+    # Not due: no request at all
+    assert asyncio.run(scheduler.run([source])) == first
+    assert polite_site.paths().count("/tags.html") == 2
+
+
+def test_source_over_budget_contributes_nothing(open_site):
+    slow = HashtagPageSource(f"{open_site.url}/slow/tags.html", budget_seconds=0.1)
+
+    async def quick():
+        return [{"type": "static"}]
+
+    started = time.monotonic()
+    trends = asyncio.run(make_scheduler().run([slow, CallableSource("quick", "platforms", quick)]))
+    assert trends == [{"type": "static"}]
+    assert time.monotonic() - started < 0.3
+
+
+def test_source_budget_capped_by_max_budget():
+    async def hang():
+        await asyncio.sleep(5)
+        return [{"type": "late"}]
+
+    scheduler = make_scheduler(source_budget=5.0, max_budget=0.1)
+    started = time.monotonic()
+    assert asyncio.run(scheduler.run([CallableSource("hang", "platforms", hang, budget_seconds=5.0)])) == []
+    assert time.monotonic() - started < 1.0
+
+
+def test_trend_source_requires_collect():
+    class Incomplete(TrendSource):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()